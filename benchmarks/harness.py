@@ -0,0 +1,350 @@
+"""Сценарии и измерения для команды benchmark_endpoints.
+
+Каждый сценарий - запрос к одному маршруту materials.urls или users.urls от имени
+нужного пользователя. Для сценария замеряются число SQL-запросов, перцентили
+времени ответа и пиковая память, результат сравнивается с базовой линией."""
+import hashlib
+import hmac
+import io
+import json
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Callable
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from materials.models import Course, Lesson
+from users.models import Payments, User
+from users.roles import MODERATORS_GROUP
+from users.stripe_fake import StripeStandIn
+from users.tasks import refresh_payment_rollups
+
+# Объемы данных: параметры generate_load_data
+SIZES = {
+    "tiny": {"users": 30, "courses": 5},
+    "small": {"users": 300, "courses": 30},
+    "medium": {"users": 3000, "courses": 300},
+    "large": {"users": 30000, "courses": 3000},
+}
+BENCHMARK_PASSWORD = "Benchmark-password-1"
+WEBHOOK_SECRET = "whsec_benchmark"
+# Изменения меньше этих значений считаются шумом измерения
+TIME_NOISE_MS = 5
+MEMORY_NOISE_KB = 64
+
+
+class BenchmarkError(Exception):
+    """Сценарий завершился ошибкой вместо успешного ответа."""
+
+
+@dataclass
+class Call:
+    """Запрос сценария."""
+    url: str
+    data: dict | None = None
+    headers: dict = field(default_factory=dict)
+    format: str | None = "json"
+
+
+@dataclass
+class Scenario:
+    """Запрос к маршруту: HTTP-метод, пользователь из контекста и подготовка запроса.
+
+    prepare вызывается перед каждым повтором вне замера, например чтобы создать
+    удаляемый объект или уникальный email."""
+    name: str
+    method: str
+    user: str | None
+    prepare: Callable[["BenchmarkContext"], Call]
+
+
+class BenchmarkContext:
+    """Пользователи и объекты, к которым обращаются сценарии, для одного объема данных."""
+
+    def __init__(self):
+        self.sequence = count(1)
+        first_course = Course.objects.filter(owner__isnull=False).order_by("pk").first()
+        self.course = first_course
+        self.owner = first_course.owner
+        payment = Payments.objects.select_related("user").order_by("pk").first()
+        self.member = payment.user
+        self.member.set_password(BENCHMARK_PASSWORD)
+        self.member.save(update_fields=["password"])
+        self.payment = payment
+        Payments.objects.filter(pk=payment.pk).update(
+            session_id="cs_benchmark", status=Payments.STATUS_OPEN, updated_at=timezone.now()
+        )
+        self.lesson = Lesson.objects.filter(course=self.course).order_by("pk").first()
+
+        self.moderator = User.objects.create(email="benchmark-moderator@example.com")
+        self.moderator.groups.add(Group.objects.get_or_create(name=MODERATORS_GROUP)[0])
+        self.admin = User.objects.create(email="benchmark-admin@example.com", is_staff=True)
+        refresh_payment_rollups()
+
+    def next(self) -> int:
+        return next(self.sequence)
+
+    def owned_course(self) -> Course:
+        return Course.objects.create(name=f"Удаляемый курс {self.next()}", owner=self.owner)
+
+    def owned_lesson(self) -> Lesson:
+        return Lesson.objects.create(name=f"Удаляемый урок {self.next()}", course=self.course, owner=self.owner)
+
+    def webhook_call(self, event_type: str = "checkout.session.completed", payment_status: str = "paid") -> Call:
+        payload = json.dumps({
+            "id": f"evt_benchmark_{self.next()}",
+            "object": "event",
+            "type": event_type,
+            "data": {
+                "object": {"id": "cs_benchmark", "object": "checkout.session", "payment_status": payment_status}
+            },
+        })
+        timestamp = int(time.time())
+        signature = hmac.new(WEBHOOK_SECRET.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+        return Call(
+            reverse("users:stripe_webhook"),
+            payload,
+            headers={"HTTP_STRIPE_SIGNATURE": f"t={timestamp},v1={signature}", "content_type": "application/json"},
+            format=None,
+        )
+
+
+SCENARIOS = [
+    # materials.urls
+    Scenario("course-list", "get", "owner", lambda ctx: Call(reverse("materials:course-list"))),
+    Scenario("course-list-moderator", "get", "moderator", lambda ctx: Call(reverse("materials:course-list"))),
+    Scenario(
+        "course-retrieve", "get", "owner", lambda ctx: Call(reverse("materials:course-detail", args=(ctx.course.pk,)))
+    ),
+    Scenario(
+        "course-create", "post", "member",
+        lambda ctx: Call(reverse("materials:course-list"), {"name": f"Новый курс {ctx.next()}"}),
+    ),
+    Scenario(
+        "course-update", "patch", "owner",
+        lambda ctx: Call(
+            reverse("materials:course-detail", args=(ctx.course.pk,)), {"description": f"Описание {ctx.next()}"}
+        ),
+    ),
+    Scenario(
+        "course-delete", "delete", "owner",
+        lambda ctx: Call(reverse("materials:course-detail", args=(ctx.owned_course().pk,))),
+    ),
+    Scenario("lesson-list", "get", "owner", lambda ctx: Call(reverse("materials:lessons_list"))),
+    Scenario(
+        "lesson-create", "post", "member",
+        lambda ctx: Call(reverse("materials:lessons_create"), {"name": f"Урок {ctx.next()}", "course": ctx.course.pk}),
+    ),
+    Scenario(
+        "lesson-retrieve", "get", "moderator",
+        lambda ctx: Call(reverse("materials:lessons_retrieve", args=(ctx.lesson.pk,))),
+    ),
+    Scenario(
+        "lesson-update", "patch", "moderator",
+        lambda ctx: Call(
+            reverse("materials:lessons_update", args=(ctx.lesson.pk,)), {"description": f"Описание {ctx.next()}"}
+        ),
+    ),
+    Scenario(
+        "lesson-delete", "delete", "owner",
+        lambda ctx: Call(reverse("materials:lessons_delete", args=(ctx.owned_lesson().pk,))),
+    ),
+    Scenario(
+        "subscription-toggle", "post", "member",
+        lambda ctx: Call(reverse("materials:subscriptions"), {"course_id": ctx.course.pk}),
+    ),
+    # users.urls
+    Scenario(
+        "register", "post", None,
+        lambda ctx: Call(
+            reverse("users:register"),
+            {"email": f"benchmark-{ctx.next()}@example.com", "password": BENCHMARK_PASSWORD},
+        ),
+    ),
+    Scenario(
+        "login", "post", None,
+        lambda ctx: Call(reverse("users:login"), {"email": ctx.member.email, "password": BENCHMARK_PASSWORD}),
+    ),
+    Scenario(
+        "token-refresh", "post", None,
+        lambda ctx: Call(reverse("users:token_refresh"), {"refresh": str(RefreshToken.for_user(ctx.member))}),
+    ),
+    Scenario(
+        "payment-create", "post", "member",
+        lambda ctx: Call(
+            reverse("users:payments"), {"course_paid": ctx.course.pk, "amount": 1990, "method_payment": "stripe"}
+        ),
+    ),
+    Scenario(
+        "payment-list-cursor", "get", "member",
+        # GET /users/payments/ занят маршрутом создания платежа, список роутера доступен с суффиксом формата
+        lambda ctx: Call(reverse("users:payments-list", kwargs={"format": "json"}), {"pagination": "cursor"}),
+    ),
+    Scenario(
+        "payment-retrieve", "get", "member",
+        lambda ctx: Call(reverse("users:payments-detail", args=(ctx.payment.pk,))),
+    ),
+    Scenario(
+        "payment-status", "get", "member",
+        lambda ctx: Call(reverse("users:payments_status", args=(ctx.payment.pk,))),
+    ),
+    Scenario("stripe-webhook", "post", None, lambda ctx: ctx.webhook_call()),
+    Scenario(
+        "stripe-webhook-unpaid", "post", None,
+        lambda ctx: ctx.webhook_call(payment_status="unpaid"),
+    ),
+    Scenario(
+        "stripe-webhook-async", "post", None,
+        lambda ctx: ctx.webhook_call("checkout.session.async_payment_succeeded"),
+    ),
+    Scenario(
+        "history-list", "get", "moderator", lambda ctx: Call(reverse("users:history-list"), {"pagination": "cursor"})
+    ),
+    Scenario(
+        "history-retrieve", "get", "member",
+        lambda ctx: Call(reverse("users:history-detail", args=(ctx.member.pk,))),
+    ),
+    Scenario(
+        "history-payments", "get", "member",
+        lambda ctx: Call(reverse("users:history-payments", args=(ctx.member.pk,))),
+    ),
+    Scenario("revenue", "get", "admin", lambda ctx: Call(reverse("users:revenue"), {"group_by": "month"})),
+    Scenario(
+        "users-list", "get", "moderator", lambda ctx: Call(reverse("users:users-list"), {"pagination": "cursor"})
+    ),
+    Scenario(
+        "user-retrieve", "get", "member", lambda ctx: Call(reverse("users:users-detail", args=(ctx.member.pk,)))
+    ),
+    Scenario(
+        "user-update", "patch", "member",
+        lambda ctx: Call(reverse("users:users-detail", args=(ctx.member.pk,)), {"city": f"Город {ctx.next()}"}),
+    ),
+    Scenario(
+        "user-delete", "delete", "admin",
+        lambda ctx: Call(reverse("users:users-detail", args=(
+            User.objects.create(email=f"benchmark-delete-{ctx.next()}@example.com").pk,
+        ))),
+    ),
+]
+
+
+def make_client(context: BenchmarkContext, user: str | None) -> APIClient:
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user=getattr(context, user))
+    return client
+
+
+def prepare(context: BenchmarkContext, scenario: Scenario) -> Callable[[], None]:
+    """Готовит запрос сценария и возвращает функцию, которая его выполняет.
+
+    Подготовка (создание объектов, клиента) не входит в замер."""
+    call = scenario.prepare(context)
+    client = make_client(context, scenario.user)
+    kwargs = dict(call.headers)
+    if call.format:
+        kwargs["format"] = call.format
+
+    def send() -> None:
+        response = getattr(client, scenario.method)(call.url, call.data, **kwargs)
+        if response.status_code >= 400:
+            raise BenchmarkError(f"{scenario.name}: ответ {response.status_code} {response.content[:200]!r}")
+    return send
+
+
+def measure(context: BenchmarkContext, scenario: Scenario, repeat: int) -> dict:
+    """Замеряет сценарий: первый запрос - прогрев, затем repeat запросов с замером
+    времени и числа SQL-запросов и отдельный запрос под tracemalloc для пиковой памяти."""
+    prepare(context, scenario)()
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        send = prepare(context, scenario)
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            send()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = max(queries, len(captured.captured_queries))
+
+    send = prepare(context, scenario)
+    tracemalloc.start()
+    try:
+        send()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+    return {
+        "queries": queries,
+        "p50_ms": round(percentiles[49], 2),
+        "p95_ms": round(percentiles[94], 2),
+        "p99_ms": round(percentiles[98], 2),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run_size(size: str, repeat: int, only: str | None = None, seed: int = 1) -> dict:
+    """Заполняет текущую БД данными объема size и замеряет сценарии."""
+    call_command("generate_load_data", seed=seed, batch_size=5000, stdout=io.StringIO(), **SIZES[size])
+    context = BenchmarkContext()
+    return {
+        scenario.name: measure(context, scenario, repeat)
+        for scenario in SCENARIOS
+        if only is None or only in scenario.name
+    }
+
+
+def benchmark_environment():
+    """Окружение прогона без внешних сервисов.
+
+    Кэш - в памяти процесса, почта - locmem, задачи Celery не ставятся в очередь
+    (постановка считается бесплатной), Stripe заменен заглушкой. Стоимость
+    хеширования паролей снижена: ее подбирает отдельная команда calibrate_password_hasher."""
+    return [
+        override_settings(
+            ALLOWED_HOSTS=["testserver"],
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+            EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+            PASSWORD_HASH_ITERATIONS=10_000,
+            STRIPE_ASYNC_CHECKOUT=False,
+            STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET,
+        ),
+        mock.patch("celery.app.task.Task.apply_async"),
+        StripeStandIn().patch(),
+    ]
+
+
+def compare_with_baseline(results: dict, baseline: dict, time_tolerance: float, memory_tolerance: float) -> list[str]:
+    """Возвращает список превышений бюджета относительно базовой линии.
+
+    Число запросов не должно расти вовсе, время p95 и пиковая память - не больше
+    чем на заданную долю (с учетом порога шума)."""
+    violations = []
+    for size, endpoints in results.items():
+        for name, result in endpoints.items():
+            budget = baseline.get(size, {}).get(name)
+            if budget is None:
+                continue
+            label = f"{size}/{name}"
+            if result["queries"] > budget["queries"]:
+                violations.append(f"{label}: SQL-запросов {result['queries']} > {budget['queries']}")
+            time_limit = max(budget["p95_ms"] * (1 + time_tolerance), budget["p95_ms"] + TIME_NOISE_MS)
+            if result["p95_ms"] > time_limit:
+                violations.append(f"{label}: p95 {result['p95_ms']} мс > {time_limit:.2f} мс")
+            memory_limit = max(budget["peak_kb"] * (1 + memory_tolerance), budget["peak_kb"] + MEMORY_NOISE_KB)
+            if result["peak_kb"] > memory_limit:
+                violations.append(f"{label}: память {result['peak_kb']} КБ > {memory_limit:.1f} КБ")
+    return violations
@@ -0,0 +1,82 @@
+import json
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import connection
+
+from benchmarks.harness import SIZES, benchmark_environment, compare_with_baseline, run_size
+
+
+class Command(BaseCommand):
+    """Замер всех маршрутов API на нескольких объемах данных с проверкой бюджетов."""
+    help = (
+        "Создает временную тестовую БД, заполняет ее generate_load_data и для каждого маршрута замеряет "
+        "число SQL-запросов, перцентили времени и пиковую память. Профиль БД задает BENCHMARK_PROFILE "
+        "(sqlite по умолчанию, postgresql - настройки POSTGRES_*)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="small,medium", help=f"Объемы через запятую: {', '.join(SIZES)}")
+        parser.add_argument("--repeat", type=int, default=10, help="Замеров на маршрут (не меньше 2)")
+        parser.add_argument("--only", help="Замерять только маршруты, в названии которых есть подстрока")
+        parser.add_argument(
+            "--baseline",
+            default=str(Path(settings.BASE_DIR) / "benchmark_baseline.json"),
+            help="Файл базовой линии",
+        )
+        parser.add_argument("--update-baseline", action="store_true", help="Записать результаты как базовую линию")
+        parser.add_argument("--time-tolerance", type=float, default=0.5, help="Допустимый рост p95, доля")
+        parser.add_argument("--memory-tolerance", type=float, default=0.5, help="Допустимый рост памяти, доля")
+        parser.add_argument("--output", help="Сохранить результаты в JSON-файл")
+
+    def handle(self, *args, **options):
+        sizes = [size.strip() for size in options["sizes"].split(",") if size.strip()]
+        unknown = set(sizes) - set(SIZES)
+        if unknown:
+            raise CommandError(f"Неизвестные объемы: {', '.join(sorted(unknown))}")
+        if options["repeat"] < 2:
+            raise CommandError("--repeat должен быть не меньше 2")
+
+        profile = connection.vendor
+        results = {}
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with ExitStack() as stack:
+                for patcher in benchmark_environment():
+                    stack.enter_context(patcher)
+                for size in sizes:
+                    call_command("flush", interactive=False, verbosity=0)
+                    self.stdout.write(f"Объем {size} ({profile})...")
+                    results[size] = run_size(size, options["repeat"], options["only"])
+                    self.write_table(results[size])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n")
+
+        baseline_path = Path(options["baseline"])
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        if options["update_baseline"]:
+            baseline.setdefault(profile, {}).update(results)
+            baseline_path.write_text(json.dumps(baseline, indent=2, ensure_ascii=False, sort_keys=True) + "\n")
+            self.stdout.write(f"Базовая линия {profile} записана в {baseline_path}")
+            return
+
+        violations = compare_with_baseline(
+            results, baseline.get(profile, {}), options["time_tolerance"], options["memory_tolerance"]
+        )
+        if violations:
+            raise CommandError("Превышены бюджеты:\n" + "\n".join(violations))
+        self.stdout.write(self.style.SUCCESS("Бюджеты соблюдены"))
+
+    def write_table(self, results: dict) -> None:
+        self.stdout.write(f"{'маршрут':<24}{'SQL':>6}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'память, КБ':>13}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<24}{result['queries']:>6}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+                f"{result['p99_ms']:>10}{result['peak_kb']:>13}"
+            )
@@ -0,0 +1,26 @@
+from contextlib import ExitStack
+
+from rest_framework.test import APITestCase
+
+from benchmarks.harness import SCENARIOS, benchmark_environment, compare_with_baseline, run_size
+
+
+class EndpointBenchmarkTestCase(APITestCase):
+    """Тесты набора замеров маршрутов API."""
+    def test_all_scenarios_run(self):
+        """Все сценарии выполняются успешно на минимальном объеме данных."""
+        with ExitStack() as stack:
+            for patcher in benchmark_environment():
+                stack.enter_context(patcher)
+            results = run_size("tiny", repeat=2)
+        self.assertEqual(list(results), [scenario.name for scenario in SCENARIOS])
+        self.assertEqual(set(results["course-list"]), {"queries", "p50_ms", "p95_ms", "p99_ms", "peak_kb"})
+
+    def test_budget_violations(self):
+        """Рост числа запросов - всегда нарушение, рост времени - только сверх допуска и порога шума."""
+        baseline = {"small": {"course-list": {"queries": 4, "p95_ms": 10, "peak_kb": 100}}}
+        within = {"small": {"course-list": {"queries": 4, "p95_ms": 14, "peak_kb": 140}}}
+        self.assertEqual(compare_with_baseline(within, baseline, 0.5, 0.5), [])
+
+        exceeded = {"small": {"course-list": {"queries": 5, "p95_ms": 40, "peak_kb": 400}}}
+        self.assertEqual(len(compare_with_baseline(exceeded, baseline, 0.5, 0.5)), 3)
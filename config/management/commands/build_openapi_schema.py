@@ -0,0 +1,33 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+
+from config.schema import store_schema_documents
+
+
+class Command(BaseCommand):
+    """Сборка схемы OpenAPI при выкладке."""
+    help = (
+        "Строит схему OpenAPI в форматах JSON и YAML и сохраняет ее в кэш с ключом APP_VERSION, "
+        "чтобы /swagger.json и /swagger.yaml не разбирали представления на каждый запрос"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="Дополнительно записать схему в файл (.json или .yaml)")
+
+    def handle(self, *args, **options):
+        if not settings.APP_VERSION and not options["output"]:
+            # Без версии схема осталась бы только в памяти этого процесса
+            raise CommandError("Задайте APP_VERSION или --output: иначе собранная схема нигде не сохраняется")
+        documents = store_schema_documents([OpenAPICodecJson, OpenAPICodecYaml])
+        if settings.APP_VERSION:
+            self.stdout.write(f"Схема версии {settings.APP_VERSION} сохранена в кэш")
+
+        if options["output"]:
+            path = Path(options["output"])
+            codec = OpenAPICodecYaml if path.suffix in (".yaml", ".yml") else OpenAPICodecJson
+            content, etag = documents[codec.__name__]
+            path.write_bytes(content)
+            self.stdout.write(f"Схема записана в {path} (ETag {etag})")
@@ -0,0 +1,102 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from drf_yasg import openapi
+from drf_yasg.renderers import OpenAPIRenderer, SwaggerJSONRenderer, SwaggerYAMLRenderer
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+API_INFO = openapi.Info(
+    title="Snippets API",
+    default_version='v1',
+    description="Test description",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="contact@snippets.local"),
+    license=openapi.License(name="BSD License"),
+)
+
+# для создания схемы документации:
+schema_view = get_schema_view(
+    API_INFO,
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+)
+
+# Рендереры самого документа схемы (в отличие от страниц Swagger UI и ReDoc)
+SPEC_RENDERERS = (OpenAPIRenderer, SwaggerJSONRenderer, SwaggerYAMLRenderer)
+
+# Собранные документы схемы в памяти процесса: (версия, кодек) -> (содержимое, ETag)
+_documents: dict[tuple[str, str], tuple[bytes, str]] = {}
+
+
+def schema_cache_key(codec_name: str) -> str:
+    return f"openapi-schema:{settings.APP_VERSION}:{codec_name}"
+
+
+def build_schema():
+    """Строит схему OpenAPI без входящего запроса.
+
+    Представлениям передается анонимный запрос, адрес сервера в схему не попадает:
+    документ одинаков для всех клиентов и окружений."""
+    request = APIView().initialize_request(APIRequestFactory().get("/swagger.json"))
+    request.user = AnonymousUser()
+    generator = schema_view.generator_class(API_INFO, "", url="")
+    return generator.get_schema(request, public=True)
+
+
+def encode_schema(schema, codec_class) -> tuple[bytes, str]:
+    content = codec_class(validators=[]).encode(schema)
+    return content, f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+def store_schema_documents(codec_classes) -> dict[str, tuple[bytes, str]]:
+    """Строит схему один раз и сохраняет ее во всех форматах (кодеках)."""
+    schema = build_schema()
+    documents = {codec_class.__name__: encode_schema(schema, codec_class) for codec_class in codec_classes}
+    for codec_name, document in documents.items():
+        _documents[settings.APP_VERSION, codec_name] = document
+        if settings.APP_VERSION:
+            cache.set(schema_cache_key(codec_name), document, timeout=settings.OPENAPI_SCHEMA_CACHE_TIMEOUT)
+    return documents
+
+
+def get_schema_document(codec_class) -> tuple[bytes, str]:
+    """Документ схемы в формате кодека: из памяти процесса, общего кэша или новая сборка.
+
+    Общий кэш используется только при заданной APP_VERSION: ключ включает версию кода,
+    поэтому после выкладки новой версии схема строится заново."""
+    key = settings.APP_VERSION, codec_class.__name__
+    document = _documents.get(key)
+    if document is None and settings.APP_VERSION:
+        document = cache.get(schema_cache_key(codec_class.__name__))
+        if document is not None:
+            _documents[key] = document
+    if document is None:
+        document = store_schema_documents([codec_class])[codec_class.__name__]
+    return document
+
+
+class CachedSchemaView(schema_view):
+    """Отдает собранную заранее схему как статический документ с ETag.
+
+    Страницы Swagger UI и ReDoc по-прежнему строятся стандартно: они не разбирают
+    представления, а загружают схему отдельным запросом (?format=openapi)."""
+
+    def get(self, request, version="", format=None):
+        renderer = request.accepted_renderer
+        if not isinstance(renderer, SPEC_RENDERERS):
+            return super().get(request, version, format)
+        content, etag = get_schema_document(renderer.codec_class)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type=renderer.media_type)
+        response["ETag"] = etag
+        # Клиент может хранить схему, но перед использованием сверяет ETag
+        response["Cache-Control"] = "no-cache"
+        return response
@@ -40,17 +40,23 @@ INSTALLED_APPS = [
     "drf_yasg",
     "django_celery_beat",
 
+    "config",
     "users",
     "materials",
+    "monitoring",
+    "benchmarks",
 ]
 
 MIDDLEWARE = [
+    "monitoring.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "users.middleware.ActivityTrackingMiddleware",
+    "monitoring.middleware.ProfilerMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -111,6 +117,18 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Первый хешер используется для новых паролей, остальные - для проверки старых хешей
+PASSWORD_HASHERS = [
+    "users.hashing.CalibratedPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+# Число итераций PBKDF2 (подбирается командой calibrate_password_hasher)
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS") or 1_000_000)
+
 
 LANGUAGE_CODE = "ru"
 
@@ -141,6 +159,26 @@ SIMPLE_JWT = {
 }
 
 STRIPE_API_KEY = os.getenv("STRIPE_API_KEY")
+# Таймауты соединения и чтения, число повторов сетевых ошибок и размер пула соединений с API Stripe
+STRIPE_CONNECT_TIMEOUT = float(os.getenv("STRIPE_CONNECT_TIMEOUT") or 5)
+STRIPE_READ_TIMEOUT = float(os.getenv("STRIPE_READ_TIMEOUT") or 30)
+STRIPE_MAX_NETWORK_RETRIES = int(os.getenv("STRIPE_MAX_NETWORK_RETRIES") or 2)
+STRIPE_HTTP_POOL_SIZE = int(os.getenv("STRIPE_HTTP_POOL_SIZE") or 10)
+# Создавать сессию оплаты Stripe в фоновой задаче (ответ 202 и статус pending)
+STRIPE_ASYNC_CHECKOUT = (os.getenv("STRIPE_ASYNC_CHECKOUT") or "False") == "True"
+# Через сколько секунд клиенту повторить запрос статуса платежа, пока ссылка на оплату создается
+PAYMENT_STATUS_RETRY_AFTER = int(os.getenv("PAYMENT_STATUS_RETRY_AFTER") or 1)
+# Секрет подписи webhook Stripe; пока он не задан, webhook отклоняются с ответом 503
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET") or ""
+# Окно (в секундах) накопления событий Stripe перед применением и размер пакета событий
+STRIPE_EVENTS_APPLY_DELAY = int(os.getenv("STRIPE_EVENTS_APPLY_DELAY") or 5)
+STRIPE_EVENTS_BATCH_SIZE = int(os.getenv("STRIPE_EVENTS_BATCH_SIZE") or 500)
+# Сколько дней сводки выручки пересчитывается за одну транзакцию и перекрытие (секунд)
+# при поиске измененных платежей: запас на транзакции, зафиксированные позже своего updated_at
+PAYMENT_ROLLUPS_BATCH_SIZE = int(os.getenv("PAYMENT_ROLLUPS_BATCH_SIZE") or 31)
+PAYMENT_ROLLUPS_OVERLAP = int(os.getenv("PAYMENT_ROLLUPS_OVERLAP") or 10 * 60)
+# Наибольший период отчета о выручке в днях; без дат отчет строится за такой период до сегодняшнего дня
+REVENUE_MAX_DAYS = int(os.getenv("REVENUE_MAX_DAYS") or 366)
 
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
@@ -158,7 +196,19 @@ CELERY_BEAT_SCHEDULE = {
     "block_inactive_users": {
         "task": "materials.tasks.block_inactive_users",
         "schedule": crontab(hour=0, minute=0),  # Запускать ежедневно в полночь
-    }
+    },
+    "apply_stripe_events": {
+        "task": "users.tasks.apply_stripe_events",
+        "schedule": timedelta(minutes=1),  # Страховка на случай потери запланированной задачи
+    },
+    "flush_user_activity": {
+        "task": "users.tasks.flush_user_activity",
+        "schedule": timedelta(minutes=5),  # Сброс отметок активности в last_login
+    },
+    "refresh_payment_rollups": {
+        "task": "users.tasks.refresh_payment_rollups",
+        "schedule": timedelta(minutes=10),  # Добавление новых платежей в сводку выручки
+    },
 }
 
 EMAIL_HOST = os.getenv("EMAIL_HOST")
@@ -171,9 +221,36 @@ EMAIL_USE_SSL = True
 SERVER_EMAIL = EMAIL_HOST_USER
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-
-if "test" in sys.argv:
+# Для локальных замеров без SMTP: django.core.mail.backends.filebased.EmailBackend
+# (вместе с EMAIL_FILE_PATH) или django.core.mail.backends.console.EmailBackend
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND") or 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_FILE_PATH = os.getenv("EMAIL_FILE_PATH") or os.path.join(BASE_DIR, "sent_emails")
+# Сколько писем отправляется за один вызов send_messages по общему соединению
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE") or 50)
+# Ограничение скорости отправки на процесс воркера, писем в секунду (0 - без ограничения)
+EMAIL_RATE_LIMIT = float(os.getenv("EMAIL_RATE_LIMIT") or 0)
+
+# Размер порции подписчиков в одной задаче рассылки об обновлении курса
+COURSE_UPDATE_NOTIFY_CHUNK_SIZE = int(os.getenv("COURSE_UPDATE_NOTIFY_CHUNK_SIZE") or 500)
+# Окно (в секундах), в течение которого обновления одного курса объединяются в одно уведомление
+COURSE_UPDATE_NOTIFY_DELAY = int(os.getenv("COURSE_UPDATE_NOTIFY_DELAY") or 300)
+# Поля курса, изменение которых важно для подписчиков
+COURSE_UPDATE_NOTIFY_FIELDS = ("name", "description", "picture")
+# Сколько пользователей блокируется в одной транзакции задачи block_inactive_users
+BLOCK_INACTIVE_USERS_BATCH_SIZE = int(os.getenv("BLOCK_INACTIVE_USERS_BATCH_SIZE") or 1000)
+# Не чаще какого интервала (секунд) отмечается активность одного пользователя в процессе
+USER_ACTIVITY_RESOLUTION = int(os.getenv("USER_ACTIVITY_RESOLUTION") or 60)
+# Сколько пользователей обновляется одним UPDATE при сбросе активности
+USER_ACTIVITY_FLUSH_BATCH_SIZE = int(os.getenv("USER_ACTIVITY_FLUSH_BATCH_SIZE") or 1000)
+
+# Профиль БД команды benchmark_endpoints: sqlite (офлайн, по умолчанию) или postgresql (настройки POSTGRES_*)
+BENCHMARK_PROFILE = os.getenv("BENCHMARK_PROFILE") or "sqlite"
+# Профиль БД тестов: sqlite (по умолчанию) или postgresql - для проверки веток, специфичных для PostgreSQL (COPY)
+TEST_DB_PROFILE = os.getenv("TEST_DB_PROFILE") or "sqlite"
+
+if ("test" in sys.argv and TEST_DB_PROFILE == "sqlite") or (
+    "benchmark_endpoints" in sys.argv and BENCHMARK_PROFILE == "sqlite"
+):
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
@@ -193,9 +270,49 @@ CSRF_TRUSTED_ORIGINS = [
     'http://web:8000',
 ]
 
+# Redis: общий кэш и хеши отметок активности пользователей
+REDIS_URL = os.getenv("REDIS_URL") or 'redis://127.0.0.1:6379/1'
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-        'LOCATION': 'redis://127.0.0.1:6379/1',
+        'LOCATION': REDIS_URL,
+    }
+}
+
+# Время жизни кэша детального представления курса, секунд
+COURSE_DETAIL_CACHE_TIMEOUT = int(os.getenv("COURSE_DETAIL_CACHE_TIMEOUT") or 60 * 60)
+
+# Время жизни кэша ролей пользователя (групп), секунд; 0 - без кэша, только в пределах запроса
+USER_ROLES_CACHE_TIMEOUT = int(os.getenv("USER_ROLES_CACHE_TIMEOUT") or 5 * 60)
+
+# Сколько последних платежей вложено в пользователя в ответах /users/ и /users/history/;
+# полный список - постраничный ресурс /users/history/<pk>/payments/
+USER_RECENT_PAYMENTS = int(os.getenv("USER_RECENT_PAYMENTS") or 20)
+
+# Сбор метрик запросов и эндпоинт /metrics; эндпоинт доступен сотрудникам и по Bearer-токену METRICS_TOKEN
+METRICS_ENABLED = (os.getenv("METRICS_ENABLED") or "True") == "True"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN") or ""
+
+# Профилировщик запросов сотрудников: сколько самых медленных SQL-запросов сохранять с EXPLAIN
+# и сколько строк cProfile (по суммарному времени) попадает в отчет
+PROFILER_SLOW_QUERIES = int(os.getenv("PROFILER_SLOW_QUERIES") or 5)
+PROFILER_STATS_LIMIT = int(os.getenv("PROFILER_STATS_LIMIT") or 50)
+
+# Версия кода (например, хеш коммита): ключ собранной схемы OpenAPI в общем кэше.
+# Без версии схема хранится только в памяти процесса и строится заново после перезапуска
+APP_VERSION = os.getenv("APP_VERSION") or ""
+# Время жизни собранной схемы OpenAPI в общем кэше, секунд
+OPENAPI_SCHEMA_CACHE_TIMEOUT = int(os.getenv("OPENAPI_SCHEMA_CACHE_TIMEOUT") or 30 * 24 * 60 * 60)
+
+if "test" in sys.argv:
+    # В тестах Redis не требуется
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
-}
\ No newline at end of file
+    # Идентификаторы пользователей повторяются между тестами, кэш ролей включается в тестах явно
+    USER_ROLES_CACHE_TIMEOUT = 0
+    # Задачи Celery выполняются сразу, брокер в тестах не нужен
+    CELERY_TASK_ALWAYS_EAGER = True
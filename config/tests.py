@@ -0,0 +1,71 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from config import schema
+
+
+class OpenAPISchemaCacheTestCase(APITestCase):
+    """Тесты отдачи собранной схемы OpenAPI."""
+
+    def setUp(self):
+        schema._documents.clear()
+        self.addCleanup(schema._documents.clear)
+        cache.clear()
+        self.url = reverse("schema-json", args=(".json",))
+
+    def test_schema_is_built_once_and_served_with_etag(self):
+        with mock.patch("config.schema.build_schema", wraps=schema.build_schema) as build_schema:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+        self.assertEqual(build_schema.call_count, 1)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn("/materials/subscriptions/", json.loads(first.content)["paths"])
+        self.assertNotIn("host", json.loads(first.content))
+        self.assertEqual(first["ETag"], second["ETag"])
+        self.assertEqual(first.content, second.content)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+    def test_ui_pages(self):
+        self.assertEqual(self.client.get(reverse("schema-swagger-ui")).status_code, status.HTTP_200_OK)
+        response = self.client.get(reverse("schema-swagger-ui"), {"format": "openapi"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("ETag", response)
+
+    @override_settings(APP_VERSION="abc123")
+    def test_build_command_fills_shared_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / "openapi.yaml"
+            call_command("build_openapi_schema", output=str(output), stdout=StringIO())
+            self.assertIn("swagger:", output.read_text())
+        # Другой процесс той же версии берет схему из кэша, не строя ее
+        schema._documents.clear()
+        with mock.patch("config.schema.build_schema") as build_schema:
+            response = self.client.get(self.url)
+            yaml_response = self.client.get(reverse("schema-json", args=(".yaml",)))
+        build_schema.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(yaml_response.status_code, status.HTTP_200_OK)
+
+        with override_settings(APP_VERSION="def456"), \
+                mock.patch("config.schema.build_schema", wraps=schema.build_schema) as build_schema:
+            self.client.get(self.url)
+        build_schema.assert_called_once()
+
+    @override_settings(APP_VERSION="")
+    def test_build_command_requires_destination(self):
+        with mock.patch("config.schema.build_schema") as build_schema, self.assertRaises(CommandError):
+            call_command("build_openapi_schema", stdout=StringIO())
+        build_schema.assert_not_called()
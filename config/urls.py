@@ -1,29 +1,16 @@
 from django.contrib import admin
 from django.urls import include, path
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
-from rest_framework import permissions
 
-# для создания схемы документации:
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Snippets API",
-        default_version='v1',
-        description="Test description",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="contact@snippets.local"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+from config.schema import CachedSchemaView
+from monitoring.views import metrics_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("materials/", include("materials.urls", namespace="materials")),
     path("users/", include("users.urls", namespace="users")),
-    path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    path("metrics", metrics_view, name="metrics"),
+    path('swagger<format>/', CachedSchemaView.without_ui(), name='schema-json'),
+    path('swagger/', CachedSchemaView.with_ui('swagger'), name='schema-swagger-ui'),
+    path('redoc/', CachedSchemaView.with_ui('redoc'), name='schema-redoc'),
 
 ]
\ No newline at end of file
@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 
 class MaterialsConfig(AppConfig):
-    name = "materials"
\ No newline at end of file
+    name = "materials"
+
+    def ready(self):
+        # Регистрация обработчиков сигналов
+        from materials import signals  # noqa: F401
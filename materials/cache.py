@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.cache import cache
+
+COURSE_DETAIL_KEY = "materials:course-detail:{course_id}"
+COURSE_DETAIL_STATS_KEY = "materials:course-detail-stats:{event}"
+
+
+def course_detail_key(course_id: int) -> str:
+    """Ключ кэша с детальным представлением курса."""
+    return COURSE_DETAIL_KEY.format(course_id=course_id)
+
+
+def get_course_detail(course_id: int, build) -> dict:
+    """Возвращает детальное представление курса из кэша или строит его через build().
+
+    В кэше хранится представление, общее для всех пользователей: признак подписки
+    добавляется к ответу отдельно для каждого запроса."""
+    key = course_detail_key(course_id)
+    data = cache.get(key)
+    if data is not None:
+        record_course_detail_event("hits")
+        return data
+    record_course_detail_event("misses")
+    data = build()
+    cache.set(key, data, timeout=settings.COURSE_DETAIL_CACHE_TIMEOUT)
+    return data
+
+
+def invalidate_course_detail(*course_ids) -> None:
+    """Удаляет из кэша представления указанных курсов."""
+    keys = [course_detail_key(course_id) for course_id in set(course_ids) if course_id]
+    if keys:
+        cache.delete_many(keys)
+
+
+def record_course_detail_event(event: str) -> None:
+    """Увеличивает счетчик попаданий или промахов кэша."""
+    key = COURSE_DETAIL_STATS_KEY.format(event=event)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Счетчика еще нет; add не перезапишет значение, созданное параллельно
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_course_detail_stats() -> dict:
+    """Возвращает счетчики попаданий и промахов кэша детального представления курсов."""
+    events = ("hits", "misses")
+    values = cache.get_many([COURSE_DETAIL_STATS_KEY.format(event=event) for event in events])
+    stats = {event: values.get(COURSE_DETAIL_STATS_KEY.format(event=event), 0) for event in events}
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / total if total else 0.0
+    return stats
@@ -0,0 +1,149 @@
+import logging
+import os
+import smtplib
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, относящиеся к одному письму: после них соединение с сервером не закрывается
+REJECTED_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+class RateLimiter:
+    """Ограничитель скорости отправки по алгоритму "token bucket".
+
+    rate - сколько писем в секунду разрешено отправлять (0 - без ограничений),
+    burst - сколько писем можно отправить подряд без ожидания."""
+
+    def __init__(self, rate: float, burst: int | None = None) -> None:
+        self.rate = rate
+        self.burst = burst or max(int(rate), 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, count: int = 1) -> None:
+        """Блокирует поток, пока не накопится квота на count писем."""
+        if not self.rate:
+            return
+        while count > 0:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                taken = min(count, int(self.tokens))
+                self.tokens -= taken
+                count -= taken
+                wait = (min(count, self.burst) - self.tokens) / self.rate if count else 0
+            if wait > 0:
+                time.sleep(wait)
+
+
+class MailDelivery:
+    """Отправка писем пачками через одно постоянное соединение с почтовым сервером.
+
+    Соединение открывается при первой отправке и переиспользуется между задачами
+    воркера. Письма отправляются через него по одному: ошибка одного письма не
+    приводит к повторной отправке уже доставленных, вызывающему коду возвращаются
+    только письма с ошибкой. После обрыва соединение открывается заново, а письмо
+    отправляется повторно один раз."""
+
+    def __init__(self, backend: str | None = None, batch_size: int | None = None, rate: float | None = None,
+                 **backend_kwargs) -> None:
+        self.backend = backend or settings.EMAIL_BACKEND
+        self.backend_kwargs = backend_kwargs
+        self.batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+        self.rate_limiter = RateLimiter(settings.EMAIL_RATE_LIMIT if rate is None else rate)
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def open(self):
+        """Возвращает открытое соединение, при необходимости создавая его."""
+        if self.connection is None:
+            self.connection = get_connection(self.backend, fail_silently=False, **self.backend_kwargs)
+            self.connection.open()
+        return self.connection
+
+    def close(self) -> None:
+        """Закрывает соединение, ошибки закрытия игнорируются."""
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.connection = None
+
+    def build_messages(self, emails: list[str], subject: str, message: str) -> list[EmailMessage]:
+        """Создает по отдельному письму на каждого получателя."""
+        from_email = settings.EMAIL_HOST_USER
+        return [EmailMessage(subject, message, from_email, [email]) for email in emails]
+
+    def send_messages(self, messages: list[EmailMessage]) -> list[EmailMessage]:
+        """Отправляет письма и возвращает список неотправленных.
+
+        Квота ограничителя скорости запрашивается на пачку из batch_size писем."""
+        failed = []
+        with self.lock:
+            for start in range(0, len(messages), self.batch_size):
+                batch = messages[start:start + self.batch_size]
+                self.rate_limiter.acquire(len(batch))
+                failed.extend(self._send_batch(batch))
+        return failed
+
+    def send_mass_email(self, emails: list[str], subject: str, message: str) -> list[str]:
+        """Отправляет одинаковое письмо списку адресов и возвращает адреса с ошибкой доставки."""
+        failed = self.send_messages(self.build_messages(emails, subject, message))
+        return [email for failed_message in failed for email in failed_message.to]
+
+    def _send_batch(self, batch: list[EmailMessage]) -> list[EmailMessage]:
+        """Отправляет письма пачки по одному через открытое соединение."""
+        failed = []
+        for email_message in batch:
+            try:
+                self._send(email_message)
+            except REJECTED_ERRORS as error:
+                # Сервер отклонил только это письмо, соединение остается рабочим
+                logger.warning("Письмо для %s отклонено: %s", email_message.to, error)
+                failed.append(email_message)
+            except (smtplib.SMTPException, OSError) as error:
+                logger.warning("Письмо для %s не отправлено: %s", email_message.to, error)
+                self.close()
+                failed.append(email_message)
+        return failed
+
+    def _send(self, email_message: EmailMessage) -> None:
+        """Отправляет одно письмо.
+
+        Сервер закрывает простаивающее соединение, и это обнаруживается только при
+        отправке: соединение открывается заново и письмо повторяется сразу, один раз,
+        а не через повтор задачи."""
+        try:
+            self.open().send_messages([email_message])
+        except smtplib.SMTPServerDisconnected as error:
+            logger.info("Соединение с почтовым сервером закрыто (%s), открывается заново", error)
+            self.close()
+            self.open().send_messages([email_message])
+
+
+_delivery = None
+
+
+def get_delivery() -> MailDelivery:
+    """Возвращает общий для процесса воркера экземпляр MailDelivery."""
+    global _delivery
+    if _delivery is None:
+        _delivery = MailDelivery()
+    return _delivery
+
+
+def _reset_delivery() -> None:
+    """Сбрасывает соединение в дочернем процессе: сокет родителя не переиспользуется."""
+    global _delivery
+    _delivery = None
+
+
+os.register_at_fork(after_in_child=_reset_delivery)
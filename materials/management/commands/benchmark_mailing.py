@@ -0,0 +1,49 @@
+import tempfile
+import time
+
+from django.core.management import BaseCommand
+
+from materials.mailing import MailDelivery
+
+BACKENDS = {
+    "locmem": "django.core.mail.backends.locmem.EmailBackend",
+    "file": "django.core.mail.backends.filebased.EmailBackend",
+    "console": "django.core.mail.backends.console.EmailBackend",
+    "smtp": "django.core.mail.backends.smtp.EmailBackend",
+}
+
+
+class Command(BaseCommand):
+    """Замер пропускной способности рассылки без реального почтового сервера."""
+    help = "Отправляет синтетические письма через MailDelivery и выводит скорость отправки"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=10000, help="Количество писем")
+        parser.add_argument("--batch-size", type=int, default=None, help="Писем в одном вызове send_messages")
+        parser.add_argument("--rate", type=float, default=0, help="Ограничение скорости, писем в секунду")
+        parser.add_argument("--backend", choices=sorted(BACKENDS), default="file", help="Почтовый бэкенд")
+
+    def handle(self, *args, **options):
+        backend_kwargs = {}
+        if options["backend"] == "file":
+            backend_kwargs["file_path"] = tempfile.mkdtemp(prefix="benchmark_mailing_")
+        delivery = MailDelivery(
+            backend=BACKENDS[options["backend"]],
+            batch_size=options["batch_size"],
+            rate=options["rate"],
+            **backend_kwargs,
+        )
+        emails = [f"user{i}@example.com" for i in range(options["count"])]
+
+        started = time.perf_counter()
+        failed = delivery.send_mass_email(emails, "Курс обновлен", "Материалы курса обновлены")
+        elapsed = time.perf_counter() - started
+        delivery.close()
+
+        sent = len(emails) - len(failed)
+        self.stdout.write(
+            f"Отправлено: {sent}, ошибок: {len(failed)}, время: {elapsed:.3f} с, "
+            f"скорость: {sent / elapsed if elapsed else 0:.0f} писем/с"
+        )
+        if "file_path" in backend_kwargs:
+            self.stdout.write(f"Письма сохранены в {backend_kwargs['file_path']}")
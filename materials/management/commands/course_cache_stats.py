@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+
+from materials.cache import get_course_detail_stats
+
+
+class Command(BaseCommand):
+    """Вывод счетчиков кэша детального представления курсов."""
+    help = "Показывает число попаданий и промахов кэша детального представления курсов"
+
+    def handle(self, *args, **options):
+        stats = get_course_detail_stats()
+        self.stdout.write(
+            f"Попаданий: {stats['hits']}, промахов: {stats['misses']}, доля попаданий: {stats['hit_rate']:.1%}"
+        )
@@ -0,0 +1,227 @@
+import random
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models.sql import InsertQuery
+from django.utils import timezone
+
+from materials.models import Course, Lesson, Subscription
+from users.models import Payments, User
+
+PRICES = (990, 1990, 4990, 9990, 19990)
+METHODS = ("stripe", "transfer", "cash")
+METHOD_WEIGHTS = (70, 20, 10)
+
+
+def batch_random(seed: int, kind: str, batch: int) -> random.Random:
+    """Генератор случайных чисел пачки: данные не зависят от порядка выполнения пачек в потоках."""
+    return random.Random(f"{seed}:{kind}:{batch}")
+
+
+def popularity_weights(count: int, skew: float) -> list[float]:
+    """Накопленные веса закона Ципфа: курс с рангом r выбирается с весом 1 / r ** skew."""
+    return list(accumulate(1 / rank ** skew for rank in range(1, count + 1)))
+
+
+def power_law_count(rng: random.Random, mean: float, alpha: float, limit: int) -> int:
+    """Количество с распределением Парето: у большинства мало, у немногих очень много."""
+    scale = mean * (alpha - 1) / alpha
+    return min(int(rng.paretovariate(alpha) * scale), limit)
+
+
+class Command(BaseCommand):
+    """Генерация синтетических данных для нагрузочного тестирования."""
+    help = (
+        "Создает пользователей, курсы, уроки, подписки и платежи с неравномерным распределением. "
+        "Результат детерминирован значением --seed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=1, help="Зерно генератора, определяет все данные")
+        parser.add_argument("--users", type=int, default=100_000, help="Количество пользователей")
+        parser.add_argument("--courses", type=int, default=10_000, help="Количество курсов")
+        parser.add_argument("--lessons-per-course", type=float, default=10, help="Среднее число уроков в курсе")
+        parser.add_argument(
+            "--subscriptions-per-user", type=float, default=5, help="Среднее число подписок пользователя"
+        )
+        parser.add_argument("--payments-per-user", type=float, default=3, help="Среднее число платежей пользователя")
+        parser.add_argument("--skew", type=float, default=1.1, help="Показатель Ципфа для популярности курсов")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Строк в одном bulk_create")
+        parser.add_argument(
+            "--workers", type=int, default=4, help="Потоков вставки (для SQLite всегда 1: запись не параллелится)"
+        )
+        parser.add_argument(
+            "--now", type=datetime.fromisoformat, default=None,
+            help="Момент (ISO 8601), от которого отсчитываются даты; по умолчанию - время запуска. "
+                 "Одинаковые --seed и --now дают одинаковые данные",
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.seed = options["seed"]
+        # Даты входа и платежей отсчитываются назад от текущего момента: пользователи недавно
+        # активны (block_inactive_users не блокирует всех), платежи попадают в отчет о выручке
+        self.now = options["now"] or timezone.now()
+        if timezone.is_naive(self.now):
+            self.now = timezone.make_aware(self.now)
+        self.batch_size = options["batch_size"]
+        self.workers = 1 if connection.vendor == "sqlite" else max(options["workers"], 1)
+        if User.objects.filter(email__startswith=self.user_prefix()).exists():
+            raise CommandError(f"Данные для --seed {self.seed} уже сгенерированы, укажите другое значение")
+        started = time.perf_counter()
+
+        # Один хеш на всех пользователей: хеширование миллионов паролей не входит в задачу генератора
+        self.password = make_password(f"load-{self.seed}")
+        self.run_batches("users", options["users"], self.build_users)
+        self.user_ids = self.load_ids(User.objects, "email", self.user_prefix(), options["users"])
+
+        self.run_batches("courses", options["courses"], self.build_courses)
+        self.course_ids = self.load_ids(Course.objects, "name", self.course_prefix(), options["courses"])
+        self.course_owner_ids = self.load_ids(
+            Course.objects, "name", self.course_prefix(), options["courses"], value="owner_id"
+        )
+        self.course_weights = popularity_weights(len(self.course_ids), options["skew"])
+
+        self.run_batches("lessons", len(self.course_ids), self.build_lessons)
+        self.run_batches("subscriptions", len(self.user_ids), self.build_subscriptions)
+        self.run_batches("payments", len(self.user_ids), self.build_payments, self.insert_payments)
+
+        self.stdout.write(
+            f"Пользователей: {len(self.user_ids)}, курсов: {len(self.course_ids)}, "
+            f"время: {time.perf_counter() - started:.1f} с"
+        )
+
+    def user_prefix(self) -> str:
+        return f"load{self.seed}-"
+
+    def course_prefix(self) -> str:
+        return f"Курс {self.seed}-"
+
+    def load_ids(self, manager, field: str, prefix: str, total: int, value: str = "pk") -> array:
+        """Загружает первичные ключи (или другое целое поле value) созданных объектов в компактный массив.
+
+        Позиция ключа - номер объекта из поля field, а не порядок вставки: при нескольких
+        потоках пачки вставляются в произвольном порядке, а данные должны зависеть только от зерна."""
+        ids = array("q", bytes(8 * total))
+        rows = manager.filter(**{f"{field}__startswith": prefix}).values_list(value, field)
+        loaded = 0
+        for pk, value in rows.iterator(chunk_size=self.batch_size):
+            ids[int(value[len(prefix):].split("@")[0])] = pk
+            loaded += 1
+        if loaded != total:
+            raise CommandError(f"Создано {loaded} объектов из {total}")
+        return ids
+
+    def run_batches(self, kind: str, total: int, build, insert=None) -> None:
+        """Делит диапазон [0, total) на пачки и вставляет их в нескольких потоках."""
+        started = time.perf_counter()
+        insert = insert or self.insert_objects
+        batches = range((total + self.batch_size - 1) // self.batch_size)
+        if self.workers == 1:
+            inserted = sum(self.insert_batch(kind, batch, total, build, insert) for batch in batches)
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                inserted = sum(
+                    executor.map(lambda batch: self.insert_batch(kind, batch, total, build, insert), batches)
+                )
+        self.stdout.write(f"{kind}: {inserted} строк за {time.perf_counter() - started:.1f} с")
+
+    def insert_batch(self, kind: str, batch: int, total: int, build, insert) -> int:
+        """Генерирует и вставляет одну пачку, возвращает число строк."""
+        start = batch * self.batch_size
+        rng = batch_random(self.seed, kind, batch)
+        objects = build(rng, range(start, min(start + self.batch_size, total)))
+        if not objects:
+            return 0
+        try:
+            for offset in range(0, len(objects), self.batch_size):
+                insert(objects[offset:offset + self.batch_size])
+        finally:
+            if self.workers > 1:
+                # Соединение потока пула закрывается, чтобы не оставлять открытые соединения
+                connections.close_all()
+        return len(objects)
+
+    def insert_objects(self, objects: list) -> None:
+        type(objects[0]).objects.bulk_create(objects, ignore_conflicts=True)
+
+    def insert_payments(self, payments: list[Payments]) -> None:
+        """Вставляет платежи со сгенерированными датами одним INSERT на пачку.
+
+        bulk_create заменил бы date_payment текущим временем (auto_now), поэтому
+        вставка идет в режиме raw, как при loaddata: значения полей пишутся как есть."""
+        updated_at = timezone.now()
+        for payment in payments:
+            payment.updated_at = updated_at
+        fields = [field for field in Payments._meta.local_concrete_fields if not field.primary_key]
+        batch_size = max(connection.ops.bulk_batch_size(fields, payments), 1)
+        for offset in range(0, len(payments), batch_size):
+            query = InsertQuery(Payments)
+            query.insert_values(fields, payments[offset:offset + batch_size], raw=True)
+            query.get_compiler(connection=connection).execute_sql()
+
+    def build_users(self, rng: random.Random, numbers: range) -> list[User]:
+        joined = self.now - timedelta(days=730)
+        return [
+            User(
+                email=f"{self.user_prefix()}{number}@example.com",
+                password=self.password,
+                city=rng.choice(("Москва", "Санкт-Петербург", "Казань", "Новосибирск", "")),
+                date_joined=joined + timedelta(minutes=rng.randrange(730 * 24 * 60)),
+                last_login=self.now - timedelta(minutes=int(rng.expovariate(1 / (30 * 24 * 60)))),
+            )
+            for number in numbers
+        ]
+
+    def build_courses(self, rng: random.Random, numbers: range) -> list[Course]:
+        return [
+            Course(
+                name=f"{self.course_prefix()}{number}",
+                description=f"Описание курса {number}",
+                owner_id=rng.choice(self.user_ids),
+            )
+            for number in numbers
+        ]
+
+    def build_lessons(self, rng: random.Random, indexes: range) -> list[Lesson]:
+        mean = self.options["lessons_per_course"]
+        lessons = []
+        for index in indexes:
+            course_id, owner_id = self.course_ids[index], self.course_owner_ids[index]
+            for number in range(max(int(rng.gauss(mean, mean / 3)), 1)):
+                lessons.append(Lesson(name=f"Урок {number + 1}", course_id=course_id, owner_id=owner_id))
+        return lessons
+
+    def build_subscriptions(self, rng: random.Random, indexes: range) -> list[Subscription]:
+        subscriptions = []
+        limit = min(len(self.course_ids), 500)
+        for index in indexes:
+            count = power_law_count(rng, self.options["subscriptions_per_user"], 2.0, limit)
+            # Курсы одного пользователя не повторяются: уникальность (user, course) соблюдается без конфликтов
+            course_ids = set(rng.choices(self.course_ids, cum_weights=self.course_weights, k=count))
+            subscriptions.extend(
+                Subscription(user_id=self.user_ids[index], course_id=course_id, is_active=rng.random() < 0.9)
+                for course_id in course_ids
+            )
+        return subscriptions
+
+    def build_payments(self, rng: random.Random, indexes: range) -> list[Payments]:
+        payments = []
+        for index in indexes:
+            count = power_law_count(rng, self.options["payments_per_user"], 1.5, 1000)
+            for course_id in rng.choices(self.course_ids, cum_weights=self.course_weights, k=count):
+                payments.append(Payments(
+                    user_id=self.user_ids[index],
+                    course_paid_id=course_id,
+                    amount=rng.choice(PRICES),
+                    method_payment=rng.choices(METHODS, weights=METHOD_WEIGHTS)[0],
+                    status=Payments.STATUS_PAID,
+                    date_payment=self.now - timedelta(minutes=rng.randrange(365 * 24 * 60)),
+                ))
+        return payments
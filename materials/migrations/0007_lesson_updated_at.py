@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0006_course_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lesson",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
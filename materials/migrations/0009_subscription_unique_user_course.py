@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:04
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicate_subscriptions(apps, schema_editor):
+    """Оставляет одну подписку на пару пользователь-курс: активную, а из них самую раннюю."""
+    Subscription = apps.get_model("materials", "Subscription")
+    duplicates = (
+        Subscription.objects.values("user_id", "course_id")
+        .annotate(rows=Count("id"))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for pair in duplicates.iterator():
+        rows = Subscription.objects.filter(user_id=pair["user_id"], course_id=pair["course_id"])
+        keep = rows.order_by("-is_active", "id").values_list("id", flat=True).first()
+        rows.exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0008_owner_id_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subscription",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, verbose_name="Дата изменения"),
+        ),
+        migrations.RunPython(remove_duplicate_subscriptions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="subscription",
+            constraint=models.UniqueConstraint(fields=("user", "course"), name="subscription_user_course_unique"),
+        ),
+    ]
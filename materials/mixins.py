@@ -0,0 +1,107 @@
+import hashlib
+from datetime import datetime
+
+from django.db.models import QuerySet
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from users.roles import is_moderator
+
+
+class OwnerScopedQuerysetMixin:
+    """Ограничивает выборку списков объектами пользователя на уровне БД.
+
+    Владельцы получают только свои объекты (owner = request.user), модераторы - все.
+    Фильтр применяется к действиям из scoped_actions; представления без action
+    (например, ListAPIView) считаются списком."""
+    scoped_actions = ("list",)
+
+    def get_queryset(self) -> QuerySet:
+        queryset = super().get_queryset()
+        if getattr(self, "action", "list") not in self.scoped_actions:
+            return queryset
+        user = self.request.user
+        if not user.is_authenticated:
+            # Анонимный запрос (например, при генерации схемы swagger)
+            return queryset.none()
+        if is_moderator(self.request):
+            return queryset
+        return queryset.filter(owner=user)
+
+
+class ConditionalGetMixin:
+    """Поддержка условных GET-запросов (ETag / Last-Modified) для list и retrieve.
+
+    Валидаторы считаются до сериализации: для списка - агрегатным запросом по
+    отфильтрованному queryset, для объекта - по уже загруженному экземпляру.
+    Если клиент прислал совпадающий If-None-Match или If-Modified-Since,
+    возвращается 304 без создания сериализаторов. Без валидаторов (None)
+    ответ отдается как обычно, без ETag."""
+
+    def get_list_validators(self, queryset: QuerySet) -> list | None:
+        """Возвращает значения, от которых зависит ответ списка."""
+        return None
+
+    def get_object_validators(self, instance) -> list | None:
+        """Возвращает значения, от которых зависит ответ по объекту."""
+        return None
+
+    def get_object_last_modified(self, instance) -> datetime | None:
+        """Возвращает дату изменения объекта для заголовка Last-Modified.
+
+        По умолчанию не используется: дата пригодна, только если полностью
+        определяет ответ (например, не зависит от подписки пользователя)."""
+        return None
+
+    def make_etag(self, validators: list) -> str:
+        """Строит ETag из валидаторов, пользователя, адреса и формата ответа."""
+        request = self.request
+        parts = [request.user.pk, request.get_full_path(), request.accepted_renderer.format, *validators]
+        return '"%s"' % hashlib.md5(repr(parts).encode()).hexdigest()
+
+    def conditional_response(self, etag: str, last_modified: datetime | None = None) -> Response | None:
+        """Возвращает ответ 304, если у клиента актуальная версия, иначе None."""
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(self.request, etag=etag, last_modified=timestamp)
+        if response is not None:
+            self.set_validator_headers(response, etag, last_modified)
+        return response
+
+    def set_validator_headers(self, response, etag: str, last_modified: datetime | None = None):
+        """Добавляет в ответ заголовки ETag и Last-Modified."""
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified.timestamp())
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        validators = self.get_list_validators(queryset)
+        if validators is None:
+            return super().list(request, *args, **kwargs)
+        etag = self.make_etag(validators)
+        not_modified = self.conditional_response(etag)
+        if not_modified is not None:
+            return not_modified
+        return self.set_validator_headers(super().list(request, *args, **kwargs), etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        validators = self.get_object_validators(instance)
+        if validators is None:
+            return Response(self.get_object_data(instance))
+        etag = self.make_etag(validators)
+        last_modified = self.get_object_last_modified(instance)
+        not_modified = self.conditional_response(etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        return self.set_validator_headers(Response(self.get_object_data(instance)), etag, last_modified)
+
+    def get_object_data(self, instance):
+        """Сериализует объект для ответа retrieve."""
+        return self.get_serializer(self.prepare_instance(instance)).data
+
+    def prepare_instance(self, instance):
+        """Догружает связанные данные перед сериализацией объекта."""
+        return instance
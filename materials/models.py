@@ -37,6 +37,10 @@ class Course(models.Model):
     class Meta:
         verbose_name = "Курс"
         verbose_name_plural = "Курсы"
+        indexes = [
+            # Индекс для списка курсов владельца с пагинацией по id
+            models.Index(fields=["owner", "id"], name="course_owner_id_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -82,10 +86,15 @@ class Lesson(models.Model):
         verbose_name="Владелец",
         help_text="Укажите владельца",
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Урок"
         verbose_name_plural = "Уроки"
+        indexes = [
+            # Индекс для списка уроков владельца с пагинацией по id
+            models.Index(fields=["owner", "id"], name="lesson_owner_id_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -114,10 +123,18 @@ class Subscription(models.Model):
         auto_now_add=True,
         verbose_name="Дата создания"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата изменения"
+    )
 
     class Meta:
         verbose_name = "Подписка"
         verbose_name_plural = "Подписки"
+        constraints = [
+            # Одна строка подписки на пару пользователь-курс, повторная подписка меняет is_active
+            models.UniqueConstraint(fields=["user", "course"], name="subscription_user_course_unique"),
+        ]
 
     def __str__(self):
         return f'Подписка пользователя {self.user} на курс {self.course}'
\ No newline at end of file
@@ -1,8 +1,69 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
 
 
 class CourseLessonPagination(PageNumberPagination):
     """Пагинатор для постраничного вывода списка курсов и уроков."""
     page_size = 2
     page_size_query_param = 'page_size'
-    max_page_size = 10
\ No newline at end of file
+    max_page_size = 10
+
+
+class CourseLessonCursorPagination(CursorPagination):
+    """Курсорная (keyset) пагинация курсов и уроков по первичному ключу.
+
+    Не выполняет COUNT(*) и OFFSET: каждая страница читается по индексу
+    с условием id > курсора, поэтому глубокие страницы не дороже первой."""
+    page_size = 2
+    page_size_query_param = 'page_size'
+    max_page_size = 10
+    ordering = 'id'
+
+
+class CourseLessonSwitchablePagination(BasePagination):
+    """Пагинатор курсов и уроков с выбором режима через параметры запроса.
+
+    По умолчанию используется постраничный режим (page, count). Курсорный режим
+    включается параметром ?pagination=cursor или наличием параметра cursor,
+    который подставляется в ссылки next/previous."""
+    mode_query_param = 'pagination'
+    page_number_class = CourseLessonPagination
+    cursor_class = CourseLessonCursorPagination
+
+    def __init__(self):
+        self.paginator = self.page_number_class()
+
+    def get_paginator(self, request):
+        """Возвращает пагинатор выбранного в запросе режима."""
+        query_params = request.query_params
+        if query_params.get(self.mode_query_param) == 'cursor' or self.cursor_class.cursor_query_param in query_params:
+            return self.cursor_class()
+        return self.page_number_class()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.paginator.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        mode_parameter = {
+            'name': self.mode_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Режим пагинации: cursor - курсорная пагинация без подсчета общего количества',
+            'schema': {'type': 'string', 'enum': ['page', 'cursor']},
+        }
+        parameters = self.page_number_class().get_schema_operation_parameters(view)
+        names = {parameter['name'] for parameter in parameters}
+        parameters += [
+            parameter for parameter in self.cursor_class().get_schema_operation_parameters(view)
+            if parameter['name'] not in names
+        ]
+        return parameters + [mode_parameter]
+
+    def to_html(self):
+        return self.paginator.to_html()
@@ -25,8 +25,11 @@ class CourseSerializer(ModelSerializer):
     is_subscribed = SerializerMethodField()
 
     def get_is_subscribed(self, obj):
+        # Значение уже посчитано аннотацией в CourseViewSet.get_queryset
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         user = self.context['request'].user
-        return Subscription.objects.filter(user=user, course=obj).exists()
+        return Subscription.objects.filter(user=user, course=obj, is_active=True).exists()
 
     class Meta:
         """Метаданные сериализатора курса."""
@@ -52,12 +55,18 @@ class CourseDetailSerializer(ModelSerializer):
     is_subscribed = SerializerMethodField()
 
     def get_is_subscribed(self, obj):
+        # Значение уже посчитано аннотацией в CourseViewSet.get_queryset
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         user = self.context['request'].user
-        return Subscription.objects.filter(user=user, course=obj).exists()
+        return Subscription.objects.filter(user=user, course=obj, is_active=True).exists()
 
     def get_count_lessons(self, course):
         """Возвращает количество уроков в курсе."""
-        return course.lesson_set.count()
+        if hasattr(course, "count_lessons"):
+            return course.count_lessons
+        # Уроки уже предзагружены для поля lessons, отдельный COUNT не нужен
+        return len(course.lesson_set.all())
 
     class Meta:
         """Метаданные сериализатора курса."""
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from materials.models import Course, Subscription
+from materials.tasks import course_notification_pending_key, notify_course_subscribers
+
+
+def get_course_snapshot(course: Course) -> dict:
+    """Возвращает значения полей курса, важных для подписчиков."""
+    return {
+        field: course._meta.get_field(field).value_from_object(course)
+        for field in settings.COURSE_UPDATE_NOTIFY_FIELDS
+    }
+
+
+def get_changed_fields(snapshot: dict, course: Course) -> list[str]:
+    """Сравнивает сохраненный снимок с текущим состоянием курса и возвращает измененные поля."""
+    current = get_course_snapshot(course)
+    return [field for field, value in snapshot.items() if current[field] != value]
+
+
+def schedule_course_update_notification(course_id: int) -> None:
+    """Планирует уведомление подписчиков с объединением частых обновлений.
+
+    Признак запланированного уведомления хранится в общем кэше (Redis), поэтому
+    обновления одного курса из разных воркеров gunicorn в пределах окна
+    COURSE_UPDATE_NOTIFY_DELAY приводят к одной рассылке. Задача ставится после
+    фиксации транзакции и снимает признак в начале работы."""
+    delay = settings.COURSE_UPDATE_NOTIFY_DELAY
+
+    def schedule() -> None:
+        if not delay:
+            notify_course_subscribers.delay(course_id)
+            return
+        # Запас по времени жизни ключа на случай задержки задачи в очереди
+        if cache.add(course_notification_pending_key(course_id), True, timeout=delay * 2):
+            notify_course_subscribers.apply_async((course_id,), countdown=delay)
+
+    transaction.on_commit(schedule)
+
+
+def toggle_subscription(user, course_id: int) -> bool | None:
+    """Подписывает пользователя на курс или отписывает от него одним SQL-запросом.
+
+    Строка подписки создается при первой подписке, дальше переключается флаг is_active
+    (INSERT ... ON CONFLICT DO UPDATE по уникальному ограничению user+course).
+    Вставка идет через SELECT из таблицы курсов, поэтому для несуществующего курса
+    запрос ничего не меняет. Возвращает новое значение is_active или None, если курса нет."""
+    now = timezone.now()
+    if connection.vendor not in ("postgresql", "sqlite"):
+        return _toggle_subscription_orm(user, course_id, now)
+
+    qn = connection.ops.quote_name
+    subscription_table = qn(Subscription._meta.db_table)
+    sql = (
+        f"INSERT INTO {subscription_table} "
+        f"({qn('user_id')}, {qn('course_id')}, {qn('is_active')}, {qn('created_at')}, {qn('updated_at')}) "
+        f"SELECT %s, {qn('id')}, %s, %s, %s FROM {qn(Course._meta.db_table)} WHERE {qn('id')} = %s "
+        f"ON CONFLICT ({qn('user_id')}, {qn('course_id')}) DO UPDATE SET "
+        f"{qn('is_active')} = NOT {subscription_table}.{qn('is_active')}, "
+        f"{qn('updated_at')} = EXCLUDED.{qn('updated_at')} "
+        f"RETURNING {qn('is_active')}"
+    )
+    timestamp = connection.ops.adapt_datetimefield_value(now)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user.pk, True, timestamp, timestamp, course_id])
+        row = cursor.fetchone()
+    return bool(row[0]) if row else None
+
+
+def _toggle_subscription_orm(user, course_id: int, now) -> bool | None:
+    """Переключение подписки для СУБД без INSERT ... ON CONFLICT: блокировка строки в транзакции."""
+    if not Course.objects.filter(pk=course_id).exists():
+        return None
+    with transaction.atomic():
+        subscription, created = Subscription.objects.select_for_update().get_or_create(
+            user=user, course_id=course_id
+        )
+        if not created:
+            subscription.is_active = not subscription.is_active
+            subscription.updated_at = now
+            subscription.save(update_fields=["is_active", "updated_at"])
+    return subscription.is_active
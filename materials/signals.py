@@ -0,0 +1,53 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from materials.cache import invalidate_course_detail
+from materials.models import Course, Lesson
+
+
+def touch_courses(*course_ids) -> None:
+    """Обновляет updated_at курсов одним UPDATE без вызова save()."""
+    course_ids = {course_id for course_id in course_ids if course_id}
+    if course_ids:
+        Course.objects.filter(pk__in=course_ids).update(updated_at=timezone.now())
+
+
+def invalidate_courses_on_commit(*course_ids) -> None:
+    """Сбрасывает кэш курсов после фиксации транзакции.
+
+    Удаление внутри транзакции позволило бы параллельному запросу снова закэшировать
+    еще не зафиксированное состояние."""
+    transaction.on_commit(lambda: invalidate_course_detail(*course_ids))
+
+
+@receiver(pre_save, sender=Lesson)
+def remember_lesson_course(sender, instance, **kwargs):
+    """Запоминает прежний курс урока, чтобы при переносе обновить и его."""
+    if instance.pk:
+        instance._previous_course_id = (
+            Lesson.objects.filter(pk=instance.pk).values_list("course_id", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Lesson)
+def touch_course_on_lesson_save(sender, instance, **kwargs):
+    """Изменение урока считается изменением его курса."""
+    course_ids = (instance.course_id, getattr(instance, "_previous_course_id", None))
+    touch_courses(*course_ids)
+    invalidate_courses_on_commit(*course_ids)
+
+
+@receiver(post_delete, sender=Lesson)
+def touch_course_on_lesson_delete(sender, instance, **kwargs):
+    """Удаление урока считается изменением его курса."""
+    touch_courses(instance.course_id)
+    invalidate_courses_on_commit(instance.course_id)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course_on_change(sender, instance, **kwargs):
+    """Сбрасывает кэш детального представления измененного или удаленного курса."""
+    invalidate_courses_on_commit(instance.pk)
@@ -1,32 +1,136 @@
-from datetime import timedelta
+import logging
+import time
+from datetime import datetime, timedelta
 
 from celery import shared_task
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 
-from users.models import User
+from materials.mailing import get_delivery
+from materials.models import Course, Subscription
+from users.models import Checkpoint, User
 
+logger = logging.getLogger(__name__)
 
-@shared_task
-def send_email_about_update_the_course_materials(email, subject, message):
+
+def course_notification_pending_key(course_id):
+    """Ключ кэша с признаком запланированного уведомления об обновлении курса."""
+    return f"materials:course-notify-pending:{course_id}"
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def send_email_about_update_the_course_materials(self, email, subject, message):
     """Асинхронная рассылка писем всем подписчикам курса об обновлении."""
-    send_mail(
-        subject=subject,
-        message=message,
-        from_email=settings.EMAIL_HOST_USER,
-        recipient_list=[email],
-        fail_silently=False,
+    if get_delivery().send_mass_email([email], subject, message):
+        raise self.retry()
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def send_email_about_update_the_course_materials_batch(self, emails, subject, message):
+    """Рассылка письма об обновлении курса пачке подписчиков через постоянное соединение воркера.
+
+    Каждый получатель получает отдельное письмо, адреса других подписчиков не раскрываются.
+    Повторная попытка выполняется только для адресов, которым письмо не ушло."""
+    failed = get_delivery().send_mass_email(emails, subject, message)
+    if failed:
+        raise self.retry(args=(failed, subject, message))
+    return len(emails)
+
+
+@shared_task
+def notify_course_subscribers(course_id):
+    """Рассылает уведомление об обновлении курса всем активным подписчикам.
+
+    Адреса подписчиков читаются из БД порциями через values_list, на каждую порцию
+    ставится одна задача пакетной отправки. Число сообщений в брокере пропорционально
+    числу порций, а не числу подписчиков."""
+    # Снимаем признак ожидания: обновления во время рассылки запланируют новое уведомление
+    cache.delete(course_notification_pending_key(course_id))
+    course_name = Course.objects.filter(pk=course_id).values_list("name", flat=True).first()
+    if course_name is None:
+        # Курс удален до запуска задачи
+        return 0
+
+    chunk_size = settings.COURSE_UPDATE_NOTIFY_CHUNK_SIZE
+    subject = "Курс обновлен"
+    message = f"Материалы курса '{course_name}' обновлены, проверь свои подписки!"
+    emails = (
+        Subscription.objects.filter(course_id=course_id, is_active=True)
+        .order_by("pk")
+        .values_list("user__email", flat=True)
+        .iterator(chunk_size=chunk_size)
     )
 
+    chunks = 0
+    chunk = []
+    for email in emails:
+        chunk.append(email)
+        if len(chunk) == chunk_size:
+            send_email_about_update_the_course_materials_batch.delay(chunk, subject, message)
+            chunks += 1
+            chunk = []
+    if chunk:
+        send_email_about_update_the_course_materials_batch.delay(chunk, subject, message)
+        chunks += 1
+    return chunks
+
+
+BLOCK_INACTIVE_USERS_CHECKPOINT = "block_inactive_users"
+
 
 @shared_task
 def block_inactive_users():
-    """Блокировка пользователей, которые не заходили более месяца."""
-    # Рассчитываем дату, которая была 30 дней назад
-    month_ago = timezone.now() - timedelta(days=30)
-
-    # Находим пользователей, которые не заходили более месяца и еще активны
-    inactive_users = User.objects.filter(last_login__lt=month_ago, is_active=True)
-    # Блокируем пользователей
-    inactive_users.update(is_active=False)
+    """Блокировка пользователей, которые не заходили более месяца.
+
+    Пользователи обходятся пакетами по частичному индексу (last_login) WHERE is_active
+    в порядке (last_login, id), каждый пакет блокируется в отдельной короткой транзакции.
+    Граница и позиция обхода сохраняются в Checkpoint вместе с пакетом: после падения
+    воркера следующий запуск продолжает с той же позиции. Возвращает сводку."""
+    started = time.monotonic()
+    batch_size = settings.BLOCK_INACTIVE_USERS_BATCH_SIZE
+    checkpoint, _ = Checkpoint.objects.get_or_create(name=BLOCK_INACTIVE_USERS_CHECKPOINT)
+    progress = checkpoint.value
+    resumed = "cutoff" in progress
+    if not resumed:
+        # Рассчитываем дату, которая была 30 дней назад
+        progress = {"cutoff": (timezone.now() - timedelta(days=30)).isoformat(), "blocked": 0, "batches": 0}
+    cutoff = datetime.fromisoformat(progress["cutoff"])
+
+    while True:
+        # Находим пользователей, которые не заходили более месяца и еще активны, после позиции обхода
+        candidates = User.objects.filter(is_active=True, last_login__lt=cutoff)
+        if "last_login" in progress:
+            position = datetime.fromisoformat(progress["last_login"])
+            candidates = candidates.filter(
+                Q(last_login__gt=position) | Q(last_login=position, pk__gt=progress["last_id"])
+            )
+        batch = list(candidates.order_by("last_login", "pk").values_list("pk", "last_login")[:batch_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            # Условие повторяется: пользователь мог войти, пока читался пакет
+            blocked = User.objects.filter(
+                pk__in=[pk for pk, _ in batch], is_active=True, last_login__lt=cutoff
+            ).update(is_active=False)
+            progress["blocked"] += blocked
+            progress["batches"] += 1
+            progress["last_id"] = batch[-1][0]
+            progress["last_login"] = batch[-1][1].isoformat()
+            Checkpoint.objects.filter(pk=checkpoint.pk).update(value=progress, updated_at=timezone.now())
+
+    summary = {
+        "blocked": progress["blocked"],
+        "batches": progress["batches"],
+        "resumed": resumed,
+        "duration": round(time.monotonic() - started, 3),
+    }
+    # Обход завершен: следующий запуск начнется с новой границы
+    Checkpoint.objects.filter(pk=checkpoint.pk).update(value={"last_run": summary}, updated_at=timezone.now())
+    logger.info(
+        "Заблокировано неактивных пользователей: %s, пакетов: %s, время: %s с",
+        summary["blocked"], summary["batches"], summary["duration"],
+    )
+    return summary
@@ -1,10 +1,33 @@
+import smtplib
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends import locmem
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.db.models import Count, F, Max, Min
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
 
+from materials.cache import get_course_detail_stats
+from materials.mailing import MailDelivery, RateLimiter
+from materials.management.commands.generate_load_data import Command as GenerateLoadDataCommand
+from materials.mixins import ConditionalGetMixin
 from materials.models import Course, Lesson, Subscription
+from materials.serializers import CourseDetailSerializer, CourseSerializer, LessonSerializer
+from materials.tasks import (BLOCK_INACTIVE_USERS_CHECKPOINT, block_inactive_users, notify_course_subscribers,
+                             send_email_about_update_the_course_materials_batch)
 from materials.validators import URLValidator
-from users.models import User
+from users.models import Checkpoint, Payments, User
 
 
 class LessonTestCase(APITestCase):
@@ -134,7 +157,8 @@ class LessonTestCase(APITestCase):
                     'picture': None,
                     'video_url': None,
                     'course': self.course.id,
-                    'owner': self.user.id
+                    'owner': self.user.id,
+                    'updated_at': data['results'][0]['updated_at'],
                 }
             ]
         }
@@ -158,6 +182,7 @@ class CourseTestCase(APITestCase):
         """Настройка тестовых данных для тестов курсов.
         Создает пользователя, курс и урок для тестирования.
         """
+        cache.clear()
         self.user = User.objects.create(email="email_test@test.com")
         self.course = Course.objects.create(name="Test-course", owner=self.user)
         self.lesson = Lesson.objects.create(name="Test-lesson", course=self.course, owner=self.user)
@@ -239,7 +264,8 @@ class CourseTestCase(APITestCase):
                     'name': self.course.name,
                     'picture': None,
                     'description': None,
-                    'owner': self.user.id
+                    'owner': self.user.id,
+                    'updated_at': data['results'][0]['updated_at'],
                 }
             ]
         }
@@ -256,6 +282,54 @@ class CourseTestCase(APITestCase):
             self.course.name
         )
 
+    def test_course_list_cursor_mode(self):
+        """Курсорный режим отдает страницы по ссылкам next без подсчета количества."""
+        courses = [self.course] + [Course.objects.create(name=f"Course-{i}", owner=self.user) for i in range(4)]
+        url = reverse("materials:course-list")
+        response = self.client.get(url, {"pagination": "cursor"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+        self.assertIsNone(response.data["previous"])
+
+        received = [course["id"] for course in response.data["results"]]
+        with CaptureQueriesContext(connection) as context:
+            while response.data["next"]:
+                response = self.client.get(response.data["next"])
+                received += [course["id"] for course in response.data["results"]]
+        self.assertEqual(received, [course.id for course in courses])
+        self.assertFalse(any("COUNT(*)" in query["sql"] for query in context.captured_queries))
+
+    def _count_queries(self, url):
+        """Возвращает количество SQL-запросов, выполненных при GET-запросе."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_course_list_constant_queries(self):
+        """Количество запросов в списке курсов не зависит от размера страницы."""
+        url = reverse("materials:course-list")
+        for i in range(10):
+            course = Course.objects.create(name=f"Course-{i}", owner=self.user)
+            Subscription.objects.create(user=self.user, course=course)
+        small_page = self._count_queries(f"{url}?page_size=1")
+        large_page = self._count_queries(f"{url}?page_size=10")
+        self.assertEqual(small_page, large_page)
+
+    def test_course_retrieve_constant_queries(self):
+        """Количество запросов в детальном просмотре не зависит от числа уроков."""
+        url = reverse("materials:course-detail", args=(self.course.pk,))
+        Subscription.objects.create(user=self.user, course=self.course)
+        few_lessons = self._count_queries(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(10):
+                Lesson.objects.create(name=f"Lesson-{i}", course=self.course, owner=self.user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(len(context.captured_queries), few_lessons)
+        self.assertEqual(response.data["count_lessons"], 11)
+        self.assertTrue(response.data["is_subscribed"])
+
 
 class SubscriptionTestCase(APITestCase):
     """Тесты для функционала подписок на курсы."""
@@ -308,11 +382,41 @@ class SubscriptionTestCase(APITestCase):
             "подписка удалена"
         )
 
-        # Проверяем, что подписки нет в БД
+        # Проверяем, что активной подписки нет в БД, строка осталась неактивной
         self.assertEqual(
-            Subscription.objects.count(),
+            Subscription.objects.filter(is_active=True).count(),
             0
         )
+        self.assertEqual(
+            Subscription.objects.count(),
+            1
+        )
+
+    def test_subscription_resubscribe_reuses_row(self):
+        """Повторная подписка переключает is_active существующей строки одним запросом."""
+        url = reverse("materials:subscriptions")
+        data = {"course_id": self.course.pk}
+        messages = []
+        for _ in range(3):
+            with CaptureQueriesContext(connection) as context:
+                messages.append(self.client.post(url, data).data["message"])
+            self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(messages, ["подписка добавлена", "подписка удалена", "подписка добавлена"])
+        subscription = Subscription.objects.get(user=self.user, course=self.course)
+        self.assertTrue(subscription.is_active)
+
+    def test_subscription_unknown_course(self):
+        """Подписка на несуществующий курс возвращает 404 и ничего не создает."""
+        url = reverse("materials:subscriptions")
+        response = self.client.post(url, {"course_id": self.course.pk + 100})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Subscription.objects.exists())
+
+    def test_subscription_unique_per_user_and_course(self):
+        """База не допускает двух строк подписки на одну пару пользователь-курс."""
+        Subscription.objects.create(user=self.user, course=self.course)
+        with self.assertRaises(IntegrityError):
+            Subscription.objects.create(user=self.user, course=self.course)
 
     def test_subscription_create_without_course_id(self):
         """Тест создания подписки без course_id (должна быть ошибка 400)."""
@@ -326,4 +430,442 @@ class SubscriptionTestCase(APITestCase):
         self.assertEqual(
             response.data["error"],
             "course_id обязателен"
-        )
\ No newline at end of file
+        )
+
+
+@override_settings(COURSE_UPDATE_NOTIFY_DELAY=300)
+class CourseUpdateNotificationTestCase(APITestCase):
+    """Тесты рассылки уведомлений об обновлении курса."""
+    def setUp(self):
+        """Создает владельца курса и пять подписчиков, один из которых неактивен."""
+        cache.clear()
+        self.user = User.objects.create(email="owner@test.com")
+        self.course = Course.objects.create(name="Test-course", owner=self.user)
+        for i in range(5):
+            subscriber = User.objects.create(email=f"subscriber{i}@test.com")
+            Subscription.objects.create(user=subscriber, course=self.course, is_active=i != 0)
+        self.client.force_authenticate(user=self.user)
+
+    def _patch_course(self, data):
+        """Обновляет курс и возвращает мок постановки задачи рассылки."""
+        url = reverse("materials:course-detail", args=(self.course.pk,))
+        with mock.patch("materials.services.notify_course_subscribers") as task:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(url, data)
+                task.apply_async.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return task
+
+    def test_update_enqueues_single_task_after_commit(self):
+        """Обновление курса ставит одну отложенную задачу рассылки и только после commit."""
+        task = self._patch_course({"name": "New name"})
+        task.apply_async.assert_called_once_with((self.course.pk,), countdown=300)
+
+    def test_updates_within_window_are_coalesced(self):
+        """Повторные обновления в пределах окна не ставят новых задач."""
+        first = self._patch_course({"name": "New name"})
+        second = self._patch_course({"description": "New description"})
+        first.apply_async.assert_called_once()
+        second.apply_async.assert_not_called()
+
+        # После запуска задачи признак ожидания снимается
+        with mock.patch("materials.tasks.send_email_about_update_the_course_materials_batch"):
+            notify_course_subscribers(self.course.pk)
+        third = self._patch_course({"name": "Newer name"})
+        third.apply_async.assert_called_once()
+
+    def test_update_without_relevant_changes_does_not_notify(self):
+        """Обновление без изменения важных для подписчиков полей не планирует рассылку."""
+        task = self._patch_course({"name": self.course.name})
+        task.apply_async.assert_not_called()
+        task.delay.assert_not_called()
+
+    @override_settings(COURSE_UPDATE_NOTIFY_DELAY=0)
+    def test_zero_window_sends_immediately(self):
+        """Без окна объединения рассылка ставится сразу после commit."""
+        task = self._patch_course({"name": "New name"})
+        task.delay.assert_called_once_with(self.course.pk)
+
+    @override_settings(COURSE_UPDATE_NOTIFY_CHUNK_SIZE=3)
+    def test_notify_dispatches_chunks_of_active_subscribers(self):
+        """Адреса активных подписчиков отправляются порциями заданного размера."""
+        path = "materials.tasks.send_email_about_update_the_course_materials_batch.delay"
+        with mock.patch(path) as delay:
+            chunks = notify_course_subscribers(self.course.pk)
+        self.assertEqual(chunks, 2)
+        emails = [email for call in delay.call_args_list for email in call.args[0]]
+        self.assertEqual(len(delay.call_args_list[0].args[0]), 3)
+        self.assertEqual(sorted(emails), [f"subscriber{i}@test.com" for i in range(1, 5)])
+
+    def test_batch_sends_separate_message_per_recipient(self):
+        """Каждый подписчик из пачки получает отдельное письмо."""
+        send_email_about_update_the_course_materials_batch(["a@test.com", "b@test.com"], "Тема", "Текст")
+        self.assertEqual([message.to for message in mail.outbox], [["a@test.com"], ["b@test.com"]])
+
+
+class FlakyEmailBackend(locmem.EmailBackend):
+    """Бэкенд, который, как SMTP, отправляет письма по очереди и падает на письме с особым адресом."""
+    # Адреса, на которых соединение обрывается один раз: сервер закрыл простаивавшее соединение
+    disconnect_once = set()
+
+    def send_messages(self, messages):
+        sent = 0
+        for message in messages:
+            if message.to[0] in self.disconnect_once:
+                self.disconnect_once.discard(message.to[0])
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            if message.to == ["bad@test.com"]:
+                raise smtplib.SMTPRecipientsRefused({"bad@test.com": (550, b"rejected")})
+            if message.to == ["disconnect@test.com"]:
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            sent += super().send_messages([message])
+        return sent
+
+
+class MailDeliveryTestCase(APITestCase):
+    """Тесты пакетной отправки писем через постоянное соединение."""
+    def test_messages_sent_in_batches_over_one_connection(self):
+        """Письма уходят пачками через одно соединение, которое остается открытым."""
+        delivery = MailDelivery(batch_size=2, rate=0)
+        failed = delivery.send_mass_email(["a@test.com", "b@test.com", "c@test.com"], "Тема", "Текст")
+        connection = delivery.connection
+        delivery.send_mass_email(["d@test.com"], "Тема", "Текст")
+        self.assertEqual(failed, [])
+        self.assertIs(delivery.connection, connection)
+        self.assertEqual(len(mail.outbox), 4)
+
+    def test_only_failed_recipients_are_returned(self):
+        """При ошибке на письме в середине пачки возвращается только его адрес, остальные уходят один раз."""
+        delivery = MailDelivery(backend="materials.tests.FlakyEmailBackend", batch_size=10, rate=0)
+        emails = ["a@test.com", "b@test.com", "bad@test.com", "c@test.com"]
+        failed = delivery.send_mass_email(emails, "Тема", "Текст")
+        self.assertEqual(failed, ["bad@test.com"])
+        self.assertEqual([message.to for message in mail.outbox], [["a@test.com"], ["b@test.com"], ["c@test.com"]])
+
+    def test_disconnect_reopens_connection(self):
+        """После обрыва соединение открывается заново, уже отправленные письма не повторяются."""
+        delivery = MailDelivery(backend="materials.tests.FlakyEmailBackend", batch_size=10, rate=0)
+        emails = ["a@test.com", "disconnect@test.com", "c@test.com"]
+        failed = delivery.send_mass_email(emails, "Тема", "Текст")
+        self.assertEqual(failed, ["disconnect@test.com"])
+        self.assertEqual([message.to for message in mail.outbox], [["a@test.com"], ["c@test.com"]])
+
+    def test_idle_disconnect_resent_immediately(self):
+        """Письмо, на котором оборвалось простаивавшее соединение, отправляется сразу через новое соединение."""
+        delivery = MailDelivery(backend="materials.tests.FlakyEmailBackend", batch_size=10, rate=0)
+        delivery.send_mass_email(["a@test.com"], "Тема", "Текст")
+        connection = delivery.connection
+        with mock.patch.object(FlakyEmailBackend, "disconnect_once", {"b@test.com"}):
+            failed = delivery.send_mass_email(["b@test.com", "c@test.com"], "Тема", "Текст")
+        self.assertEqual(failed, [])
+        self.assertIsNot(delivery.connection, connection)
+        self.assertEqual([message.to for message in mail.outbox], [["a@test.com"], ["b@test.com"], ["c@test.com"]])
+
+    def test_batch_task_retries_failed_recipients_only(self):
+        """Задача пакетной рассылки повторяется только для неотправленных адресов."""
+        task = send_email_about_update_the_course_materials_batch
+        with mock.patch("materials.tasks.get_delivery") as get_delivery, \
+                mock.patch.object(task, "retry", side_effect=RuntimeError) as retry:
+            get_delivery.return_value.send_mass_email.return_value = ["bad@test.com"]
+            with self.assertRaises(RuntimeError):
+                task(["a@test.com", "bad@test.com"], "Тема", "Текст")
+        retry.assert_called_once_with(args=(["bad@test.com"], "Тема", "Текст"))
+
+    def test_rate_limiter_waits_for_tokens(self):
+        """Ограничитель ждет, когда запрошено больше писем, чем позволяет квота."""
+        limiter = RateLimiter(rate=10, burst=10)
+        with mock.patch("materials.mailing.time.sleep") as sleep:
+            limiter.acquire(10)
+            sleep.assert_not_called()
+            limiter.acquire(5)
+        self.assertTrue(sleep.called)
+
+
+class ConditionalGetTestCase(APITestCase):
+    """Тесты условных GET-запросов по ETag и Last-Modified."""
+    def setUp(self):
+        """Создает пользователя, курс и урок."""
+        self.user = User.objects.create(email="email_test@test.com")
+        self.course = Course.objects.create(name="Test-course", owner=self.user)
+        self.lesson = Lesson.objects.create(name="Test-lesson", course=self.course, owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_course_retrieve_not_modified_without_serialization(self):
+        """Совпадающий If-None-Match возвращает 304 без вызова сериализатора."""
+        url = reverse("materials:course-detail", args=(self.course.pk,))
+        etag = self.client.get(url)["ETag"]
+        with mock.patch.object(CourseDetailSerializer, "to_representation") as to_representation:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        to_representation.assert_not_called()
+
+    def test_course_etag_changes_on_lesson_update_and_subscription(self):
+        """Изменение урока и подписка пользователя меняют ETag курса."""
+        url = reverse("materials:course-detail", args=(self.course.pk,))
+        etag = self.client.get(url)["ETag"]
+
+        self.lesson.name = "Renamed lesson"
+        self.lesson.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = response["ETag"]
+        Subscription.objects.create(user=self.user, course=self.course)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["is_subscribed"])
+
+    def test_course_list_not_modified_until_new_course(self):
+        """Список курсов возвращает 304, пока не изменился набор курсов."""
+        url = reverse("materials:course-list")
+        etag = self.client.get(url)["ETag"]
+        with mock.patch.object(CourseSerializer, "to_representation") as to_representation:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        to_representation.assert_not_called()
+
+        Course.objects.create(name="Another course", owner=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_lesson_retrieve_if_modified_since(self):
+        """Урок поддерживает Last-Modified и If-Modified-Since."""
+        url = reverse("materials:lessons_retrieve", args=(self.lesson.pk,))
+        response = self.client.get(url)
+        self.assertIn("Last-Modified", response)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_lesson_list_etag_changes_on_delete(self):
+        """Удаление урока меняет ETag списка уроков."""
+        url = reverse("materials:lessons_list")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.lesson.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_views_without_validators_skip_etag(self):
+        """Представление без валидаторов отдает обычный ответ без ETag."""
+        factory = APIRequestFactory()
+        views = {
+            "list": type("PlainLessonList", (ConditionalGetMixin, ListAPIView), {
+                "queryset": Lesson.objects.all(), "serializer_class": LessonSerializer
+            }).as_view(),
+            "retrieve": type("PlainLessonRetrieve", (ConditionalGetMixin, RetrieveAPIView), {
+                "queryset": Lesson.objects.all(), "serializer_class": LessonSerializer
+            }).as_view(),
+        }
+        for action, view in views.items():
+            with self.subTest(action=action):
+                request = factory.get("/", HTTP_IF_NONE_MATCH="*")
+                force_authenticate(request, user=self.user)
+                response = view(request, pk=self.lesson.pk)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotIn("ETag", response)
+
+
+class CourseDetailCacheTestCase(APITestCase):
+    """Тесты кэширования детального представления курса."""
+    def setUp(self):
+        """Создает владельца и модератора, курс и урок; подписан только владелец."""
+        cache.clear()
+        self.user = User.objects.create(email="email_test@test.com")
+        self.other_user = User.objects.create(email="other@test.com")
+        self.other_user.groups.add(Group.objects.create(name="moderators"))
+        self.course = Course.objects.create(name="Test-course", owner=self.user)
+        self.lesson = Lesson.objects.create(name="Test-lesson", course=self.course, owner=self.user)
+        Subscription.objects.create(user=self.user, course=self.course)
+        self.url = reverse("materials:course-detail", args=(self.course.pk,))
+
+    def _get(self, user):
+        """Запрашивает курс от имени пользователя."""
+        self.client.force_authenticate(user=user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_cached_entry_shared_with_per_user_subscription(self):
+        """Один элемент кэша обслуживает всех пользователей, признак подписки у каждого свой."""
+        self.assertTrue(self._get(self.user)["is_subscribed"])
+        with mock.patch.object(CourseDetailSerializer, "to_representation") as to_representation:
+            data = self._get(self.other_user)
+        to_representation.assert_not_called()
+        self.assertFalse(data["is_subscribed"])
+        self.assertEqual(data["count_lessons"], 1)
+        self.assertEqual(get_course_detail_stats(), {"hits": 1, "misses": 1, "hit_rate": 0.5})
+
+    def test_lesson_and_course_changes_invalidate_cache(self):
+        """Изменение урока или курса сбрасывает кэш после фиксации транзакции."""
+        self._get(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.create(name="Second lesson", course=self.course, owner=self.user)
+        self.assertEqual(self._get(self.user)["count_lessons"], 2)
+
+        self.course.name = "Renamed course"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.save()
+        self.assertEqual(self._get(self.user)["name"], "Renamed course")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lesson.delete()
+        self.assertEqual([lesson["name"] for lesson in self._get(self.user)["lessons"]], ["Second lesson"])
+        self.assertEqual(get_course_detail_stats()["hits"], 0)
+
+    def test_cache_kept_until_commit(self):
+        """До фиксации транзакции кэш не сбрасывается."""
+        self._get(self.user)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Lesson.objects.create(name="Second lesson", course=self.course, owner=self.user)
+            self.assertEqual(self._get(self.user)["count_lessons"], 1)
+        self.assertEqual(len(callbacks), 1)
+
+    def test_picture_url_built_for_each_request(self):
+        """В кэше хранится относительная ссылка, абсолютная строится по хосту запроса."""
+        Lesson.objects.filter(pk=self.lesson.pk).update(picture="materials/lessons/preview.png")
+        self.client.force_authenticate(user=self.user)
+        first = self.client.get(self.url, HTTP_HOST="localhost").data
+        second = self.client.get(self.url, HTTP_HOST="127.0.0.1").data
+        self.assertEqual(first["lessons"][0]["picture"], "http://localhost/media/materials/lessons/preview.png")
+        self.assertEqual(second["lessons"][0]["picture"], "http://127.0.0.1/media/materials/lessons/preview.png")
+        self.assertEqual(get_course_detail_stats()["hits"], 1)
+
+
+class OwnerScopedListTestCase(APITestCase):
+    """Тесты ограничения списков курсов и уроков владельцем."""
+    def setUp(self):
+        """Создает двух владельцев со своими курсами и уроками и модератора."""
+        self.user = User.objects.create(email="email_test@test.com")
+        self.stranger = User.objects.create(email="stranger@test.com")
+        self.moderator = User.objects.create(email="moderator@test.com")
+        self.moderator.groups.add(Group.objects.create(name="moderators"))
+        self.course = Course.objects.create(name="Own course", owner=self.user)
+        self.lesson = Lesson.objects.create(name="Own lesson", course=self.course, owner=self.user)
+        foreign_course = Course.objects.create(name="Foreign course", owner=self.stranger)
+        Lesson.objects.create(name="Foreign lesson", course=foreign_course, owner=self.stranger)
+
+    def _ids(self, user, url_name):
+        """Возвращает id объектов из списка, видимого пользователю."""
+        self.client.force_authenticate(user=user)
+        response = self.client.get(reverse(url_name), {"page_size": 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["id"] for item in response.data["results"]]
+
+    def test_owner_sees_only_own_objects(self):
+        """Владелец видит в списках только свои курсы и уроки."""
+        self.assertEqual(self._ids(self.user, "materials:course-list"), [self.course.id])
+        self.assertEqual(self._ids(self.user, "materials:lessons_list"), [self.lesson.id])
+
+    def test_moderator_sees_all_objects(self):
+        """Модератор видит все курсы и уроки."""
+        self.assertEqual(len(self._ids(self.moderator, "materials:course-list")), 2)
+        self.assertEqual(len(self._ids(self.moderator, "materials:lessons_list")), 2)
+
+
+@override_settings(BLOCK_INACTIVE_USERS_BATCH_SIZE=2)
+class BlockInactiveUsersTestCase(APITestCase):
+    """Тесты пакетной блокировки неактивных пользователей."""
+    def setUp(self):
+        """Создает пять давно не заходивших пользователей и одного активного."""
+        now = timezone.now()
+        self.inactive = [
+            User.objects.create(email=f"inactive{i}@test.com", last_login=now - timedelta(days=40 + i))
+            for i in range(5)
+        ]
+        self.recent = User.objects.create(email="recent@test.com", last_login=now - timedelta(days=1))
+
+    def test_blocks_in_batches(self):
+        """Неактивные пользователи блокируются пакетами, остальные не затрагиваются."""
+        summary = block_inactive_users()
+        self.assertEqual(summary["blocked"], 5)
+        self.assertEqual(summary["batches"], 3)
+        self.assertFalse(summary["resumed"])
+        self.assertFalse(User.objects.filter(pk__in=[user.pk for user in self.inactive], is_active=True).exists())
+        self.recent.refresh_from_db()
+        self.assertTrue(self.recent.is_active)
+        checkpoint = Checkpoint.objects.get(name=BLOCK_INACTIVE_USERS_CHECKPOINT)
+        self.assertEqual(checkpoint.value, {"last_run": summary})
+
+    def test_resumes_from_checkpoint(self):
+        """После прерванного запуска обход продолжается с сохраненной позиции."""
+        oldest = sorted(self.inactive, key=lambda user: user.last_login)[:2]
+        User.objects.filter(pk__in=[user.pk for user in oldest]).update(is_active=False)
+        Checkpoint.objects.create(name=BLOCK_INACTIVE_USERS_CHECKPOINT, value={
+            "cutoff": (timezone.now() - timedelta(days=30)).isoformat(),
+            "blocked": 2,
+            "batches": 1,
+            "last_id": oldest[-1].pk,
+            "last_login": oldest[-1].last_login.isoformat(),
+        })
+        summary = block_inactive_users()
+        self.assertTrue(summary["resumed"])
+        self.assertEqual(summary["blocked"], 5)
+        self.assertEqual(summary["batches"], 3)
+        self.assertEqual(User.objects.filter(is_active=False).count(), 5)
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class GenerateLoadDataTestCase(APITestCase):
+    """Тесты генератора синтетических данных."""
+    options = {"users": 120, "courses": 15, "batch_size": 50, "stdout": StringIO()}
+
+    def _snapshot(self):
+        """Возвращает сгенерированные данные в виде, не зависящем от первичных ключей."""
+        courses = {course.pk: course.name for course in Course.objects.all()}
+        emails = dict(User.objects.values_list("pk", "email"))
+        subscriptions = sorted(
+            (emails[user_id], courses[course_id])
+            for user_id, course_id in Subscription.objects.values_list("user_id", "course_id")
+        )
+        payments = sorted(
+            (emails[user_id], courses[course_id], amount, date_payment)
+            for user_id, course_id, amount, date_payment in Payments.objects.values_list(
+                "user_id", "course_paid_id", "amount", "date_payment"
+            )
+        )
+        return subscriptions, payments, Lesson.objects.count()
+
+    def test_generates_skewed_data(self):
+        """Популярность курсов неравномерна, даты отсчитываются от времени запуска."""
+        call_command("generate_load_data", seed=7, **self.options)
+        self.assertEqual(User.objects.count(), 120)
+        self.assertEqual(Course.objects.count(), 15)
+        self.assertTrue(Lesson.objects.exists())
+        self.assertFalse(Lesson.objects.exclude(owner=F("course__owner")).exists())
+
+        counts = sorted(
+            Course.objects.annotate(subscribers=Count("subscription")).values_list("subscribers", flat=True)
+        )
+        self.assertGreater(counts[-1], 3 * counts[len(counts) // 2])
+        dates = Payments.objects.aggregate(first=Min("date_payment"), last=Max("date_payment"))
+        self.assertLess(dates["first"], timezone.now() - timedelta(days=30))
+        self.assertLess(dates["last"], timezone.now())
+        self.assertGreater(dates["last"], timezone.now() - timedelta(days=30))
+        # Большинство пользователей заходили в последний месяц и не попадут под блокировку неактивных
+        recent = User.objects.filter(last_login__gte=timezone.now() - timedelta(days=30)).count()
+        self.assertGreater(recent, User.objects.count() // 2)
+
+        with self.assertRaises(CommandError):
+            call_command("generate_load_data", seed=7, **self.options)
+
+    def test_deterministic_from_seed(self):
+        """Одинаковые зерно и --now дают одинаковые данные независимо от времени запуска."""
+        now = timezone.now()
+        with CaptureQueriesContext(connection) as context:
+            call_command("generate_load_data", seed=3, now=now, **self.options)
+        # Даты платежей записываются при вставке, без повторного UPDATE
+        self.assertFalse([query for query in context.captured_queries if query["sql"].startswith("UPDATE")])
+        first = self._snapshot()
+        User.objects.all().delete()
+        Course.objects.all().delete()
+        with mock.patch("django.utils.timezone.now", return_value=now + timedelta(days=3)):
+            call_command("generate_load_data", seed=3, now=now, **self.options)
+        self.assertEqual(self._snapshot(), first)
+
+    def test_ids_ordered_by_generated_number(self):
+        """Ключи упорядочены по номеру объекта, а не по порядку вставки пачек."""
+        users = [User.objects.create(email=f"load5-{number}@example.com") for number in (3, 2, 1, 0)]
+        command = GenerateLoadDataCommand()
+        command.batch_size = 2
+        ids = command.load_ids(User.objects, "email", "load5-", 4)
+        self.assertEqual(list(ids), [user.pk for user in reversed(users)])
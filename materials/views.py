@@ -1,26 +1,84 @@
 from typing import Type
 
+from django.db.models import Count, Exists, Max, OuterRef, QuerySet, Value, prefetch_related_objects
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import serializers, status
-from rest_framework.generics import (CreateAPIView, DestroyAPIView, ListAPIView, RetrieveAPIView, UpdateAPIView,
-                                     get_object_or_404)
+from rest_framework.exceptions import NotFound
+from rest_framework.generics import CreateAPIView, DestroyAPIView, ListAPIView, RetrieveAPIView, UpdateAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
+from materials.cache import get_course_detail
+from materials.mixins import ConditionalGetMixin, OwnerScopedQuerysetMixin
 from materials.models import Course, Lesson, Subscription
-from materials.paginators import CourseLessonPagination
+from materials.paginators import CourseLessonSwitchablePagination
 from materials.serializers import CourseDetailSerializer, CourseSerializer, LessonSerializer, SubscriptionSerializer
-from materials.tasks import send_email_about_update_the_course_materials
+from materials.services import (get_changed_fields, get_course_snapshot, schedule_course_update_notification,
+                                toggle_subscription)
 from users.permissions import IsModer, IsOwner
 
 
-class CourseViewSet(ModelViewSet):
-    """ViewSet для выполнения всех CRUD операций с курсами."""
+class CourseViewSet(OwnerScopedQuerysetMixin, ConditionalGetMixin, ModelViewSet):
+    """ViewSet для выполнения всех CRUD операций с курсами.
+
+    list возвращает владельцу только его курсы, модератору - все.
+    list и retrieve поддерживают условные запросы по ETag."""
     queryset = Course.objects.all()
-    pagination_class = CourseLessonPagination
+    pagination_class = CourseLessonSwitchablePagination
+
+    def get_queryset(self) -> QuerySet[Course]:
+        """Возвращает курсы с признаком подписки, посчитанным в БД.
+
+        Аннотация избавляет сериализаторы от отдельного запроса на каждый курс,
+        поэтому список и детальный просмотр выполняются за постоянное число запросов.
+        Количество уроков в детальном просмотре считается по предзагруженным урокам."""
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_authenticated:
+            is_subscribed = Exists(Subscription.objects.filter(user=user, course=OuterRef("pk"), is_active=True))
+        else:
+            # Анонимный запрос (например, при генерации схемы swagger)
+            is_subscribed = Value(False)
+        return queryset.annotate(is_subscribed=is_subscribed)
+
+    def get_list_validators(self, queryset: QuerySet[Course]) -> list:
+        """Количество и дата последнего изменения курсов плюс версия подписок пользователя."""
+        courses = queryset.order_by().aggregate(count=Count("pk"), updated_at=Max("updated_at"))
+        subscriptions = Subscription.objects.filter(user=self.request.user).aggregate(
+            count=Count("pk"), updated_at=Max("updated_at")
+        )
+        return [courses, subscriptions]
+
+    def get_object_validators(self, instance: Course) -> list:
+        """Изменение уроков обновляет updated_at курса, подписка учитывается отдельно."""
+        return [instance.pk, instance.updated_at, instance.is_subscribed]
+
+    def prepare_instance(self, instance: Course) -> Course:
+        """Загружает уроки курса одним запросом только при формировании ответа."""
+        prefetch_related_objects([instance], "lesson_set")
+        return instance
+
+    def get_object_data(self, instance: Course) -> dict:
+        """Берет общее для всех пользователей представление курса из кэша.
+
+        В кэше хранятся относительные ссылки на файлы: сериализатор получает контекст
+        без request, а абсолютные адреса строятся для каждого запроса отдельно.
+        Признак подписки уже посчитан в запросе объекта и добавляется к ответу."""
+        def build() -> dict:
+            serializer = self.get_serializer_class()(self.prepare_instance(instance), context={"view": self})
+            data = dict(serializer.data)
+            data.pop("is_subscribed")
+            return data
+
+        data = get_course_detail(instance.pk, build)
+        lessons = [
+            {**lesson, "picture": self.request.build_absolute_uri(lesson["picture"])} if lesson["picture"] else lesson
+            for lesson in data["lessons"]
+        ]
+        return {**data, "lessons": lessons, "is_subscribed": instance.is_subscribed}
 
     def get_serializer_class(self) -> Type[serializers.Serializer]:
         if self.action == "retrieve":
@@ -48,21 +106,17 @@ class CourseViewSet(ModelViewSet):
         serializer.save(owner=self.request.user)
 
     def perform_update(self, serializer):
-        """Обновление курса с уведомлением подписчиков."""
-        super().perform_update(serializer)      # 1. Сохраняем обновление курса
-        course = serializer.instance            # 2. Получаем обновленный курс
-
-        # Получаем всех подписчиков курса
-        subscribers = Subscription.objects.filter(course=course)
-
-        # Отправляем письма всем подписчикам
-        for subscription in subscribers:
-            send_email_about_update_the_course_materials.delay(
-                subscription.user.email,    # Email каждого подписчика
-                "Курс обновлен",            # Тема письма
-                f"Материалы курса '{course.name}' обновлены, проверь свои подписки!"
-                # Текст
-            )
+        """Обновление курса с уведомлением подписчиков.
+
+        Уведомление планируется, только если изменились важные для подписчиков поля,
+        а частые обновления одного курса объединяются в одну рассылку."""
+        snapshot = get_course_snapshot(serializer.instance)     # 1. Запоминаем состояние до обновления
+        super().perform_update(serializer)                      # 2. Сохраняем обновление курса
+        course = serializer.instance                            # 3. Получаем обновленный курс
+
+        # 4. Ставим рассылку в очередь, если подписчикам есть о чем сообщить
+        if get_changed_fields(snapshot, course):
+            schedule_course_update_notification(course.pk)
 
 
 class LessonCreateApiView(CreateAPIView):
@@ -77,22 +131,34 @@ class LessonCreateApiView(CreateAPIView):
         serializer.save(owner=self.request.user)
 
 
-class LessonListApiView(ListAPIView):
-    """API View для получения списка всех уроков.
-    Обрабатывает GET запросы для получения списка уроков."""
+class LessonListApiView(OwnerScopedQuerysetMixin, ConditionalGetMixin, ListAPIView):
+    """API View для получения списка уроков.
+    Обрабатывает GET запросы для получения списка уроков: владельцу - только его уроки,
+    модератору - все. Поддерживает условные запросы по ETag."""
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticated, IsOwner | IsModer]
-    pagination_class = CourseLessonPagination
+    pagination_class = CourseLessonSwitchablePagination
 
+    def get_list_validators(self, queryset: QuerySet[Lesson]) -> list:
+        """Количество и дата последнего изменения уроков."""
+        return [queryset.order_by().aggregate(count=Count("pk"), updated_at=Max("updated_at"))]
 
-class LessonRetrieveApiView(RetrieveAPIView):
+
+class LessonRetrieveApiView(ConditionalGetMixin, RetrieveAPIView):
     """API View для получения детальной информации об уроке.
-    Обрабатывает GET запросы для получения конкретного урока по ID."""
+    Обрабатывает GET запросы для получения конкретного урока по ID,
+    поддерживает условные запросы по ETag и Last-Modified."""
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
     permission_classes = [IsOwner | IsModer]
 
+    def get_object_validators(self, instance: Lesson) -> list:
+        return [instance.pk, instance.updated_at]
+
+    def get_object_last_modified(self, instance: Lesson):
+        return instance.updated_at
+
 
 class LessonUpdateApiView(UpdateAPIView):
     """API View для обновления существующего урока.
@@ -170,7 +236,10 @@ class SubscriptionAPIView(APIView):
         }
     )
     def post(self, request, *args, **kwargs):
-        """Подписывает пользователя на курс."""
+        """Подписывает пользователя на курс или отписывает от него.
+
+        Переключение выполняется одним атомарным SQL-запросом, поэтому повторные
+        параллельные запросы не создают дублей подписки."""
         user = request.user
 
         # Получаем id курса из request.data
@@ -181,24 +250,16 @@ class SubscriptionAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-            # Получаем объект курса из базы
-        course_item = get_object_or_404(Course, id=course_id)
+        try:
+            course_id = int(course_id)
+        except (TypeError, ValueError):
+            raise NotFound("Курс не найден")
 
-        # Получаем объекты подписок по текущему пользователю и курсу
-        subs_item = Subscription.objects.filter(user=user, course=course_item)
-
-        # Если подписка у пользователя на этот курс есть - удаляем ее
-        if subs_item.exists():
-            subs_item.delete()
-            message = 'подписка удалена'
-        # Если подписки у пользователя на этот курс нет - создаем ее
-        else:
-            Subscription.objects.create(user=user, course=course_item)
-            message = 'подписка добавлена'
+        # Создаем подписку или переключаем ее активность; None - курса нет в базе
+        is_active = toggle_subscription(user, course_id)
+        if is_active is None:
+            raise NotFound("Курс не найден")
 
-            # Вызов задачи Celery для отправки приветственного письма
-            # send_email_about_update_the_course_materials.delay(
-            #             user.email, "Курс обновлен", "Материалы курса обновлены, проверь свои подписки!"
-            #         )
+        message = 'подписка добавлена' if is_active else 'подписка удалена'
         # Возвращаем ответ в API
-        return Response({"message": message})
\ No newline at end of file
+        return Response({"message": message})
@@ -0,0 +1,39 @@
+import json
+
+from django.contrib import admin
+from django.utils.html import format_html
+
+from monitoring.models import ProfileReport
+
+
+@admin.register(ProfileReport)
+class ProfileReportAdmin(admin.ModelAdmin):
+    """Отчеты профилировщика доступны только для просмотра"""
+    list_display = (
+        "created_at", "method", "path", "status_code", "duration_ms", "db_queries", "memory_peak_kb", "user",
+    )
+    list_filter = ("method", "status_code")
+    search_fields = ("path", "view_name")
+    fields = (
+        "created_at", "user", "method", "path", "view_name", "status_code", "duration_ms", "db_queries", "db_ms",
+        "memory_peak_kb", "profile_text", "queries_text", "allocations_text",
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Профиль (cProfile)")
+    def profile_text(self, obj):
+        return format_html("<pre>{}</pre>", obj.profile)
+
+    @admin.display(description="Самые медленные SQL-запросы с планами")
+    def queries_text(self, obj):
+        return format_html("<pre>{}</pre>", json.dumps(obj.queries, indent=2, ensure_ascii=False))
+
+    @admin.display(description="Места наибольших выделений памяти")
+    def allocations_text(self, obj):
+        return format_html("<pre>{}</pre>", json.dumps(obj.allocations, indent=2, ensure_ascii=False))
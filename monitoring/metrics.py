@@ -0,0 +1,134 @@
+import json
+import threading
+from collections import defaultdict
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisCache
+
+METRICS_KEY = "monitoring:metrics"
+# Границы корзин гистограммы времени ответа, секунд
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Имя метрики -> (тип, описание)
+METRICS = {
+    "http_requests_total": ("counter", "Количество запросов по представлению, методу и статусу"),
+    "http_request_duration_seconds": ("histogram", "Время ответа"),
+    "http_request_db_queries_total": ("counter", "Количество SQL-запросов"),
+    "http_request_db_seconds_total": ("counter", "Суммарное время SQL-запросов"),
+    "http_request_view_seconds_total": ("counter", "Суммарное время представлений без SQL (логика и сериализация)"),
+    "http_request_render_seconds_total": ("counter", "Суммарное время рендеринга ответов"),
+    "http_response_size_bytes_total": ("counter", "Суммарный размер ответов"),
+}
+
+
+def series_key(name: str, labels: dict) -> str:
+    """Ключ серии в хранилище: имя метрики и метки в JSON."""
+    return f"{name}|{json.dumps(labels, sort_keys=True, ensure_ascii=False)}"
+
+
+def request_increments(view: str, method: str, status: int, duration: float, db_queries: int, db_seconds: float,
+                       view_seconds: float, render_seconds: float, response_bytes: int) -> dict[str, float]:
+    """Приращения всех серий для одного запроса."""
+    labels = {"view": view, "method": method}
+    increments = {
+        series_key("http_requests_total", {**labels, "status": str(status)}): 1,
+        series_key("http_request_duration_seconds_count", labels): 1,
+        series_key("http_request_duration_seconds_sum", labels): duration,
+        series_key("http_request_db_queries_total", labels): db_queries,
+        series_key("http_request_db_seconds_total", labels): db_seconds,
+        series_key("http_request_view_seconds_total", labels): view_seconds,
+        series_key("http_request_render_seconds_total", labels): render_seconds,
+        series_key("http_response_size_bytes_total", labels): response_bytes,
+    }
+    # Корзины хранятся накопительно, как того требует формат Prometheus
+    for bound in (*LATENCY_BUCKETS, "+Inf"):
+        if bound == "+Inf" or duration <= bound:
+            increments[series_key("http_request_duration_seconds_bucket", {**labels, "le": str(bound)})] = 1
+    return increments
+
+
+class RedisMetricsStore:
+    """Метрики в хеше Redis: общий для всех воркеров gunicorn и серверов.
+
+    Приращения одного запроса отправляются одним pipeline (HINCRBYFLOAT).
+    Клиент Redis создается по settings.REDIS_URL."""
+
+    def __init__(self, backend: RedisCache) -> None:
+        self.client = redis.Redis.from_url(settings.REDIS_URL)
+        self.key = backend.make_key(METRICS_KEY)
+
+    def add(self, increments: dict[str, float]) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        for field, value in increments.items():
+            pipeline.hincrbyfloat(self.key, field, value)
+        pipeline.execute()
+
+    def read(self) -> dict[str, float]:
+        values = self.client.hgetall(self.key)
+        return {field.decode(): float(value) for field, value in values.items()}
+
+
+class LocalMetricsStore:
+    """Метрики в памяти процесса, если кэш не Redis (разработка, тесты, один процесс)."""
+
+    def __init__(self) -> None:
+        self.values = defaultdict(float)
+        self.lock = threading.Lock()
+
+    def add(self, increments: dict[str, float]) -> None:
+        with self.lock:
+            for field, value in increments.items():
+                self.values[field] += value
+
+    def read(self) -> dict[str, float]:
+        with self.lock:
+            return dict(self.values)
+
+
+_store = None
+
+
+def get_metrics_store():
+    """Возвращает хранилище метрик для текущего кэша."""
+    global _store
+    if _store is None:
+        _store = RedisMetricsStore(cache) if isinstance(cache, RedisCache) else LocalMetricsStore()
+    return _store
+
+
+def escape_label(value) -> str:
+    """Экранирование значения метки по правилам текстового формата Prometheus."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: dict) -> str:
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels.items()) + "}"
+
+
+def render_prometheus(values: dict[str, float]) -> str:
+    """Формирует текстовый формат Prometheus (version 0.0.4) из значений серий."""
+    samples = defaultdict(list)
+    for field, value in values.items():
+        name, labels = field.split("|", 1)
+        samples[name].append((json.loads(labels), value))
+
+    lines = []
+    for metric, (metric_type, description) in METRICS.items():
+        names = [f"{metric}_bucket", f"{metric}_sum", f"{metric}_count"] if metric_type == "histogram" else [metric]
+        if not any(samples.get(name) for name in names):
+            continue
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        for name in names:
+            for labels, value in sorted(samples.get(name, []), key=lambda sample: sorted_labels_key(sample[0])):
+                lines.append(f"{name}{format_labels(labels)} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def sorted_labels_key(labels: dict) -> tuple:
+    """Порядок серий: по меткам, корзины гистограммы - по возрастанию границы."""
+    le = labels.get("le")
+    bound = float("inf") if le == "+Inf" else float(le) if le is not None else 0
+    return tuple((name, value) for name, value in labels.items() if name != "le"), bound
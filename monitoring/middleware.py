@@ -0,0 +1,122 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from monitoring.metrics import get_metrics_store, request_increments
+from monitoring.models import ProfileReport
+from monitoring.profiling import is_staff_request, is_staff_user, profile_request, profiling_requested
+from monitoring.timing import RequestTimings, current_timings, db_timing_wrapper
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """Замер времени ответа, SQL-запросов, представления, рендеринга и размера ответа.
+
+    Метрики копятся по имени маршрута и методу в общем хранилище (см. monitoring.metrics).
+    Время представления (без SQL) замеряется от process_view до process_template_response,
+    рендеринг - до post-render callback ответа. Заголовок Server-Timing отдается только
+    сотрудникам или при DEBUG: он раскрывает детали работы сервера."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            with self.wrap_connections():
+                response = self.get_response(request)
+            # Ответ без рендеринга: представление закончилось вместе с цепочкой middleware
+            timings.finish_view()
+        finally:
+            current_timings.reset(token)
+        duration = time.perf_counter() - started
+
+        if settings.DEBUG or is_staff_user(request):
+            response["Server-Timing"] = (
+                f"db;dur={timings.db_seconds * 1000:.1f};desc=\"{timings.db_queries} queries\", "
+                f"view;dur={timings.view_seconds * 1000:.1f}, "
+                f"render;dur={timings.render_seconds * 1000:.1f}, "
+                f"total;dur={duration * 1000:.1f}"
+            )
+        match = getattr(request, "resolver_match", None)
+        # Несуществующие адреса объединяются в одну серию, чтобы не раздувать число меток
+        view = match.view_name if match is not None else "unmatched"
+        increments = request_increments(
+            view, request.method, response.status_code, duration, timings.db_queries, timings.db_seconds,
+            timings.view_seconds, timings.render_seconds, 0 if response.streaming else len(response.content),
+        )
+        try:
+            get_metrics_store().add(increments)
+        except Exception:
+            # Недоступность хранилища метрик не должна ломать ответ
+            logger.exception("Не удалось записать метрики запроса")
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = current_timings.get()
+        if timings is not None:
+            timings.start_view()
+        return None
+
+    def process_template_response(self, request, response):
+        """Ответ DRF рендерится после middleware: время рендеринга фиксирует callback."""
+        timings = current_timings.get()
+        if timings is not None:
+            timings.finish_view()
+            timings.start_render()
+            response.add_post_render_callback(lambda rendered: timings.finish_render())
+        return response
+
+    @staticmethod
+    def wrap_connections():
+        """Подключает db_timing_wrapper ко всем соединениям с БД."""
+        stack = ExitStack()
+        for alias in settings.DATABASES:
+            stack.enter_context(connections[alias].execute_wrapper(db_timing_wrapper))
+        return stack
+
+
+class ProfilerMiddleware:
+    """Профилирование запроса по требованию сотрудника (IsAdminUser).
+
+    Включается заголовком X-Profile или параметром ?_profile. Отчет сохраняется
+    в ProfileReport (см. админку), его id возвращается в заголовке X-Profile-Report.
+    Без переключателя запрос проходит без профилирования и дополнительных затрат."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling_requested(request) or not is_staff_request(request):
+            return self.get_response(request)
+
+        with profile_request() as result:
+            response = self.get_response(request)
+
+        match = getattr(request, "resolver_match", None)
+        user = getattr(request, "user", None)
+        report = ProfileReport.objects.create(
+            user=user if user is not None and user.is_authenticated else None,
+            method=request.method,
+            path=request.get_full_path()[:500],
+            view_name=match.view_name if match is not None else "",
+            status_code=response.status_code,
+            duration_ms=round(result.duration * 1000, 3),
+            db_queries=len(result.queries.queries),
+            db_ms=round(sum(query.seconds for query in result.queries.queries) * 1000, 3),
+            memory_peak_kb=round(result.memory_peak / 1024, 1),
+            profile=result.profile,
+            queries=result.queries.slowest(settings.PROFILER_SLOW_QUERIES),
+            allocations=result.allocations,
+        )
+        response["X-Profile-Report"] = str(report.pk)
+        return response
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfileReport",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("method", models.CharField(max_length=10, verbose_name="Метод")),
+                ("path", models.CharField(max_length=500, verbose_name="Адрес")),
+                ("view_name", models.CharField(blank=True, max_length=200, verbose_name="Маршрут")),
+                ("status_code", models.PositiveSmallIntegerField(verbose_name="Статус ответа")),
+                ("duration_ms", models.FloatField(verbose_name="Время, мс")),
+                ("db_queries", models.PositiveIntegerField(verbose_name="SQL-запросов")),
+                ("db_ms", models.FloatField(verbose_name="Время SQL, мс")),
+                ("memory_peak_kb", models.FloatField(verbose_name="Пик памяти, КБ")),
+                ("profile", models.TextField(verbose_name="Профиль (cProfile)")),
+                ("queries", models.JSONField(default=list, verbose_name="Самые медленные SQL-запросы с планами")),
+                ("allocations", models.JSONField(default=list, verbose_name="Места наибольших выделений памяти")),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="Дата")),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Отчет профилировщика",
+                "verbose_name_plural": "Отчеты профилировщика",
+                "ordering": ("-created_at",),
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import models
+
+
+class ProfileReport(models.Model):
+    """Отчет профилировщика по одному запросу сотрудника."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Пользователь",
+    )
+    method = models.CharField(max_length=10, verbose_name="Метод")
+    path = models.CharField(max_length=500, verbose_name="Адрес")
+    view_name = models.CharField(max_length=200, blank=True, verbose_name="Маршрут")
+    status_code = models.PositiveSmallIntegerField(verbose_name="Статус ответа")
+    duration_ms = models.FloatField(verbose_name="Время, мс")
+    db_queries = models.PositiveIntegerField(verbose_name="SQL-запросов")
+    db_ms = models.FloatField(verbose_name="Время SQL, мс")
+    memory_peak_kb = models.FloatField(verbose_name="Пик памяти, КБ")
+    profile = models.TextField(verbose_name="Профиль (cProfile)")
+    queries = models.JSONField(default=list, verbose_name="Самые медленные SQL-запросы с планами")
+    allocations = models.JSONField(default=list, verbose_name="Места наибольших выделений памяти")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата")
+
+    class Meta:
+        verbose_name = "Отчет профилировщика"
+        verbose_name_plural = "Отчеты профилировщика"
+        ordering = ("-created_at",)
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} мс)"
@@ -0,0 +1,144 @@
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+# Включение профилирования: заголовок X-Profile или параметр ?_profile в адресе
+PROFILE_HEADER = "HTTP_X_PROFILE"
+PROFILE_PARAM = "_profile"
+# Мест выделения памяти в отчете
+ALLOCATIONS_LIMIT = 20
+
+
+def profiling_requested(request) -> bool:
+    """Просит ли запрос профилирование. Единственная проверка на обычном пути запроса."""
+    return PROFILE_HEADER in request.META or PROFILE_PARAM in request.GET
+
+
+def is_staff_user(request) -> bool:
+    """Проверяет пользователя, уже определенного для запроса, без повторной аутентификации.
+
+    После представления DRF здесь же оказывается и пользователь JWT."""
+    user = getattr(request, "user", None)
+    return bool(user is not None and user.is_authenticated and user.is_staff)
+
+
+def is_staff_request(request) -> bool:
+    """Проверяет IsAdminUser до вызова представления.
+
+    Пользователь сессии уже известен из AuthenticationMiddleware, пользователь
+    JWT определяется аутентификаторами DRF так же, как это сделает представление."""
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return bool(user.is_staff)
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        return IsAdminUser().has_permission(drf_request, None)
+    except APIException:
+        return False
+
+
+@dataclass
+class CapturedQuery:
+    alias: str
+    sql: str
+    params: object
+    many: bool
+    seconds: float
+
+
+@dataclass
+class QueryCapture:
+    """Все SQL-запросы профилируемого запроса с временем выполнения."""
+    queries: list[CapturedQuery] = field(default_factory=list)
+
+    def wrapper(self, alias: str):
+        def execute_wrapper(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                self.queries.append(CapturedQuery(alias, sql, params, many, time.perf_counter() - started))
+
+        return execute_wrapper
+
+    @contextmanager
+    def capture(self):
+        with ExitStack() as stack:
+            for alias in settings.DATABASES:
+                stack.enter_context(connections[alias].execute_wrapper(self.wrapper(alias)))
+            yield self
+
+    def slowest(self, limit: int) -> list[dict]:
+        """Самые медленные запросы с планами выполнения (EXPLAIN только для SELECT)."""
+        result = []
+        for query in sorted(self.queries, key=lambda query: query.seconds, reverse=True)[:limit]:
+            item = {"sql": query.sql, "duration_ms": round(query.seconds * 1000, 3)}
+            if not query.many and query.sql.lstrip().upper().startswith("SELECT"):
+                item["explain"] = explain(query)
+            result.append(item)
+        return result
+
+
+def explain(query: CapturedQuery) -> str:
+    """Повторно выполняет запрос под EXPLAIN и возвращает план текстом."""
+    connection = connections[query.alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {query.sql}", query.params)
+            return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+    except Exception as error:
+        return f"EXPLAIN не выполнен: {error}"
+
+
+@dataclass
+class ProfileResult:
+    """Результаты профилирования запроса до сохранения в ProfileReport."""
+    duration: float = 0.0
+    profile: str = ""
+    queries: QueryCapture = field(default_factory=QueryCapture)
+    memory_peak: int = 0
+    allocations: list[dict] = field(default_factory=list)
+
+
+@contextmanager
+def profile_request():
+    """Выполняет блок под cProfile с записью SQL и отслеживанием памяти (tracemalloc)."""
+    result = ProfileResult()
+    profiler = cProfile.Profile()
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        with result.queries.capture():
+            profiler.enable()
+            try:
+                yield result
+            finally:
+                profiler.disable()
+    finally:
+        result.duration = time.perf_counter() - started
+        result.memory_peak = tracemalloc.get_traced_memory()[1]
+        statistics = tracemalloc.take_snapshot().statistics("lineno")
+        if started_tracing:
+            tracemalloc.stop()
+
+    result.allocations = [
+        {"location": str(stat.traceback), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+        for stat in statistics[:ALLOCATIONS_LIMIT]
+    ]
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(settings.PROFILER_STATS_LIMIT)
+    result.profile = stream.getvalue()
@@ -0,0 +1,171 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from materials.models import Course
+from monitoring.metrics import LocalMetricsStore, RedisMetricsStore, render_prometheus, request_increments, series_key
+from monitoring.models import ProfileReport
+from users.models import User
+
+
+class RequestMetricsTestCase(APITestCase):
+    """Тесты сбора метрик запросов и эндпоинта /metrics."""
+
+    def setUp(self):
+        self.store = LocalMetricsStore()
+        patcher = mock.patch("monitoring.middleware.get_metrics_store", return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("monitoring.views.get_metrics_store", return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create(email="metrics@test.com")
+        self.staff = User.objects.create(email="staff@test.com", is_staff=True)
+        Course.objects.create(name="Курс", owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_request_is_measured(self):
+        response = self.client.get(reverse("materials:course-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        labels = {"view": "materials:course-list", "method": "GET"}
+        values = self.store.read()
+        self.assertEqual(values[series_key("http_requests_total", {**labels, "status": "200"})], 1)
+        self.assertGreater(values[series_key("http_request_db_queries_total", labels)], 0)
+        self.assertGreater(values[series_key("http_request_view_seconds_total", labels)], 0)
+        self.assertGreater(values[series_key("http_request_render_seconds_total", labels)], 0)
+        self.assertEqual(values[series_key("http_response_size_bytes_total", labels)], len(response.content))
+
+    def test_server_timing_only_for_staff(self):
+        response = self.client.get(reverse("materials:course-list"))
+        self.assertNotIn("Server-Timing", response)
+
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(reverse("materials:course-list"))
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.assertIn("view;dur=", response["Server-Timing"])
+        self.assertIn("render;dur=", response["Server-Timing"])
+
+    @override_settings(DEBUG=True)
+    def test_server_timing_in_debug(self):
+        response = self.client.get(reverse("materials:course-list"))
+        self.assertIn("total;dur=", response["Server-Timing"])
+
+    def test_unmatched_paths_share_one_series(self):
+        self.client.get("/missing-1/")
+        self.client.get("/missing-2/")
+        key = series_key("http_requests_total", {"view": "unmatched", "method": "GET", "status": "404"})
+        self.assertEqual(self.store.read()[key], 2)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse("materials:course-list"))
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn("# TYPE http_request_duration_seconds histogram", body)
+        self.assertIn('http_requests_total{method="GET",status="200",view="materials:course-list"} 1', body)
+        self.assertIn('http_request_duration_seconds_bucket{le="+Inf",method="GET",view="materials:course-list"} 1',
+                      body)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_endpoint_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_metrics_endpoint_closed_without_token(self):
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer ")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        user_token = AccessToken.for_user(self.user)
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION=f"Bearer {user_token}")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.staff)}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse("materials:course-list"))
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(self.store.read(), {})
+
+    def test_histogram_buckets_are_cumulative(self):
+        increments = request_increments("view", "GET", 200, 0.3, 0, 0, 0, 0, 0)
+        buckets = {key for key in increments if key.startswith("http_request_duration_seconds_bucket")}
+        # 0.3 с попадает в корзины 0.5, 1.0, 2.5, 5.0, 10.0 и +Inf
+        self.assertEqual(len(buckets), 6)
+
+    def test_label_escaping(self):
+        body = render_prometheus({series_key("http_requests_total", {"view": 'a"b\\c'}): 1})
+        self.assertIn('http_requests_total{view="a\\"b\\\\c"} 1', body)
+
+    @override_settings(REDIS_URL="redis://redis.test:6379/3")
+    def test_redis_store_uses_client_from_settings(self):
+        with mock.patch("monitoring.metrics.redis.Redis.from_url") as from_url:
+            store = RedisMetricsStore(cache)
+            from_url.return_value.hgetall.return_value = {b"series": b"2"}
+            self.assertEqual(store.read(), {"series": 2.0})
+        from_url.assert_called_once_with("redis://redis.test:6379/3")
+
+
+class ProfilerTestCase(APITestCase):
+    """Тесты профилирования запросов сотрудников."""
+
+    def setUp(self):
+        self.staff = User.objects.create(email="staff@test.com", is_staff=True)
+        self.user = User.objects.create(email="user@test.com")
+        Course.objects.create(name="Курс", owner=self.user)
+        self.url = reverse("materials:course-list")
+
+    def test_staff_jwt_request_is_profiled(self):
+        response = self.client.get(
+            self.url, HTTP_X_PROFILE="1", HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.staff)}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        report = ProfileReport.objects.get(pk=response["X-Profile-Report"])
+        self.assertEqual(report.user, self.staff)
+        self.assertEqual(report.view_name, "materials:course-list")
+        self.assertGreater(report.db_queries, 0)
+        self.assertGreater(report.memory_peak_kb, 0)
+        self.assertIn("cumulative", report.profile)
+        self.assertTrue(report.queries)
+        self.assertTrue(any(query.get("explain") for query in report.queries))
+
+    def test_staff_session_query_param(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url, {"_profile": "1"})
+        self.assertIn("X-Profile-Report", response)
+
+    def test_non_staff_is_not_profiled(self):
+        response = self.client.get(
+            self.url, HTTP_X_PROFILE="1", HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("X-Profile-Report", response)
+        self.assertFalse(ProfileReport.objects.exists())
+
+    def test_no_switch_skips_profiler(self):
+        with mock.patch("monitoring.middleware.is_staff_request") as is_staff_request, \
+                mock.patch("monitoring.middleware.profile_request") as profile_request:
+            self.client.get(self.url, HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.staff)}")
+        is_staff_request.assert_not_called()
+        profile_request.assert_not_called()
+        self.assertFalse(ProfileReport.objects.exists())
+
+    def test_admin_lists_reports(self):
+        self.staff.is_superuser = True
+        self.staff.save()
+        self.client.force_login(self.staff)
+        self.client.get(self.url, HTTP_X_PROFILE="1")
+        report = ProfileReport.objects.get()
+        self.assertEqual(self.client.get(reverse("admin:monitoring_profilereport_changelist")).status_code, 200)
+        response = self.client.get(reverse("admin:monitoring_profilereport_change", args=(report.pk,)))
+        self.assertContains(response, "<pre>")
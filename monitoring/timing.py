@@ -0,0 +1,51 @@
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+
+@dataclass
+class RequestTimings:
+    """Счетчики текущего запроса: SQL-запросы, время БД, представления и рендеринга ответа."""
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    view_seconds: float = 0.0
+    render_seconds: float = 0.0
+    view_started: float | None = None
+    view_db_seconds: float = 0.0
+    render_started: float | None = None
+
+    def start_view(self) -> None:
+        self.view_started = time.perf_counter()
+        self.view_db_seconds = self.db_seconds
+
+    def finish_view(self) -> None:
+        """Время представления без SQL: бизнес-логика и сериализация."""
+        if self.view_started is None:
+            return
+        elapsed = time.perf_counter() - self.view_started
+        self.view_seconds = max(elapsed - (self.db_seconds - self.view_db_seconds), 0.0)
+        self.view_started = None
+
+    def start_render(self) -> None:
+        self.render_started = time.perf_counter()
+
+    def finish_render(self) -> None:
+        if self.render_started is not None:
+            self.render_seconds = time.perf_counter() - self.render_started
+            self.render_started = None
+
+
+current_timings: ContextVar[RequestTimings | None] = ContextVar("current_timings", default=None)
+
+
+def db_timing_wrapper(execute, sql, params, many, context):
+    """execute_wrapper соединения: учитывает каждый SQL-запрос текущего запроса."""
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db_queries += 1
+        timings.db_seconds += time.perf_counter() - started
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from monitoring.metrics import get_metrics_store, render_prometheus
+from monitoring.profiling import is_staff_request
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def metrics_view(request):
+    """Метрики запросов в текстовом формате Prometheus.
+
+    Доступны сотрудникам (сессия или JWT) и по заголовку Authorization: Bearer <METRICS_TOKEN>,
+    если токен задан. Без токена и без прав сотрудника возвращается 401."""
+    token = settings.METRICS_TOKEN
+    authorized = bool(token) and constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}")
+    if not authorized and not is_staff_request(request):
+        return HttpResponse(status=401)
+    return HttpResponse(render_prometheus(get_metrics_store().read()), content_type=CONTENT_TYPE)
@@ -0,0 +1,82 @@
+import threading
+import time
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisCache
+
+ACTIVITY_KEY = "users:activity"
+# Сколько пользователей помнит локальный фильтр повторных отметок до очистки
+RECENT_LIMIT = 10000
+
+
+class RedisActivityStore:
+    """Отметки активности в хеше Redis: user_id -> время последнего запроса.
+
+    Хеш общий для всех процессов, задача сброса забирает и удаляет его атомарно.
+    Клиент Redis создается по settings.REDIS_URL, ключ строится кэшем с его префиксом и версией."""
+
+    def __init__(self, backend: RedisCache) -> None:
+        self.client = redis.Redis.from_url(settings.REDIS_URL)
+        self.key = backend.make_key(ACTIVITY_KEY)
+
+    def record(self, user_id: int, seen_at: float) -> None:
+        self.client.hset(self.key, user_id, seen_at)
+
+    def pop_all(self) -> dict[int, float]:
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.hgetall(self.key)
+        pipeline.delete(self.key)
+        seen, _ = pipeline.execute()
+        return {int(user_id): float(seen_at) for user_id, seen_at in seen.items()}
+
+
+class LocalActivityStore:
+    """Отметки активности в памяти процесса, если кэш не Redis (разработка, тесты).
+
+    Сбрасываются в БД задачей, выполняемой в том же процессе."""
+
+    def __init__(self) -> None:
+        self.seen = {}
+        self.lock = threading.Lock()
+
+    def record(self, user_id: int, seen_at: float) -> None:
+        with self.lock:
+            self.seen[user_id] = seen_at
+
+    def pop_all(self) -> dict[int, float]:
+        with self.lock:
+            seen, self.seen = self.seen, {}
+        return seen
+
+
+_store = None
+_recent = {}
+
+
+def get_activity_store():
+    """Возвращает хранилище отметок активности для текущего кэша."""
+    global _store
+    if _store is None:
+        _store = RedisActivityStore(cache) if isinstance(cache, RedisCache) else LocalActivityStore()
+    return _store
+
+
+def record_activity(user_id: int) -> None:
+    """Отмечает запрос пользователя.
+
+    Повторные запросы одного пользователя чаще USER_ACTIVITY_RESOLUTION секунд
+    в хранилище не пишутся: это фильтруется в памяти процесса."""
+    now = time.time()
+    if now - _recent.get(user_id, 0) < settings.USER_ACTIVITY_RESOLUTION:
+        return
+    if len(_recent) >= RECENT_LIMIT:
+        _recent.clear()
+    _recent[user_id] = now
+    get_activity_store().record(user_id, now)
+
+
+def pop_activity() -> dict[int, float]:
+    """Забирает накопленные отметки: user_id -> unix-время последнего запроса."""
+    return get_activity_store().pop_all()
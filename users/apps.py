@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 
 class UsersConfig(AppConfig):
-    name = "users"
\ No newline at end of file
+    name = "users"
+
+    def ready(self):
+        # Регистрация обработчиков сигналов
+        from users import signals  # noqa: F401
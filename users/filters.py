@@ -0,0 +1,14 @@
+from rest_framework.filters import OrderingFilter
+
+
+class StableOrderingFilter(OrderingFilter):
+    """Сортировка с добавлением первичного ключа в конец.
+
+    Курсорная пагинация требует уникального порядка: без id платежи с одинаковой
+    датой могут пропадать или повторяться на соседних страницах."""
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view) or [])
+        if ordering and not {"id", "-id", "pk", "-pk"} & set(ordering):
+            ordering.append("-id" if ordering[-1].startswith("-") else "id")
+        return ordering
@@ -0,0 +1,25 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class CalibratedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 с числом итераций из настройки PASSWORD_HASH_ITERATIONS.
+
+    Алгоритм совпадает со стандартным pbkdf2_sha256, поэтому существующие хеши
+    проверяются без изменений. Если число итераций в хеше отличается от настройки,
+    Django пересчитывает хеш при следующем успешном входе (must_update)."""
+
+    @property
+    def iterations(self) -> int:
+        return settings.PASSWORD_HASH_ITERATIONS
+
+
+def calibrate_iterations(target_seconds: float, sample_iterations: int = 100_000) -> int:
+    """Подбирает число итераций PBKDF2-SHA256, при котором хеш считается за target_seconds."""
+    started = time.perf_counter()
+    hashlib.pbkdf2_hmac("sha256", b"calibration-password", b"calibration-salt", sample_iterations)
+    elapsed = time.perf_counter() - started
+    return max(int(sample_iterations * target_seconds / elapsed), 1)
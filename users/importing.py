@@ -0,0 +1,146 @@
+import csv
+import io
+import json
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import connection, transaction
+from django.utils import timezone
+
+from users.models import User
+
+# Поля пользователя, которые можно передать в файле импорта
+IMPORT_FIELDS = ("email", "password", "phone", "city", "first_name", "last_name")
+
+
+@dataclass
+class ImportStats:
+    """Итоги импорта пользователей."""
+    read: int = 0
+    imported: int = 0
+    skipped: int = 0
+    rejected: int = 0
+
+
+def read_rows(stream, file_format: str) -> Iterator[tuple[int, dict]]:
+    """Построчно читает CSV (с заголовком) или JSONL и возвращает номер строки и данные."""
+    if file_format == "csv":
+        # Заголовок - первая строка файла, данные начинаются со второй
+        for line_number, row in enumerate(csv.DictReader(stream), start=2):
+            yield line_number, row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else {"__error__": "некорректный JSON"}
+
+
+def clean_row(row: dict) -> dict:
+    """Проверяет и нормализует строку импорта, при ошибке выбрасывает ValidationError."""
+    if "__error__" in row:
+        raise ValidationError(row["__error__"])
+    data = {name: (row.get(name) or "").strip() for name in IMPORT_FIELDS}
+    data["email"] = User.objects.normalize_email(data["email"])
+    if not data["email"]:
+        raise ValidationError("не указан email")
+    validate_email(data["email"])
+    for name in ("phone", "city", "first_name", "last_name"):
+        max_length = User._meta.get_field(name).max_length
+        if len(data[name]) > max_length:
+            raise ValidationError(f"{name} длиннее {max_length} символов")
+    return data
+
+
+def hash_passwords(passwords: list[str], executor: Executor | None) -> list[str]:
+    """Хеширует пароли пачки, в пуле процессов, если он передан.
+
+    Пустой пароль превращается в непригодный для входа (make_password(None))."""
+    passwords = [password or None for password in passwords]
+    if executor is None:
+        return [make_password(password) for password in passwords]
+    return list(executor.map(make_password, passwords, chunksize=max(len(passwords) // 32, 1)))
+
+
+def import_users(rows: Iterable[tuple[int, dict]], batch_size: int, executor: Executor | None = None,
+                 on_reject: Callable[[int, str, str], None] | None = None) -> ImportStats:
+    """Импортирует пользователей пачками по batch_size строк.
+
+    В памяти одновременно находится только одна пачка. О строках с ошибками
+    сообщается через on_reject(номер строки, email, причина), пользователи с уже
+    занятым email (в БД или выше в файле) пропускаются."""
+    stats = ImportStats()
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        stats.read += len(batch)
+        valid = []
+        for line_number, row in batch:
+            try:
+                valid.append(clean_row(row))
+            except ValidationError as error:
+                stats.rejected += 1
+                if on_reject is not None:
+                    on_reject(line_number, row.get("email", ""), "; ".join(error.messages))
+        if not valid:
+            continue
+        for data, password in zip(valid, hash_passwords([data["password"] for data in valid], executor)):
+            data["password"] = password
+        imported = load_users(valid)
+        stats.imported += imported
+        stats.skipped += len(valid) - imported
+    return stats
+
+
+def load_users(users: list[dict]) -> int:
+    """Записывает пачку пользователей и возвращает число добавленных."""
+    if connection.vendor == "postgresql":
+        return _copy_users(users)
+    return _bulk_create_users(users)
+
+
+def _copy_users(users: list[dict]) -> int:
+    """Загрузка через COPY во временную таблицу и INSERT ... ON CONFLICT DO NOTHING."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for data in users:
+        writer.writerow([data[name] for name in IMPORT_FIELDS])
+    buffer.seek(0)
+
+    qn = connection.ops.quote_name
+    columns = ", ".join(qn(name) for name in IMPORT_FIELDS)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TEMP TABLE import_users (email varchar(254), password varchar(128), phone varchar(35), "
+            "city varchar(50), first_name varchar(150), last_name varchar(150))"
+        )
+        # Без FORCE_NOT_NULL пустое поле CSV читается как NULL: first_name и last_name в users_user
+        # объявлены NOT NULL, а phone и city хранились бы иначе, чем при загрузке через bulk_create
+        cursor.copy_expert(
+            f"COPY import_users ({columns}) FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL ({columns}))", buffer
+        )
+        cursor.execute(
+            f"INSERT INTO {qn(User._meta.db_table)} ({columns}, {qn('is_superuser')}, {qn('is_staff')}, "
+            f"{qn('is_active')}, {qn('date_joined')}) "
+            f"SELECT DISTINCT ON (email) {columns}, false, false, true, %s FROM import_users "
+            f"ON CONFLICT (email) DO NOTHING",
+            [timezone.now()],
+        )
+        imported = cursor.rowcount
+        cursor.execute("DROP TABLE import_users")
+    return imported
+
+
+def _bulk_create_users(users: list[dict]) -> int:
+    """Загрузка для СУБД без COPY (SQLite): bulk_create с пропуском занятых email."""
+    emails = {data["email"] for data in users}
+    existing = User.objects.filter(email__in=emails).count()
+    User.objects.bulk_create([User(**data) for data in users], ignore_conflicts=True)
+    return User.objects.filter(email__in=emails).count() - existing
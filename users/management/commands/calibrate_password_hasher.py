@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from users.hashing import calibrate_iterations
+
+
+class Command(BaseCommand):
+    """Подбор стоимости хеширования паролей под текущее железо."""
+    help = "Замеряет PBKDF2-SHA256 и выводит значение PASSWORD_HASH_ITERATIONS для заданного времени хеширования"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target-ms", type=float, default=250, help="Желаемое время одного хеша, мс")
+        parser.add_argument("--rounds", type=int, default=5, help="Количество замеров (берется медиана)")
+
+    def handle(self, *args, **options):
+        results = sorted(calibrate_iterations(options["target_ms"] / 1000) for _ in range(options["rounds"]))
+        iterations = results[len(results) // 2]
+        # Округление вниз до тысяч, чтобы значение было удобно хранить в .env
+        iterations = max(iterations // 1000 * 1000, 1000)
+        current = settings.PASSWORD_HASH_ITERATIONS
+        self.stdout.write(f"Текущее значение: PASSWORD_HASH_ITERATIONS={current}")
+        self.stdout.write(f"Для {options['target_ms']:.0f} мс на хеш: PASSWORD_HASH_ITERATIONS={iterations}")
+        if iterations != current:
+            self.stdout.write("Хеши паролей пересчитаются с новым значением при следующем входе пользователей")
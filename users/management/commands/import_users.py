@@ -0,0 +1,63 @@
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management import BaseCommand, CommandError
+
+from users.importing import import_users, read_rows
+
+
+class Command(BaseCommand):
+    """Массовый импорт пользователей из CSV или JSONL."""
+    help = (
+        "Импортирует пользователей из CSV (с заголовком) или JSONL с полями email, password, phone, city, "
+        "first_name, last_name. Пароли хешируются в пуле процессов, строки загружаются через COPY (PostgreSQL)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к файлу импорта")
+        parser.add_argument("--format", choices=("csv", "jsonl"), help="Формат файла (по умолчанию по расширению)")
+        parser.add_argument("--batch-size", type=int, default=2000, help="Строк в одной пачке загрузки")
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count(), help="Процессов для хеширования паролей (0 - без пула)"
+        )
+        parser.add_argument("--rejects", help="CSV-файл для отклоненных строк (по умолчанию stderr)")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or ("jsonl" if path.endswith((".jsonl", ".json")) else "csv")
+        try:
+            stream = open(path, encoding="utf-8", newline="")
+        except OSError as error:
+            raise CommandError(f"Не удалось открыть файл: {error}")
+        rejects_file = open(options["rejects"], "w", encoding="utf-8", newline="") if options["rejects"] else None
+        rejects = csv.writer(rejects_file or sys.stderr)
+        if rejects_file:
+            rejects.writerow(("line", "email", "reason"))
+
+        executor = None
+        if options["workers"]:
+            # initializer нужен при запуске процессов через spawn: в дочернем процессе настраивается Django
+            executor = ProcessPoolExecutor(max_workers=options["workers"], initializer=django.setup)
+        started = time.perf_counter()
+        try:
+            with stream:
+                stats = import_users(
+                    read_rows(stream, file_format),
+                    batch_size=options["batch_size"],
+                    executor=executor,
+                    on_reject=lambda line, email, reason: rejects.writerow((line, email, reason)),
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            if rejects_file:
+                rejects_file.close()
+
+        self.stdout.write(
+            f"Прочитано: {stats.read}, импортировано: {stats.imported}, пропущено (email занят): {stats.skipped}, "
+            f"отклонено: {stats.rejected}, время: {time.perf_counter() - started:.1f} с"
+        )
@@ -0,0 +1,26 @@
+from django.core.management import BaseCommand
+
+from users.models import Payments
+from users.services import get_stripe_price_id
+
+
+class Command(BaseCommand):
+    """Заполнение каталога продуктов и цен Stripe по уже оформленным платежам."""
+    help = "Создает в Stripe продукты и цены для всех пар курс/урок и сумма из платежей"
+
+    def handle(self, *args, **options):
+        combinations = (
+            Payments.objects.filter(method_payment="stripe")
+            .values_list("course_paid", "lesson_paid", "amount")
+            .order_by()
+            .distinct()
+        )
+        payments = Payments.objects.select_related("course_paid", "lesson_paid")
+        warmed = 0
+        for course_id, lesson_id, amount in combinations.iterator():
+            payment = payments.filter(course_paid_id=course_id, lesson_paid_id=lesson_id, amount=amount).first()
+            if payment.course_paid is None and payment.lesson_paid is None:
+                continue
+            get_stripe_price_id(amount, course=payment.course_paid, lesson=payment.lesson_paid)
+            warmed += 1
+        self.stdout.write(f"Записей каталога проверено: {warmed}")
@@ -0,0 +1,18 @@
+from users.activity import record_activity
+
+
+class ActivityTrackingMiddleware:
+    """Отмечает активность аутентифицированных пользователей, в том числе по JWT.
+
+    Пользователь берется после обработки запроса: DRF проставляет его в исходный
+    HttpRequest при аутентификации. В БД отметки сбрасывает задача flush_user_activity."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            record_activity(user.pk)
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0006_course_updated_at"),
+        ("users", "0003_payments_link_payments_session_id_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="payments",
+            index=models.Index(fields=["-date_payment", "-id"], name="payments_date_id_idx"),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:05
+
+from django.db import migrations, models
+
+
+def set_existing_payments_status(apps, schema_editor):
+    """Платежи, для которых уже выдана ссылка на оплату, получают статус open.
+
+    Наличные и переводы не проходят через Stripe: им сразу ставится окончательный статус paid."""
+    Payments = apps.get_model("users", "Payments")
+    Payments.objects.exclude(link__isnull=True).exclude(link="").update(status="open")
+    Payments.objects.exclude(method_payment="stripe").filter(status="pending").update(status="paid")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0004_payments_date_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payments",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Ожидает создания ссылки на оплату"),
+                    ("open", "Ссылка на оплату создана"),
+                    ("failed", "Ошибка создания ссылки на оплату"),
+                ],
+                default="pending",
+                max_length=20,
+                verbose_name="Статус платежа",
+            ),
+        ),
+        migrations.RunPython(set_existing_payments_status, migrations.RunPython.noop),
+    ]
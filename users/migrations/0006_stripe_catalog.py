@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0009_subscription_unique_user_course"),
+        ("users", "0005_payments_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StripeCatalogItem",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("amount", models.PositiveIntegerField(verbose_name="Сумма оплаты")),
+                ("product_name", models.CharField(max_length=100, verbose_name="Название продукта")),
+                ("product_id", models.CharField(max_length=255, verbose_name="Id продукта в Stripe")),
+                ("price_id", models.CharField(max_length=255, verbose_name="Id цены в Stripe")),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "course",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="materials.course",
+                        verbose_name="Курс",
+                    ),
+                ),
+                (
+                    "lesson",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="materials.lesson",
+                        verbose_name="Урок",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Продукт Stripe",
+                "verbose_name_plural": "Продукты Stripe",
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("course__isnull", False)),
+                        fields=("course", "amount"),
+                        name="stripe_catalog_course_amount",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("lesson__isnull", False)),
+                        fields=("lesson", "amount"),
+                        name="stripe_catalog_lesson_amount",
+                    ),
+                ],
+            },
+        ),
+    ]
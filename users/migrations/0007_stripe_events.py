@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0009_subscription_unique_user_course"),
+        ("users", "0006_stripe_catalog"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Checkpoint",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=100, unique=True, verbose_name="Название")),
+                ("value", models.JSONField(default=dict, verbose_name="Значение")),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="Дата изменения")),
+            ],
+            options={
+                "verbose_name": "Контрольная точка",
+                "verbose_name_plural": "Контрольные точки",
+            },
+        ),
+        migrations.CreateModel(
+            name="StripeEvent",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("event_id", models.CharField(max_length=255, unique=True, verbose_name="Id события в Stripe")),
+                ("type", models.CharField(max_length=100, verbose_name="Тип события")),
+                (
+                    "session_id",
+                    models.CharField(blank=True, max_length=255, null=True, verbose_name="Id сессии оплаты"),
+                ),
+                (
+                    "payment_status",
+                    models.CharField(
+                        blank=True, default="", max_length=50, verbose_name="Статус оплаты сессии (payment_status)"
+                    ),
+                ),
+                ("payload", models.JSONField(verbose_name="Данные события")),
+                ("received_at", models.DateTimeField(auto_now_add=True, verbose_name="Дата получения")),
+                ("processed_at", models.DateTimeField(blank=True, null=True, verbose_name="Дата применения")),
+            ],
+            options={
+                "verbose_name": "Событие Stripe",
+                "verbose_name_plural": "События Stripe",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("processed_at__isnull", True)),
+                        fields=["id"],
+                        name="stripe_event_pending_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AlterField(
+            model_name="payments",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Ожидает создания ссылки на оплату"),
+                    ("open", "Ссылка на оплату создана"),
+                    ("failed", "Ошибка создания ссылки или оплаты"),
+                    ("paid", "Оплачен"),
+                    ("expired", "Сессия оплаты истекла"),
+                ],
+                default="pending",
+                max_length=20,
+                verbose_name="Статус платежа",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payments",
+            index=models.Index(fields=["session_id"], name="payments_session_id_idx"),
+        ),
+    ]
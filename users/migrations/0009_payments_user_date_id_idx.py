@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0009_subscription_unique_user_course"),
+        ("users", "0008_user_active_last_login_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="payments",
+            index=models.Index(fields=["user", "-date_payment", "-id"], name="payments_user_date_id_idx"),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:14
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0009_subscription_unique_user_course"),
+        ("users", "0009_payments_user_date_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payments",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name="Дата изменения"),
+        ),
+        migrations.CreateModel(
+            name="PaymentRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("day", models.DateField(verbose_name="День")),
+                (
+                    "method_payment",
+                    models.CharField(
+                        choices=[
+                            ("cash", "Наличные"),
+                            ("transfer", "Перевод на счет"),
+                            ("stripe", "Stripe онлайн-оплата"),
+                        ],
+                        max_length=10,
+                        verbose_name="Способ оплаты",
+                    ),
+                ),
+                ("amount_total", models.BigIntegerField(default=0, verbose_name="Сумма платежей")),
+                ("payments_count", models.PositiveIntegerField(default=0, verbose_name="Количество платежей")),
+                (
+                    "course",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="materials.course",
+                        verbose_name="Курс",
+                    ),
+                ),
+                (
+                    "lesson",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="materials.lesson",
+                        verbose_name="Урок",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Выручка за день",
+                "verbose_name_plural": "Выручка по дням",
+                "indexes": [models.Index(fields=["day"], name="payment_rollup_day_idx")],
+                "constraints": [
+                    models.UniqueConstraint(
+                        models.F("day"),
+                        django.db.models.functions.comparison.Coalesce("course", models.Value(0)),
+                        django.db.models.functions.comparison.Coalesce("lesson", models.Value(0)),
+                        models.F("method_payment"),
+                        name="payment_rollup_bucket_unique",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -1,5 +1,9 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils.functional import cached_property
 
 
 class User(AbstractUser):
@@ -36,11 +40,65 @@ class User(AbstractUser):
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
+        indexes = [
+            # Частичный индекс для пакетной блокировки неактивных пользователей
+            models.Index(fields=["last_login"], condition=models.Q(is_active=True), name="user_active_last_login_idx"),
+        ]
+
+    @cached_property
+    def recent_payments(self) -> list:
+        """Последние USER_RECENT_PAYMENTS платежей пользователя, новые первыми.
+
+        В списках пользователей заполняется заранее через Prefetch(to_attr="recent_payments")."""
+        return list(self.payments_set.order_by("-date_payment", "-id")[:settings.USER_RECENT_PAYMENTS])
+
+
+class PaymentsQuerySet(models.QuerySet):
+    """Выборка платежей: удаление пересчитывает дни сводки выручки с оплаченными платежами.
+
+    Удаленный платеж не найти по updated_at, поэтому дни собираются до DELETE.
+    Сигнал post_delete для этого не используется: он отключил бы быстрое
+    удаление платежей каскадом от пользователя, курса или урока."""
+
+    def paid_days(self) -> list:
+        """Дни (по местному времени) оплаченных платежей выборки."""
+        return list(
+            self.filter(status=Payments.STATUS_PAID)
+            .annotate(day=TruncDate("date_payment"))
+            .order_by()
+            .values_list("day", flat=True)
+            .distinct()
+        )
+
+    def schedule_rollup_recompute(self) -> None:
+        """Пересчитывает дни оплаченных платежей выборки после фиксации транзакции."""
+        # Импорт внутри метода: users.rollups зависит от задач, а они - от моделей
+        from users.rollups import schedule_rollup_recompute
+
+        schedule_rollup_recompute(*self.paid_days())
+
+    def delete(self):
+        self.schedule_rollup_recompute()
+        return super().delete()
 
 
 class Payments(models.Model):
     """Модель для хранения информации о платежах."""
 
+    STATUS_PENDING = "pending"
+    STATUS_OPEN = "open"
+    STATUS_FAILED = "failed"
+    STATUS_PAID = "paid"
+    STATUS_EXPIRED = "expired"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Ожидает создания ссылки на оплату"),
+        (STATUS_OPEN, "Ссылка на оплату создана"),
+        (STATUS_FAILED, "Ошибка создания ссылки или оплаты"),
+        (STATUS_PAID, "Оплачен"),
+        (STATUS_EXPIRED, "Сессия оплаты истекла"),
+    ]
+    METHOD_CHOICES = [("cash", "Наличные"), ("transfer", "Перевод на счет"), ("stripe", "Stripe онлайн-оплата")]
+
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -71,7 +129,7 @@ class Payments(models.Model):
     )
     method_payment = models.CharField(
         max_length=10,
-        choices=[("cash", "Наличные"), ("transfer", "Перевод на счет"), ("stripe", "Stripe онлайн-оплата")],
+        choices=METHOD_CHOICES,
         verbose_name="Способ оплаты",
         help_text="Выберите способ оплаты",
     )
@@ -89,11 +147,176 @@ class Payments(models.Model):
         verbose_name="Ссылка на оплату",
         help_text="Укажите ссылку на оплату",
     )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name="Статус платежа",
+    )
+    # При массовом UPDATE (QuerySet.update) заполняется явно: по нему пересчитывается сводка выручки
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Дата изменения")
+
+    objects = PaymentsQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Платеж"
         verbose_name_plural = "Платежи"
         ordering = ["-date_payment"]  # новые платежи первыми
+        indexes = [
+            # Индекс для курсорной пагинации платежей
+            models.Index(fields=["-date_payment", "-id"], name="payments_date_id_idx"),
+            # Индекс для применения событий Stripe по id сессии оплаты
+            models.Index(fields=["session_id"], name="payments_session_id_idx"),
+            # Индекс для постраничной истории платежей пользователя
+            models.Index(fields=["user", "-date_payment", "-id"], name="payments_user_date_id_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.amount}"
+
+    def save(self, *args, **kwargs):
+        # Наличные и переводы вносятся уже полученными: ссылка на оплату им не нужна
+        if self._state.adding and self.method_payment != "stripe" and self.status == self.STATUS_PENDING:
+            self.status = self.STATUS_PAID
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        # Удаление одного платежа пересчитывает его день так же, как удаление выборки
+        type(self).objects.filter(pk=self.pk).schedule_rollup_recompute()
+        return super().delete(*args, **kwargs)
+
+
+class StripeCatalogItem(models.Model):
+    """Продукт и цена в Stripe, созданные для курса или урока с определенной суммой.
+
+    Позволяет переиспользовать продукт и цену между платежами: при оформлении
+    оплаты в Stripe остается только создание сессии."""
+
+    course = models.ForeignKey(
+        'materials.Course',
+        on_delete=models.CASCADE,
+        verbose_name="Курс",
+        null=True,
+        blank=True,
+    )
+    lesson = models.ForeignKey(
+        'materials.Lesson',
+        on_delete=models.CASCADE,
+        verbose_name="Урок",
+        null=True,
+        blank=True,
+    )
+    amount = models.PositiveIntegerField(verbose_name="Сумма оплаты")
+    product_name = models.CharField(max_length=100, verbose_name="Название продукта")
+    product_id = models.CharField(max_length=255, verbose_name="Id продукта в Stripe")
+    price_id = models.CharField(max_length=255, verbose_name="Id цены в Stripe")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Продукт Stripe"
+        verbose_name_plural = "Продукты Stripe"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["course", "amount"],
+                condition=models.Q(course__isnull=False),
+                name="stripe_catalog_course_amount",
+            ),
+            models.UniqueConstraint(
+                fields=["lesson", "amount"],
+                condition=models.Q(lesson__isnull=False),
+                name="stripe_catalog_lesson_amount",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_name} - {self.amount}"
+
+
+class StripeEvent(models.Model):
+    """Событие Stripe, полученное через webhook.
+
+    События применяются к платежам фоновой задачей, примененное событие получает
+    processed_at. Необработанные события находятся по частичному индексу."""
+
+    event_id = models.CharField(max_length=255, unique=True, verbose_name="Id события в Stripe")
+    type = models.CharField(max_length=100, verbose_name="Тип события")
+    session_id = models.CharField(max_length=255, blank=True, null=True, verbose_name="Id сессии оплаты")
+    payment_status = models.CharField(
+        max_length=50, blank=True, default="", verbose_name="Статус оплаты сессии (payment_status)"
+    )
+    payload = models.JSONField(verbose_name="Данные события")
+    received_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата получения")
+    processed_at = models.DateTimeField(blank=True, null=True, verbose_name="Дата применения")
+
+    class Meta:
+        verbose_name = "Событие Stripe"
+        verbose_name_plural = "События Stripe"
+        indexes = [
+            models.Index(
+                fields=["id"], name="stripe_event_pending_idx", condition=models.Q(processed_at__isnull=True)
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.type} - {self.event_id}"
+
+
+class Checkpoint(models.Model):
+    """Сохраненный прогресс фоновой обработки (например, id последнего примененного события)."""
+
+    name = models.CharField(max_length=100, unique=True, verbose_name="Название")
+    value = models.JSONField(default=dict, verbose_name="Значение")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Контрольная точка"
+        verbose_name_plural = "Контрольные точки"
+
+    def __str__(self):
+        return self.name
+
+
+class PaymentRollup(models.Model):
+    """Сумма и количество оплаченных платежей за день по курсу или уроку и способу оплаты.
+
+    Заполняется задачей refresh_payment_rollups, которая пересчитывает дни с
+    измененными платежами, и служит источником для отчетов о выручке."""
+
+    day = models.DateField(verbose_name="День")
+    course = models.ForeignKey(
+        'materials.Course',
+        on_delete=models.CASCADE,
+        verbose_name="Курс",
+        null=True,
+        blank=True,
+    )
+    lesson = models.ForeignKey(
+        'materials.Lesson',
+        on_delete=models.CASCADE,
+        verbose_name="Урок",
+        null=True,
+        blank=True,
+    )
+    method_payment = models.CharField(max_length=10, choices=Payments.METHOD_CHOICES, verbose_name="Способ оплаты")
+    amount_total = models.BigIntegerField(default=0, verbose_name="Сумма платежей")
+    payments_count = models.PositiveIntegerField(default=0, verbose_name="Количество платежей")
+
+    class Meta:
+        verbose_name = "Выручка за день"
+        verbose_name_plural = "Выручка по дням"
+        indexes = [
+            models.Index(fields=["day"], name="payment_rollup_day_idx"),
+        ]
+        constraints = [
+            # Одна строка на день, курс, урок и способ оплаты; NULL курса или урока считаются равными
+            models.UniqueConstraint(
+                "day",
+                Coalesce("course", Value(0)),
+                Coalesce("lesson", Value(0)),
+                "method_payment",
+                name="payment_rollup_bucket_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.amount_total}"
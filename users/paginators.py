@@ -0,0 +1,65 @@
+from rest_framework.pagination import BasePagination, CursorPagination
+
+
+class PaymentsCursorPagination(CursorPagination):
+    """Курсорная пагинация платежей по дате оплаты (новые первыми).
+
+    Позиция страницы кодируется в непрозрачном курсоре, общее количество
+    не считается, поэтому стоимость страницы не зависит от ее номера."""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-date_payment', '-id')
+
+
+class PaymentsOptionalCursorPagination(BasePagination):
+    """Курсорная пагинация платежей по запросу клиента.
+
+    Без параметров список отдается целиком, как до появления пагинации. Курсорный
+    режим включается параметром ?pagination=cursor или наличием параметра cursor,
+    который подставляется в ссылки next/previous."""
+    mode_query_param = 'pagination'
+    cursor_class = PaymentsCursorPagination
+
+    def __init__(self):
+        self.paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        query_params = request.query_params
+        cursor_requested = self.cursor_class.cursor_query_param in query_params
+        if query_params.get(self.mode_query_param) != 'cursor' and not cursor_requested:
+            return None
+        self.paginator = self.cursor_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.cursor_class().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        mode_parameter = {
+            'name': self.mode_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Режим пагинации: cursor - курсорные страницы, без параметра - весь список',
+            'schema': {'type': 'string', 'enum': ['cursor']},
+        }
+        return self.cursor_class().get_schema_operation_parameters(view) + [mode_parameter]
+
+    def to_html(self):
+        return self.paginator.to_html() if self.paginator is not None else ''
+
+
+class UserCursorPagination(CursorPagination):
+    """Курсорная пагинация пользователей по первичному ключу."""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = 'id'
+
+
+class UserOptionalCursorPagination(PaymentsOptionalCursorPagination):
+    """Курсорная пагинация пользователей по запросу клиента (?pagination=cursor)."""
+    cursor_class = UserCursorPagination
@@ -1,15 +1,18 @@
 from rest_framework import permissions, request, views
 
+from users.roles import is_moderator
+
 
 class IsModer(permissions.BasePermission):
     """Permission для проверки принадлежности пользователя к группе модераторов.
 
     Проверяет, состоит ли аутентифицированный пользователь в группе с названием
     "moderators". Если пользователь не аутентифицирован или не состоит в указанной
-    группе, доступ запрещается."""
+    группе, доступ запрещается. Роли пользователя вычисляются один раз за запрос,
+    поэтому составные проверки (IsOwner | IsModer, ~IsModer) не повторяют запросы к БД."""
     def has_permission(self, request: request.Request, view: views.APIView) -> bool:
         """Проверяет право доступа пользователя к представлению."""
-        return request.user.is_authenticated and request.user.groups.filter(name="moderators").exists()
+        return is_moderator(request)
 
 
 class IsOwner(permissions.BasePermission):
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import request
+
+MODERATORS_GROUP = "moderators"
+USER_ROLES_KEY = "users:roles:{user_id}"
+
+
+def user_roles_key(user_id: int) -> str:
+    """Ключ кэша с ролями пользователя."""
+    return USER_ROLES_KEY.format(user_id=user_id)
+
+
+def get_user_roles(request: request.Request) -> frozenset[str]:
+    """Возвращает роли (названия групп) пользователя запроса.
+
+    Роли вычисляются один раз за запрос и сохраняются на объекте HttpRequest,
+    поэтому все permission-классы и проверки по объектам используют один результат."""
+    user = request.user
+    if not user.is_authenticated:
+        return frozenset()
+    http_request = getattr(request, "_request", request)
+    memo = getattr(http_request, "_user_roles", None)
+    if memo is None or memo[0] != user.pk:
+        memo = (user.pk, load_user_roles(user))
+        http_request._user_roles = memo
+    return memo[1]
+
+
+def load_user_roles(user) -> frozenset[str]:
+    """Загружает роли пользователя из кэша (Redis) или из БД.
+
+    Кэш отключается настройкой USER_ROLES_CACHE_TIMEOUT = 0."""
+    timeout = settings.USER_ROLES_CACHE_TIMEOUT
+    if timeout:
+        roles = cache.get(user_roles_key(user.pk))
+        if roles is not None:
+            return roles
+    roles = frozenset(user.groups.values_list("name", flat=True))
+    if timeout:
+        cache.set(user_roles_key(user.pk), roles, timeout=timeout)
+    return roles
+
+
+def is_moderator(request: request.Request) -> bool:
+    """Проверяет, состоит ли пользователь запроса в группе модераторов."""
+    return MODERATORS_GROUP in get_user_roles(request)
+
+
+def invalidate_user_roles(*user_ids) -> None:
+    """Удаляет из кэша роли указанных пользователей."""
+    keys = [user_roles_key(user_id) for user_id in set(user_ids) if user_id]
+    if keys:
+        cache.delete_many(keys)
@@ -0,0 +1,33 @@
+from datetime import date
+
+from django.db import transaction
+
+from users.tasks import recompute_payment_rollup_days
+
+
+class PendingRollupDays:
+    """Дни сводки выручки, ожидающие пересчета после фиксации текущей транзакции."""
+
+    def __init__(self):
+        self.days = set()
+
+    def __call__(self) -> None:
+        recompute_payment_rollup_days.delay(sorted(self.days))
+
+
+def schedule_rollup_recompute(*days: date) -> None:
+    """Пересчитывает дни сводки выручки после фиксации транзакции.
+
+    Дни всех удалений и переносов платежей в транзакции собираются в одно
+    множество и отправляются одной задачей."""
+    if not days:
+        return
+    connection = transaction.get_connection()
+    pending = getattr(connection, "pending_rollup_days", None)
+    # После фиксации или отката транзакции обработчик уходит из run_on_commit: начинается новый набор
+    is_new = pending is None or not any(callback is pending for _, callback, _ in connection.run_on_commit)
+    if is_new:
+        pending = connection.pending_rollup_days = PendingRollupDays()
+    pending.days.update(day.isoformat() for day in days)
+    if is_new:
+        transaction.on_commit(pending)
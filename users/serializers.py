@@ -1,4 +1,10 @@
-from rest_framework.serializers import ModelSerializer
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+from rest_framework.serializers import (ChoiceField, DateField, DateTimeField, IntegerField, ModelSerializer,
+                                        Serializer, SerializerMethodField, ValidationError)
 
 from users.models import Payments, User
 
@@ -12,9 +18,36 @@ class PaymentsSerializer(ModelSerializer):
         fields = "__all__"
 
 
+class PaymentsCreateSerializer(PaymentsSerializer):
+    """Сериализатор для создания платежа через Stripe.
+
+    Проверяет, что указан курс или урок, до любых обращений к Stripe."""
+
+    class Meta(PaymentsSerializer.Meta):
+        """Метаданные сериализатора создания платежа."""
+        read_only_fields = ("user", "session_id", "link", "status")
+
+    def validate(self, attrs):
+        """Проверяет, что указан оплачиваемый курс или урок."""
+        if not attrs.get("course_paid") and not attrs.get("lesson_paid"):
+            raise ValidationError("Необходимо указать курс или урок для оплаты")
+        return attrs
+
+
+class PaymentStatusSerializer(ModelSerializer):
+    """Сериализатор статуса платежа и ссылки на оплату."""
+
+    class Meta:
+        """Метаданные сериализатора статуса платежа."""
+        model = Payments
+        fields = ("id", "status", "session_id", "link")
+
+
 class UserSerializer(ModelSerializer):
     """Сериализатор для модели Пользователь."""
-    payments_set = PaymentsSerializer(many=True, read_only=True)
+    payments_set = PaymentsSerializer(
+        many=True, read_only=True, source="recent_payments", help_text="Последние платежи пользователя"
+    )
 
     class Meta:
         """Метаданные сериализатора пользователь."""
@@ -27,18 +60,76 @@ class UserSerializer(ModelSerializer):
 
 
 class UserRegistrationSerializer(ModelSerializer):
-    """Сериализатор для регистрации пользователя."""
+    """Сериализатор для регистрации пользователя.
+
+    Пароль хешируется до сохранения, пользователь создается одним INSERT."""
     class Meta:
         """Метаданные сериализатора."""
         model = User
         fields = ("id", "email", "password", "phone", "city", "avatar")
+        extra_kwargs = {"password": {"write_only": True}}
+
+    def create(self, validated_data):
+        """Создает пользователя с уже захешированным паролем."""
+        validated_data["password"] = make_password(validated_data["password"])
+        return super().create(validated_data)
 
 
 class UserHistoryPaymentsSerializer(ModelSerializer):
-    """Сериализатор для модели История платежей."""
-    payments_set = PaymentsSerializer(many=True, read_only=True)
+    """Сериализатор истории платежей: последние платежи и итоги по всем платежам пользователя.
+
+    Итоги считает UserHistoryPaymentsViewSet одним запросом для пользователей страницы,
+    полный список платежей отдается отдельным постраничным ресурсом."""
+    payments_set = PaymentsSerializer(
+        many=True, read_only=True, source="recent_payments", help_text="Последние платежи пользователя"
+    )
+    total_paid = IntegerField(read_only=True)
+    payments_count = IntegerField(read_only=True)
+    last_payment = DateTimeField(read_only=True)
+    by_method = SerializerMethodField()
 
     class Meta:
         """Метаданные сериализатора История платежей."""
         model = User
-        fields = ("id", "email", "phone", "city", "payments_set")
\ No newline at end of file
+        fields = (
+            "id", "email", "phone", "city", "payments_set", "total_paid", "payments_count", "last_payment", "by_method"
+        )
+
+    def get_by_method(self, user: User) -> dict:
+        """Возвращает сумму и количество платежей по каждому способу оплаты."""
+        return {
+            method: {"total": getattr(user, f"total_{method}"), "count": getattr(user, f"count_{method}")}
+            for method, _ in Payments.METHOD_CHOICES
+        }
+
+
+class RevenueQuerySerializer(Serializer):
+    """Параметры отчета о выручке."""
+    date_from = DateField(required=False, help_text="Начало периода, включительно (по умолчанию - от конца периода)")
+    date_to = DateField(required=False, help_text="Конец периода, включительно (по умолчанию - сегодня)")
+    group_by = ChoiceField(choices=("day", "month"), default="day", help_text="Группировка по дням или месяцам")
+    method_payment = ChoiceField(choices=Payments.METHOD_CHOICES, required=False, help_text="Способ оплаты")
+
+    def validate(self, attrs):
+        """Дополняет период по умолчанию и проверяет его границы.
+
+        Без дат отчет строится за REVENUE_MAX_DAYS дней до сегодняшнего дня:
+        число строк ответа ограничено длиной периода."""
+        max_days = timedelta(days=settings.REVENUE_MAX_DAYS - 1)
+        if "date_to" not in attrs:
+            attrs["date_to"] = attrs["date_from"] + max_days if "date_from" in attrs else timezone.localdate()
+        attrs.setdefault("date_from", attrs["date_to"] - max_days)
+        if attrs["date_from"] > attrs["date_to"]:
+            raise ValidationError("Начало периода позже конца")
+        if attrs["date_to"] - attrs["date_from"] > max_days:
+            raise ValidationError(f"Период отчета не может быть длиннее {settings.REVENUE_MAX_DAYS} дней")
+        return attrs
+
+
+class RevenueSerializer(Serializer):
+    """Строка отчета о выручке: период, курс или урок, сумма и количество платежей."""
+    period = DateField()
+    course = IntegerField(allow_null=True)
+    lesson = IntegerField(allow_null=True)
+    amount = IntegerField()
+    count = IntegerField()
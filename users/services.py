@@ -1,36 +1,65 @@
-import stripe
-
-from config.settings import STRIPE_API_KEY
-
-stripe.api_key = STRIPE_API_KEY
+from users.models import StripeCatalogItem
+from users.stripe_client import get_stripe_client, track_stripe_call
 
 
 def create_stripe_product(product):
     """ Создаёт продукт в Stripe. """
-    try:
-        stripe_product = stripe.Product.create(name=product)
-        return stripe_product
-    except stripe.error.StripeError as e:
-        print(f"Произошла ошибка при создании продукта: {e}")
-        return None
+    with track_stripe_call("products.create"):
+        return get_stripe_client().v1.products.create(params={"name": product})
 
 
 def create_stripe_price(amount, product_id=None):
     """Создаёт цену в Stripe."""
     unit_amount = int(round(amount * 100))
-    return stripe.Price.create(
-        currency="rub",
-        unit_amount=unit_amount,
-        product=product_id,
-    )
+    with track_stripe_call("prices.create"):
+        return get_stripe_client().v1.prices.create(
+            params={"currency": "rub", "unit_amount": unit_amount, "product": product_id}
+        )
 
 
-def create_stripe_sessions(price):
-    """Создает сессию на оплату в Stripe."""
+def create_stripe_sessions(price_id, idempotency_key=None):
+    """Создает сессию на оплату в Stripe.
 
-    session = stripe.checkout.Session.create(
-        success_url="http://127.0.0.1:8000/",
-        line_items=[{"price": price.get("id"), "quantity": 1}],
-        mode="payment",
-    )
+    idempotency_key позволяет безопасно повторять создание сессии для одного платежа."""
+    options = {"idempotency_key": idempotency_key} if idempotency_key else {}
+    with track_stripe_call("checkout.sessions.create"):
+        session = get_stripe_client().v1.checkout.sessions.create(
+            params={
+                "success_url": "http://127.0.0.1:8000/",
+                "line_items": [{"price": price_id, "quantity": 1}],
+                "mode": "payment",
+            },
+            options=options,
+        )
     return session.get("id"), session.get("url")
+
+
+def get_stripe_price_id(amount, course=None, lesson=None):
+    """Возвращает id цены Stripe для курса или урока с указанной суммой.
+
+    Продукт и цена создаются в Stripe один раз и сохраняются в StripeCatalogItem.
+    Если название курса или урока изменилось, создаются новые продукт и цена,
+    запись каталога обновляется. Другая сумма - отдельная запись каталога."""
+    item_filter = {"course": course} if course else {"lesson": lesson}
+    product_name = (course or lesson).name
+    item = StripeCatalogItem.objects.filter(amount=amount, **item_filter).first()
+    if item is not None and item.product_name == product_name:
+        return item.price_id
+
+    product = create_stripe_product(product_name)
+    price = create_stripe_price(amount, product.id)
+    StripeCatalogItem.objects.update_or_create(
+        amount=amount,
+        defaults={"product_name": product_name, "product_id": product.id, "price_id": price.id},
+        **item_filter,
+    )
+    return price.id
+
+
+def create_payment_checkout(payment, idempotency_key=None):
+    """Создает в Stripe сессию оплаты для платежа.
+
+    Продукт и цена берутся из каталога, поэтому обычно нужен только один вызов Stripe.
+    Возвращает id сессии и ссылку на оплату."""
+    price_id = get_stripe_price_id(payment.amount, course=payment.course_paid, lesson=payment.lesson_paid)
+    return create_stripe_sessions(price_id, idempotency_key=idempotency_key)
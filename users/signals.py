@@ -0,0 +1,45 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from users.models import Payments, User
+from users.roles import invalidate_user_roles
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Сбрасывает кэш ролей при изменении состава групп пользователя.
+
+    reverse=True означает, что изменялись пользователи группы (group.user_set)."""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        invalidate_user_roles(instance.pk)
+    elif action == "pre_clear":
+        invalidate_user_roles(*instance.user_set.values_list("pk", flat=True))
+    else:
+        invalidate_user_roles(*pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_roles_on_group_change(sender, instance, **kwargs):
+    """Сбрасывает кэш ролей участников переименованной или удаляемой группы."""
+    if instance.pk:
+        invalidate_user_roles(*instance.user_set.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=User)
+def recompute_rollup_on_user_delete(sender, instance, **kwargs):
+    """Платежи пользователя удаляются каскадом, минуя PaymentsQuerySet.delete: их дни
+    пересчитываются отдельно. Удаление курса или урока удаляет и строки сводки."""
+    Payments.objects.filter(user=instance).schedule_rollup_recompute()
+
+
+@receiver(pre_save, sender=Payments)
+def recompute_rollup_on_payment_move(sender, instance, raw=False, **kwargs):
+    """date_payment обновляется при каждом сохранении (auto_now): старый день платежа
+    пересчитывается, новый найдет refresh_payment_rollups по updated_at."""
+    if raw or instance._state.adding:
+        return
+    Payments.objects.filter(pk=instance.pk).schedule_rollup_recompute()
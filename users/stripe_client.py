@@ -0,0 +1,85 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+import stripe
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def create_stripe_client() -> stripe.StripeClient:
+    """Создает клиент Stripe с пулом keep-alive соединений, таймаутами и повторами.
+
+    Повторы сетевых ошибок выполняет сама библиотека stripe: с экспоненциальной
+    задержкой и ключом идемпотентности для POST-запросов."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.STRIPE_HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    http_client = stripe.RequestsClient(
+        timeout=(settings.STRIPE_CONNECT_TIMEOUT, settings.STRIPE_READ_TIMEOUT),
+        session=session,
+    )
+    return stripe.StripeClient(
+        settings.STRIPE_API_KEY,
+        http_client=http_client,
+        max_network_retries=settings.STRIPE_MAX_NETWORK_RETRIES,
+    )
+
+
+def get_stripe_client() -> stripe.StripeClient:
+    """Возвращает клиент Stripe текущего процесса.
+
+    После fork (воркеры gunicorn и celery) создается новый клиент, чтобы
+    не делить сокеты пула с родительским процессом."""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = create_stripe_client()
+                _client_pid = pid
+    return _client
+
+
+@contextmanager
+def track_stripe_call(name: str):
+    """Замеряет длительность вызова Stripe и учитывает его в статистике процесса."""
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except stripe.StripeError:
+        failed = True
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        record_stripe_call(name, duration, failed)
+        logger.info("Stripe %s: %.3f с%s", name, duration, ", ошибка" if failed else "")
+
+
+def record_stripe_call(name: str, duration: float, failed: bool = False) -> None:
+    """Добавляет вызов в статистику: количество, ошибки, суммарное и максимальное время."""
+    with _stats_lock:
+        stats = _stats.setdefault(name, {"count": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+        stats["count"] += 1
+        stats["errors"] += int(failed)
+        stats["total_seconds"] += duration
+        stats["max_seconds"] = max(stats["max_seconds"], duration)
+
+
+def get_stripe_call_stats() -> dict:
+    """Возвращает копию статистики вызовов Stripe текущего процесса."""
+    with _stats_lock:
+        return {name: dict(stats) for name, stats in _stats.items()}
@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import stripe
+
+
+class StripeStandIn:
+    """Локальная замена клиента Stripe для тестов и замеров: объекты создаются в памяти.
+
+    fail_times - сколько первых вызовов v1.checkout.sessions.create завершатся ошибкой Stripe."""
+
+    def __init__(self, fail_times=0):
+        self.calls = []
+        self.options = []
+        self.fail_times = fail_times
+        self.v1 = SimpleNamespace(
+            products=SimpleNamespace(create=self._create("product")),
+            prices=SimpleNamespace(create=self._create("price")),
+            checkout=SimpleNamespace(sessions=SimpleNamespace(create=self._session_create)),
+        )
+
+    def _create(self, kind):
+        def create(params=None, options=None):
+            self.calls.append((kind, params))
+            self.options.append((kind, options or {}))
+            return stripe.StripeObject.construct_from({"id": f"{kind}_{len(self.calls)}", **params}, "sk_test")
+        return create
+
+    def _session_create(self, params=None, options=None):
+        if self.fail_times:
+            self.fail_times -= 1
+            raise stripe.APIConnectionError("Stripe недоступен")
+        session = self._create("session")(params, options)
+        session["url"] = f"https://checkout.stripe.test/{session['id']}"
+        return session
+
+    def patch(self):
+        """Подменяет клиент Stripe в users.services."""
+        return mock.patch("users.services.get_stripe_client", return_value=self)
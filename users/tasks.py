@@ -0,0 +1,216 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+import stripe
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, DateTimeField, Sum, Value, When
+from django.db.models.functions import TruncDate
+
+from users.activity import pop_activity
+from users.models import Checkpoint, PaymentRollup, Payments, StripeEvent, User
+from users.services import create_payment_checkout
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=10)
+def create_checkout_session(self, payment_id):
+    """Создает сессию оплаты Stripe для платежа в статусе pending.
+
+    Ссылка и id сессии сохраняются одним UPDATE, при исчерпании попыток
+    платеж переводится в статус failed."""
+    payment = (
+        Payments.objects.select_related("course_paid", "lesson_paid")
+        .filter(pk=payment_id, status=Payments.STATUS_PENDING)
+        .first()
+    )
+    if payment is None:
+        # Платеж удален или уже обработан
+        return None
+
+    try:
+        # Ключ идемпотентности не меняется между повторами задачи: Stripe вернет ту же сессию
+        session_id, payment_link = create_payment_checkout(payment, idempotency_key=f"payment-{payment.pk}-checkout")
+    except stripe.StripeError as error:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=error)
+        logger.error("Не удалось создать сессию оплаты для платежа %s: %s", payment_id, error)
+        Payments.objects.filter(pk=payment_id, status=Payments.STATUS_PENDING).update(
+            status=Payments.STATUS_FAILED, updated_at=datetime.now(timezone.utc)
+        )
+        return Payments.STATUS_FAILED
+
+    Payments.objects.filter(pk=payment_id, status=Payments.STATUS_PENDING).update(
+        session_id=session_id, link=payment_link, status=Payments.STATUS_OPEN, updated_at=datetime.now(timezone.utc)
+    )
+    return Payments.STATUS_OPEN
+
+
+# Статус платежа, который устанавливает событие сессии оплаты Stripe
+STRIPE_EVENT_STATUSES = {
+    "checkout.session.async_payment_succeeded": Payments.STATUS_PAID,
+    "checkout.session.async_payment_failed": Payments.STATUS_FAILED,
+    "checkout.session.expired": Payments.STATUS_EXPIRED,
+}
+
+
+def stripe_event_status(event_type: str, payment_status: str) -> str | None:
+    """Статус платежа по событию Stripe или None, если событие статус не меняет.
+
+    checkout.session.completed означает оплату, только если payment_status сессии "paid":
+    для отложенных способов оплаты деньги подтверждает позже async_payment_succeeded."""
+    if event_type == "checkout.session.completed":
+        return Payments.STATUS_PAID if payment_status == "paid" else None
+    return STRIPE_EVENT_STATUSES.get(event_type)
+
+
+PAYMENT_ROLLUPS_CHECKPOINT = "payment_rollups"
+
+
+def stripe_events_pending_key():
+    """Ключ кэша с признаком запланированного применения событий Stripe."""
+    return "users:stripe-events-pending"
+
+
+@shared_task
+def apply_stripe_events():
+    """Применяет необработанные события Stripe к платежам пакетами.
+
+    Пакет - события без processed_at по возрастанию id, заблокированные через
+    SELECT ... FOR UPDATE SKIP LOCKED: параллельные запуски берут разные события, а
+    событие, зафиксированное позже события с большим id, попадает в следующий пакет.
+    Для каждой сессии учитывается последнее событие пакета, затем платежи обновляются
+    одним UPDATE на каждый статус (поиск по индексу session_id). Обновление платежей и
+    отметка processed_at фиксируются в одной транзакции, поэтому событие применяется
+    один раз. Возвращает количество обработанных событий."""
+    cache.delete(stripe_events_pending_key())
+    processed = 0
+    while True:
+        with transaction.atomic():
+            events = list(
+                StripeEvent.objects.select_for_update(skip_locked=True)
+                .filter(processed_at__isnull=True)
+                .order_by("pk")
+                .values_list("pk", "type", "session_id", "payment_status")[:settings.STRIPE_EVENTS_BATCH_SIZE]
+            )
+            if not events:
+                return processed
+
+            session_statuses = {}
+            for _, event_type, session_id, session_payment_status in events:
+                payment_status = stripe_event_status(event_type, session_payment_status)
+                if session_id and payment_status:
+                    session_statuses[session_id] = payment_status
+            sessions_by_status = defaultdict(list)
+            for session_id, payment_status in session_statuses.items():
+                sessions_by_status[payment_status].append(session_id)
+            for payment_status, session_ids in sessions_by_status.items():
+                payments = Payments.objects.filter(session_id__in=session_ids)
+                if payment_status != Payments.STATUS_PAID:
+                    # Оплаченный платеж не меняет статус из-за запоздавших событий
+                    payments = payments.exclude(status=Payments.STATUS_PAID)
+                payments.update(status=payment_status, updated_at=datetime.now(timezone.utc))
+
+            event_ids = [event[0] for event in events]
+            StripeEvent.objects.filter(pk__in=event_ids).update(processed_at=datetime.now(timezone.utc))
+        processed += len(events)
+        logger.info("Применено событий Stripe: %s, последнее id %s", len(events), events[-1][0])
+
+
+@shared_task
+def flush_user_activity():
+    """Сбрасывает накопленные отметки активности в User.last_login.
+
+    Все отметки записываются одним UPDATE ... CASE на пакет из
+    USER_ACTIVITY_FLUSH_BATCH_SIZE пользователей. Возвращает число обновленных строк."""
+    seen = sorted(pop_activity().items())
+    updated = 0
+    batch_size = settings.USER_ACTIVITY_FLUSH_BATCH_SIZE
+    for start in range(0, len(seen), batch_size):
+        batch = seen[start:start + batch_size]
+        last_login = Case(
+            *[
+                When(pk=user_id, then=Value(datetime.fromtimestamp(seen_at, tz=timezone.utc)))
+                for user_id, seen_at in batch
+            ],
+            output_field=DateTimeField(),
+        )
+        updated += User.objects.filter(pk__in=[user_id for user_id, _ in batch]).update(last_login=last_login)
+    if updated:
+        logger.info("Обновлена активность пользователей: %s", updated)
+    return updated
+
+
+@shared_task
+def refresh_payment_rollups():
+    """Пересчитывает PaymentRollup за дни, в которых менялись платежи.
+
+    Дни для пересчета - дни платежей с updated_at не раньше сохраненной отметки
+    минус PAYMENT_ROLLUPS_OVERLAP: перекрытие подхватывает транзакции, зафиксированные
+    позже своего updated_at. Дни пересчитываются целиком пакетами по
+    PAYMENT_ROLLUPS_BATCH_SIZE, поэтому смена статуса (например, оплата по webhook)
+    попадает в сводку, а повторный пересчет дня ничего не меняет.
+    Возвращает количество пересчитанных дней."""
+    started = datetime.now(timezone.utc)
+    checkpoint = Checkpoint.objects.filter(name=PAYMENT_ROLLUPS_CHECKPOINT).first()
+    payments = Payments.objects.all()
+    if checkpoint is not None and "updated_at" in checkpoint.value:
+        since = datetime.fromisoformat(checkpoint.value["updated_at"])
+        payments = payments.filter(updated_at__gte=since - timedelta(seconds=settings.PAYMENT_ROLLUPS_OVERLAP))
+    days = sorted(
+        payments.annotate(day=TruncDate("date_payment")).order_by().values_list("day", flat=True).distinct()
+    )
+
+    batch_size = settings.PAYMENT_ROLLUPS_BATCH_SIZE
+    for start in range(0, len(days), batch_size):
+        recompute_payment_rollups(days[start:start + batch_size])
+
+    with transaction.atomic():
+        checkpoint, _ = Checkpoint.objects.select_for_update().get_or_create(name=PAYMENT_ROLLUPS_CHECKPOINT)
+        previous = checkpoint.value.get("updated_at")
+        # Параллельный запуск, начатый позже, не откатывает отметку назад
+        if previous is None or datetime.fromisoformat(previous) < started:
+            checkpoint.value = {"updated_at": started.isoformat()}
+            checkpoint.save(update_fields=["value", "updated_at"])
+    if days:
+        logger.info("Пересчитана сводка выручки за дней: %s", len(days))
+    return len(days)
+
+
+@shared_task
+def recompute_payment_rollup_days(days: list[str]):
+    """Пересчитывает сводку за указанные дни (ISO-даты), например после удаления платежа."""
+    recompute_payment_rollups([date.fromisoformat(day) for day in days])
+
+
+def recompute_payment_rollups(days: list[date]) -> None:
+    """Заменяет строки сводки за дни суммами оплаченных платежей.
+
+    Пересчет идет под блокировкой контрольной точки: параллельные пересчеты одного
+    дня выполняются по очереди и не создают дублирующих строк."""
+    with transaction.atomic():
+        Checkpoint.objects.select_for_update().get_or_create(name=PAYMENT_ROLLUPS_CHECKPOINT)
+        groups = (
+            Payments.objects.filter(status=Payments.STATUS_PAID)
+            .annotate(day=TruncDate("date_payment"))
+            .filter(day__in=days)
+            .values("day", "course_paid", "lesson_paid", "method_payment")
+            .annotate(amount_total=Sum("amount"), payments_count=Count("pk"))
+            .order_by()
+        )
+        PaymentRollup.objects.filter(day__in=days).delete()
+        PaymentRollup.objects.bulk_create([
+            PaymentRollup(
+                day=group["day"],
+                course_id=group["course_paid"],
+                lesson_id=group["lesson_paid"],
+                method_payment=group["method_payment"],
+                amount_total=group["amount_total"],
+                payments_count=group["payments_count"],
+            )
+            for group in groups
+        ])
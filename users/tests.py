@@ -1,3 +1,778 @@
-# from django.test import TestCase
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import time
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import stripe
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models.deletion import Collector
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+
+from materials.models import Course, Lesson
+from users.activity import RedisActivityStore, pop_activity, record_activity
+from users.importing import _copy_users, load_users
+from users.models import PaymentRollup, Payments, StripeCatalogItem, StripeEvent, User
+from users.services import create_stripe_product
+from users.stripe_client import get_stripe_call_stats, get_stripe_client
+from users.stripe_fake import StripeStandIn
+from users.tasks import apply_stripe_events, flush_user_activity, refresh_payment_rollups
+from users.views import PaymentViewSet
+
+
+class PaymentListTestCase(APITestCase):
+    """Тесты списка платежей."""
+    def setUp(self):
+        """Создает пользователя, курс и несколько платежей."""
+        self.user = User.objects.create(email="email_test@test.com")
+        self.course = Course.objects.create(name="Test-course", owner=self.user)
+        self.payments = [
+            Payments.objects.create(user=self.user, course_paid=self.course, amount=100 * i, method_payment="cash")
+            for i in range(1, 6)
+        ]
+        self.factory = APIRequestFactory()
+        self.view = PaymentViewSet.as_view({"get": "list"})
+
+    def _get(self, url):
+        """Выполняет GET-запрос к списку платежей от имени пользователя."""
+        request = self.factory.get(url)
+        force_authenticate(request, user=self.user)
+        return self.view(request)
+
+    def test_payments_list_cursor_pagination(self):
+        """По запросу платежи отдаются курсорными страницами, новые первыми, без общего количества."""
+        response = self._get("/users/payments/?pagination=cursor&page_size=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+
+        received = [payment["id"] for payment in response.data["results"]]
+        while response.data["next"]:
+            response = self._get(response.data["next"])
+            received += [payment["id"] for payment in response.data["results"]]
+        self.assertEqual(received, [payment.id for payment in reversed(self.payments)])
+
+    def test_payments_list_unpaginated_by_default(self):
+        """Без параметра пагинации список отдается целиком, как раньше."""
+        response = self._get("/users/payments/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = [payment.id for payment in reversed(self.payments)]
+        self.assertEqual([payment["id"] for payment in response.data], expected)
+
+    def test_cursor_stable_on_equal_dates(self):
+        """При одинаковой дате платежей курсор не пропускает и не повторяет строки, в том числе с ?ordering."""
+        Payments.objects.update(date_payment=timezone.now())
+        for ordering, expected in [("", reversed(self.payments)), ("&ordering=date_payment", self.payments)]:
+            response = self._get(f"/users/payments/?pagination=cursor&page_size=2{ordering}")
+            received = [payment["id"] for payment in response.data["results"]]
+            while response.data["next"]:
+                response = self._get(response.data["next"])
+                received += [payment["id"] for payment in response.data["results"]]
+            self.assertEqual(received, [payment.id for payment in expected])
+
+
+class UserRolesTestCase(APITestCase):
+    """Тесты вычисления ролей пользователя для permission-классов."""
+    def setUp(self):
+        """Создает владельца курса с уроками и модератора."""
+        cache.clear()
+        self.owner = User.objects.create(email="owner@test.com")
+        self.moderator = User.objects.create(email="moderator@test.com")
+        self.group = Group.objects.create(name="moderators")
+        self.moderator.groups.add(self.group)
+        self.course = Course.objects.create(name="Test-course", owner=self.owner)
+        for i in range(3):
+            Lesson.objects.create(name=f"Lesson-{i}", course=self.course, owner=self.owner)
+        self.client.force_authenticate(user=self.moderator)
+
+    def _group_queries(self, method, url, data=None):
+        """Выполняет запрос и возвращает число запросов к группам пользователя."""
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data)
+        self.assertLess(response.status_code, 400)
+        return sum('"auth_group"' in query["sql"] for query in context.captured_queries)
+
+    def test_roles_resolved_once_per_request(self):
+        """Составные permission-классы используют одно вычисление ролей за запрос."""
+        url = reverse("materials:course-detail", args=(self.course.pk,))
+        self.assertEqual(self._group_queries("patch", url, {"description": "Новое описание"}), 1)
+        self.assertEqual(self._group_queries("get", url), 1)
+
+    @override_settings(USER_ROLES_CACHE_TIMEOUT=60)
+    def test_roles_cached_between_requests_and_invalidated(self):
+        """Роли кэшируются между запросами и сбрасываются при изменении групп."""
+        url = reverse("materials:course-detail", args=(self.course.pk,))
+        self.assertEqual(self._group_queries("get", url), 1)
+        self.assertEqual(self._group_queries("get", url), 0)
+
+        self.moderator.groups.remove(self.group)
+        self.client.force_authenticate(user=self.moderator)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.group.user_set.add(self.moderator)
+        self.assertEqual(self._group_queries("get", url), 1)
+
+
+class PaymentCheckoutTestCase(APITestCase):
+    """Тесты создания платежа и сессии оплаты через локальную замену Stripe."""
+    def setUp(self):
+        """Создает пользователя и курс."""
+        self.user = User.objects.create(email="email_test@test.com")
+        self.course = Course.objects.create(name="Test-course", owner=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("users:payments")
+        self.data = {"course_paid": self.course.pk, "amount": 1000, "method_payment": "stripe"}
+
+    def test_sync_checkout_saves_payment_once(self):
+        """В синхронном режиме платеж сохраняется один раз вместе со ссылкой."""
+        stand_in = StripeStandIn()
+        with stand_in.patch(), CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, self.data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["status"], Payments.STATUS_OPEN)
+        self.assertTrue(response.data["link"].startswith("https://checkout.stripe.test/"))
+        self.assertEqual([kind for kind, _ in stand_in.calls], ["product", "price", "session"])
+        writes = [
+            query for query in context.captured_queries
+            if query["sql"].startswith(("INSERT", "UPDATE")) and '"users_payments"' in query["sql"]
+        ]
+        self.assertEqual(len(writes), 1)
+
+    def test_validation_before_stripe_calls(self):
+        """Без курса и урока платеж отклоняется без обращения к Stripe."""
+        stand_in = StripeStandIn()
+        with stand_in.patch():
+            response = self.client.post(self.url, {"amount": 1000, "method_payment": "stripe"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(stand_in.calls, [])
+        self.assertFalse(Payments.objects.exists())
+
+    @override_settings(STRIPE_ASYNC_CHECKOUT=True)
+    def test_async_checkout_returns_202_and_completes_in_task(self):
+        """В асинхронном режиме ответ 202 приходит до обращения к Stripe, ссылка - из задачи."""
+        stand_in = StripeStandIn()
+        with stand_in.patch():
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(self.url, self.data)
+                self.assertEqual(stand_in.calls, [])
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], Payments.STATUS_PENDING)
+        self.assertEqual(response["Location"], reverse("users:payments_status", args=(response.data["id"],)))
+
+        status_response = self.client.get(response["Location"])
+        self.assertEqual(status_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(status_response.data["status"], Payments.STATUS_OPEN)
+        self.assertTrue(status_response.data["link"].startswith("https://checkout.stripe.test/"))
+        self.assertEqual(
+            dict(stand_in.options)["session"], {"idempotency_key": f"payment-{response.data['id']}-checkout"}
+        )
+
+    @override_settings(STRIPE_ASYNC_CHECKOUT=True)
+    def test_async_checkout_marks_failed_after_retries(self):
+        """Если Stripe недоступен дольше всех попыток, платеж получает статус failed."""
+        stand_in = StripeStandIn(fail_times=10)
+        with stand_in.patch():
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(self.url, self.data)
+        payment = Payments.objects.get(pk=response.data["id"])
+        self.assertEqual(payment.status, Payments.STATUS_FAILED)
+
+    def test_sync_checkout_stripe_error_returns_502(self):
+        """Ошибка Stripe в синхронном режиме - ответ 502 и платеж в статусе failed, а не 500."""
+        with StripeStandIn(fail_times=1).patch():
+            response = self.client.post(self.url, self.data)
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+        self.assertEqual(Payments.objects.get().status, Payments.STATUS_FAILED)
+
+    def test_pending_status_asks_client_to_retry(self):
+        """Пока ссылка создается, статус отдается сразу с 202 и Retry-After."""
+        payment = Payments.objects.create(
+            user=self.user, course_paid=self.course, amount=1, method_payment="stripe"
+        )
+        response = self.client.get(reverse("users:payments_status", args=(payment.pk,)))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], Payments.STATUS_PENDING)
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_offline_payment_is_paid(self):
+        """Наличные и переводы сразу получают окончательный статус paid."""
+        payment = Payments.objects.create(user=self.user, course_paid=self.course, amount=1, method_payment="cash")
+        self.assertEqual(payment.status, Payments.STATUS_PAID)
+
+    def test_status_of_foreign_payment_not_found(self):
+        """Статус чужого платежа недоступен."""
+        stranger = User.objects.create(email="stranger@test.com")
+        payment = Payments.objects.create(user=stranger, course_paid=self.course, amount=1, method_payment="cash")
+        response = self.client.get(reverse("users:payments_status", args=(payment.pk,)))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class StripeCatalogTestCase(APITestCase):
+    """Тесты переиспользования продуктов и цен Stripe между платежами."""
+    def setUp(self):
+        """Создает пользователя, курс и урок."""
+        self.user = User.objects.create(email="email_test@test.com")
+        self.course = Course.objects.create(name="Test-course", owner=self.user)
+        self.lesson = Lesson.objects.create(name="Test-lesson", course=self.course, owner=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.stand_in = StripeStandIn()
+
+    def _pay(self, amount=1000, **target):
+        """Оформляет платеж и возвращает виды вызовов Stripe, сделанных при этом."""
+        calls_before = len(self.stand_in.calls)
+        data = {"amount": amount, "method_payment": "stripe", **target}
+        with self.stand_in.patch():
+            response = self.client.post(reverse("users:payments"), data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return [kind for kind, _ in self.stand_in.calls[calls_before:]]
+
+    def test_repeat_checkout_needs_only_session(self):
+        """Повторная оплата того же курса на ту же сумму создает только сессию."""
+        self.assertEqual(self._pay(course_paid=self.course.pk), ["product", "price", "session"])
+        self.assertEqual(self._pay(course_paid=self.course.pk), ["session"])
+        self.assertEqual(self._pay(lesson_paid=self.lesson.pk), ["product", "price", "session"])
+        self.assertEqual(StripeCatalogItem.objects.count(), 2)
+
+    def test_catalog_invalidated_on_name_or_amount_change(self):
+        """Новая сумма или новое название курса создают новые продукт и цену."""
+        self._pay(course_paid=self.course.pk)
+        self.assertEqual(self._pay(amount=2000, course_paid=self.course.pk), ["product", "price", "session"])
+
+        self.course.name = "Renamed course"
+        self.course.save()
+        self.assertEqual(self._pay(course_paid=self.course.pk), ["product", "price", "session"])
+        item = StripeCatalogItem.objects.get(course=self.course, amount=1000)
+        self.assertEqual(item.product_name, "Renamed course")
+
+
+@override_settings(STRIPE_API_KEY="sk_test", STRIPE_CONNECT_TIMEOUT=2, STRIPE_READ_TIMEOUT=7)
+class StripeClientTestCase(APITestCase):
+    """Тесты настроенного клиента Stripe."""
+    def setUp(self):
+        """Сбрасывает клиент процесса, чтобы он создался с тестовыми настройками."""
+        patcher = mock.patch("users.stripe_client._client", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_client_reused_with_timeouts(self):
+        """В пределах процесса используется один клиент с таймаутами и повторами из настроек."""
+        client = get_stripe_client()
+        self.assertIs(get_stripe_client(), client)
+        self.assertEqual(client._requestor._client._timeout, (2, 7))
+        self.assertEqual(client._requestor._options.max_network_retries, 2)
+
+    def test_product_error_raised_and_recorded(self):
+        """Ошибка создания продукта не подменяется None и попадает в статистику вызовов."""
+        errors_before = get_stripe_call_stats().get("products.create", {}).get("errors", 0)
+        failing = SimpleNamespace(v1=SimpleNamespace(products=SimpleNamespace(
+            create=mock.Mock(side_effect=stripe.APIConnectionError("Stripe недоступен"))
+        )))
+        with mock.patch("users.services.get_stripe_client", return_value=failing):
+            with self.assertRaises(stripe.APIConnectionError):
+                create_stripe_product("Test-course")
+        self.assertEqual(get_stripe_call_stats()["products.create"]["errors"], errors_before + 1)
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET="whsec_test", STRIPE_EVENTS_APPLY_DELAY=0)
+class StripeWebhookTestCase(APITestCase):
+    """Тесты приема событий Stripe и пакетного обновления статусов платежей."""
+    def setUp(self):
+        """Создает пользователя, курс и платежи с открытыми сессиями оплаты."""
+        self.user = User.objects.create(email="email_test@test.com")
+        self.course = Course.objects.create(name="Test-course", owner=self.user)
+        self.payments = [
+            Payments.objects.create(
+                user=self.user, course_paid=self.course, amount=100, method_payment="stripe",
+                session_id=f"cs_{i}", status=Payments.STATUS_OPEN,
+            )
+            for i in range(4)
+        ]
+        self.url = reverse("users:stripe_webhook")
+
+    def _post_event(self, event_id, event_type, session_id, secret="whsec_test", payment_status="paid"):
+        """Отправляет событие сессии оплаты с подписью, как это делает Stripe."""
+        payload = json.dumps({
+            "id": event_id,
+            "object": "event",
+            "type": event_type,
+            "data": {"object": {"id": session_id, "object": "checkout.session", "payment_status": payment_status}},
+        })
+        timestamp = int(time.time())
+        signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+        return self.client.post(
+            self.url, payload, content_type="application/json", HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}"
+        )
+
+    def test_invalid_signature_rejected(self):
+        """Событие с неверной подписью не сохраняется."""
+        response = self._post_event("evt_1", "checkout.session.completed", "cs_0", secret="whsec_other")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_unsigned_event_rejected(self):
+        """Событие без подписи или подписанное пустым ключом не принимается."""
+        payload = json.dumps({"id": "evt_1", "object": "event", "type": "checkout.session.completed",
+                              "data": {"object": {"id": "cs_0", "object": "checkout.session"}}})
+        response = self.client.post(self.url, payload, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self._post_event("evt_1", "checkout.session.completed", "cs_0", secret="")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    @override_settings(STRIPE_WEBHOOK_SECRET="")
+    def test_webhooks_refused_without_secret(self):
+        """Без настроенного секрета события не принимаются, даже подписанные пустым ключом."""
+        response = self._post_event("evt_1", "checkout.session.completed", "cs_0", secret="")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(StripeEvent.objects.exists())
+        self.assertEqual(Payments.objects.get(session_id="cs_0").status, Payments.STATUS_OPEN)
+
+    def test_events_stored_once_and_applied(self):
+        """Повторная доставка события не дублируется, статусы платежей обновляются."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self._post_event("evt_1", "checkout.session.completed", "cs_0").status_code, 200)
+            self.assertEqual(self._post_event("evt_1", "checkout.session.completed", "cs_0").status_code, 200)
+            self._post_event("evt_2", "checkout.session.expired", "cs_1")
+        self.assertEqual(StripeEvent.objects.count(), 2)
+        statuses = dict(Payments.objects.values_list("session_id", "status"))
+        self.assertEqual(statuses["cs_0"], Payments.STATUS_PAID)
+        self.assertEqual(statuses["cs_1"], Payments.STATUS_EXPIRED)
+        self.assertEqual(statuses["cs_2"], Payments.STATUS_OPEN)
+
+    def test_delayed_payment_paid_only_after_async_success(self):
+        """Сессия, завершенная без оплаты (отложенный способ), становится оплаченной только после
+        async_payment_succeeded; async_payment_failed переводит платеж в failed."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self._post_event("evt_1", "checkout.session.completed", "cs_0", payment_status="unpaid")
+            self._post_event("evt_2", "checkout.session.completed", "cs_1", payment_status="unpaid")
+        self.assertEqual(StripeEvent.objects.get(event_id="evt_1").payment_status, "unpaid")
+        statuses = dict(Payments.objects.values_list("session_id", "status"))
+        self.assertEqual(statuses["cs_0"], Payments.STATUS_OPEN)
+        self.assertEqual(statuses["cs_1"], Payments.STATUS_OPEN)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._post_event("evt_3", "checkout.session.async_payment_succeeded", "cs_0")
+            self._post_event("evt_4", "checkout.session.async_payment_failed", "cs_1", payment_status="unpaid")
+        statuses = dict(Payments.objects.values_list("session_id", "status"))
+        self.assertEqual(statuses["cs_0"], Payments.STATUS_PAID)
+        self.assertEqual(statuses["cs_1"], Payments.STATUS_FAILED)
+
+    @override_settings(STRIPE_EVENTS_BATCH_SIZE=2)
+    def test_apply_in_batches(self):
+        """События применяются пакетами: один UPDATE на статус, примененные события отмечаются."""
+        for i, payment in enumerate(self.payments):
+            StripeEvent.objects.create(
+                event_id=f"evt_{i}", type="checkout.session.completed", session_id=payment.session_id,
+                payment_status="paid", payload={},
+            )
+        StripeEvent.objects.create(event_id="evt_late", type="checkout.session.expired", session_id="cs_0", payload={})
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(apply_stripe_events(), 5)
+        updates = [query for query in context.captured_queries if query["sql"].startswith('UPDATE "users_payments"')]
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(set(Payments.objects.values_list("status", flat=True)), {Payments.STATUS_PAID})
+
+        self.assertFalse(StripeEvent.objects.filter(processed_at__isnull=True).exists())
+        self.assertEqual(apply_stripe_events(), 0)
+
+    def test_event_committed_late_is_applied(self):
+        """Событие с меньшим id, зафиксированное после обработки событий с большим id, не теряется."""
+        StripeEvent.objects.create(
+            pk=100, event_id="evt_1", type="checkout.session.completed", session_id="cs_0", payment_status="paid",
+            payload={},
+        )
+        self.assertEqual(apply_stripe_events(), 1)
+        # id выдан раньше, но транзакция webhook зафиксирована только сейчас
+        StripeEvent.objects.create(
+            pk=50, event_id="evt_2", type="checkout.session.expired", session_id="cs_1", payload={}
+        )
+
+        self.assertEqual(apply_stripe_events(), 1)
+        statuses = dict(Payments.objects.values_list("session_id", "status"))
+        self.assertEqual(statuses["cs_0"], Payments.STATUS_PAID)
+        self.assertEqual(statuses["cs_1"], Payments.STATUS_EXPIRED)
+
+
+class ActivityTrackingTestCase(APITestCase):
+    """Тесты отложенной записи активности пользователей в last_login."""
+    def setUp(self):
+        """Сбрасывает отметки, оставшиеся от других тестов, и создает пользователей."""
+        patcher = mock.patch.dict("users.activity._recent", clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        pop_activity()
+        self.users = [User.objects.create(email=f"user{i}@test.com") for i in range(3)]
+
+    def test_authenticated_requests_recorded_once(self):
+        """Запросы по токену отмечают активность без записи в БД, повторы в пределах интервала не пишутся."""
+        self.client.force_authenticate(user=self.users[0])
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse("users:payments_status", args=(1,)))
+        self.assertFalse([query for query in context.captured_queries if query["sql"].startswith("UPDATE")])
+        with mock.patch("users.activity.get_activity_store") as store:
+            self.client.get(reverse("users:payments_status", args=(1,)))
+        store.assert_not_called()
+        self.assertEqual(list(pop_activity()), [self.users[0].pk])
+
+    def test_flush_updates_last_login_in_one_query(self):
+        """Накопленные отметки записываются одним UPDATE."""
+        for user in self.users:
+            record_activity(user.pk)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(flush_user_activity(), 3)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertFalse(User.objects.filter(last_login__isnull=True).exists())
+        self.assertEqual(flush_user_activity(), 0)
+
+    @override_settings(REDIS_URL="redis://redis.test:6379/2")
+    def test_redis_store_uses_client_from_settings(self):
+        """Хранилище Redis работает через клиент, созданный по REDIS_URL."""
+        with mock.patch("users.activity.redis.Redis.from_url") as from_url:
+            store = RedisActivityStore(cache)
+            store.record(7, 100.0)
+            from_url.return_value.pipeline.return_value.execute.return_value = [{b"7": b"100.0"}, 1]
+            self.assertEqual(store.pop_all(), {7: 100.0})
+        from_url.assert_called_once_with("redis://redis.test:6379/2")
+        from_url.return_value.hset.assert_called_once_with(store.key, 7, 100.0)
+
+
+class PaymentHistoryTestCase(APITestCase):
+    """Тесты истории платежей с итогами, посчитанными в БД."""
+    def setUp(self):
+        """Создает двух пользователей с платежами разными способами."""
+        self.user = User.objects.create(email="email_test@test.com")
+        self.other = User.objects.create(email="other@test.com")
+        self.course = Course.objects.create(name="Test-course", owner=self.user)
+        for amount, method in [(100, "cash"), (200, "cash"), (500, "stripe")]:
+            Payments.objects.create(user=self.user, course_paid=self.course, amount=amount, method_payment=method)
+        Payments.objects.create(user=self.other, course_paid=self.course, amount=1000, method_payment="transfer")
+        self.client.force_authenticate(user=self.user)
+
+    def test_history_aggregates(self):
+        """История содержит итоги по платежам и разбивку по способам оплаты только для своего пользователя."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("users:history-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Один запрос последних платежей и один запрос итогов
+        payment_queries = [query for query in context.captured_queries if 'FROM "users_payments"' in query["sql"]]
+        self.assertEqual(len(payment_queries), 2)
+        [history] = response.data
+        self.assertEqual(history["id"], self.user.pk)
+        self.assertEqual(len(history["payments_set"]), 3)
+        self.assertEqual(history["total_paid"], 800)
+        self.assertEqual(history["payments_count"], 3)
+        self.assertIsNotNone(history["last_payment"])
+        self.assertEqual(history["by_method"]["cash"], {"total": 300, "count": 2})
+        self.assertEqual(history["by_method"]["transfer"], {"total": 0, "count": 0})
+
+    def test_history_totals_for_page_only(self):
+        """В курсорном режиме итоги считаются только для пользователей страницы."""
+        moderators = Group.objects.create(name="moderators")
+        self.user.groups.add(moderators)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("users:history-list"), {"pagination": "cursor", "page_size": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        [history] = response.data["results"]
+        self.assertEqual((history["id"], history["total_paid"]), (self.user.pk, 800))
+        [totals_query] = [query["sql"] for query in context.captured_queries if "GROUP BY" in query["sql"]]
+        self.assertIn(f'"user_id" IN ({self.user.pk})', totals_query)
+
+        response = self.client.get(response.data["next"])
+        [history] = response.data["results"]
+        self.assertEqual(history["id"], self.other.pk)
+        self.assertEqual(history["by_method"]["transfer"], {"total": 1000, "count": 1})
+
+    def test_history_update_and_retrieve(self):
+        """История по-прежнему поддерживает изменение пользователя и отдает итоги в ответе."""
+        url = reverse("users:history-detail", args=(self.user.pk,))
+        response = self.client.patch(url, {"city": "Kazan"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["city"], response.data["total_paid"]), ("Kazan", 800))
+        self.assertEqual(self.client.get(url).data["payments_count"], 3)
+
+    def test_history_payments_paginated(self):
+        """Платежи пользователя отдаются курсорными страницами, чужая история недоступна."""
+        url = reverse("users:history-payments", args=(self.user.pk,))
+        response = self.client.get(url, {"page_size": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([payment["amount"] for payment in response.data["results"]], [500, 200])
+        self.assertIsNotNone(response.data["next"])
+
+        response = self.client.get(reverse("users:history-payments", args=(self.other.pk,)))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_users_list_payments_prefetched(self):
+        """Список пользователей загружает платежи одним запросом, а не по запросу на пользователя."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("users:users-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        payment_queries = [query for query in context.captured_queries if 'FROM "users_payments"' in query["sql"]]
+        self.assertEqual(len(payment_queries), 1)
+
+    def test_users_list_paginated_on_request(self):
+        """Без параметров список отдается целиком, с ?pagination=cursor - курсорными страницами."""
+        response = self.client.get(reverse("users:users-list"))
+        self.assertEqual([user["email"] for user in response.data], [self.user.email, self.other.email])
+
+        response = self.client.get(reverse("users:users-list"), {"pagination": "cursor", "page_size": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(response.data["next"])
+        [user] = response.data["results"]
+        self.assertEqual(user["email"], self.user.email)
+        self.assertEqual(len(user["payments_set"]), 3)
+
+    @override_settings(USER_RECENT_PAYMENTS=2)
+    def test_users_list_recent_payments_limited(self):
+        """В пользователя вложены только последние USER_RECENT_PAYMENTS платежей."""
+        response = self.client.get(reverse("users:users-list"))
+        self.assertEqual([payment["amount"] for payment in response.data[0]["payments_set"]], [500, 200])
+        response = self.client.get(reverse("users:users-detail", args=(self.user.pk,)))
+        self.assertEqual(len(response.data["payments_set"]), 2)
+
+
+@override_settings(PAYMENT_ROLLUPS_BATCH_SIZE=2, PAYMENT_ROLLUPS_OVERLAP=0)
+class RevenueTestCase(APITestCase):
+    """Тесты сводки выручки и отчета по ней."""
+    def setUp(self):
+        """Создает администратора, курс, урок и платежи за два месяца."""
+        self.admin = User.objects.create(email="admin@test.com", is_staff=True)
+        self.course = Course.objects.create(name="Test-course", owner=self.admin)
+        self.lesson = Lesson.objects.create(name="Test-lesson", course=self.course, owner=self.admin)
+        self._pay("2026-01-10", 100, course_paid=self.course)
+        self._pay("2026-01-10", 200, course_paid=self.course)
+        self._pay("2026-01-20", 50, lesson_paid=self.lesson)
+        paid = self._pay("2026-02-01", 300, course_paid=self.course, method_payment="stripe")
+        Payments.objects.filter(pk=paid.pk).update(status=Payments.STATUS_PAID)
+        self.client.force_authenticate(user=self.admin)
+
+    def _pay(self, day, amount, method_payment="cash", **target):
+        """Создает платеж с заданной датой (date_payment заполняется автоматически при сохранении)."""
+        payment = Payments.objects.create(user=self.admin, amount=amount, method_payment=method_payment, **target)
+        Payments.objects.filter(pk=payment.pk).update(date_payment=f"{day}T12:00:00Z")
+        payment.refresh_from_db()
+        return payment
+
+    def test_rollups_refreshed_incrementally(self):
+        """Сводка учитывает только оплаченные платежи, повторный запуск пересчитывает только измененные дни."""
+        stripe_payment = self._pay("2026-01-10", 1000, course_paid=self.course, method_payment="stripe")
+        self.assertEqual(refresh_payment_rollups(), 3)
+        self.assertEqual(refresh_payment_rollups(), 0)
+        rollup = PaymentRollup.objects.get(day="2026-01-10", course=self.course)
+        self.assertEqual((rollup.amount_total, rollup.payments_count), (300, 2))
+
+        self._pay("2026-01-10", 400, course_paid=self.course)
+        self.assertEqual(refresh_payment_rollups(), 1)
+        rollup = PaymentRollup.objects.get(day="2026-01-10", course=self.course, method_payment="cash")
+        self.assertEqual((rollup.amount_total, rollup.payments_count), (700, 3))
+        self.assertEqual(PaymentRollup.objects.count(), 3)
+
+        # Оплата, подтвержденная позже (webhook), попадает в сводку своего дня
+        with self.captureOnCommitCallbacks(execute=True):
+            StripeEvent.objects.create(
+                event_id="evt_1", type="checkout.session.completed", session_id="cs_late", payment_status="paid",
+                payload={},
+            )
+            Payments.objects.filter(pk=stripe_payment.pk).update(session_id="cs_late", status=Payments.STATUS_OPEN)
+        apply_stripe_events()
+        self.assertEqual(refresh_payment_rollups(), 1)
+        rollup = PaymentRollup.objects.get(day="2026-01-10", course=self.course, method_payment="stripe")
+        self.assertEqual((rollup.amount_total, rollup.payments_count), (1000, 1))
+
+    def test_deleted_payment_removed_from_rollup(self):
+        """Удаление оплаченного платежа пересчитывает его день."""
+        payment = self._pay("2026-01-20", 70, lesson_paid=self.lesson)
+        refresh_payment_rollups()
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.delete()
+        rollup = PaymentRollup.objects.get(day="2026-01-20", lesson=self.lesson)
+        self.assertEqual((rollup.amount_total, rollup.payments_count), (50, 1))
+
+    def test_deleted_payments_recomputed_by_one_task(self):
+        """Дни всех удаленных в транзакции платежей пересчитываются одной задачей."""
+        refresh_payment_rollups()
+        with mock.patch("users.rollups.recompute_payment_rollup_days.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                Payments.objects.filter(course_paid=self.course).delete()
+                Payments.objects.get(lesson_paid=self.lesson).delete()
+        delay.assert_called_once_with(["2026-01-10", "2026-01-20", "2026-02-01"])
+
+    def test_user_delete_recomputes_rollup(self):
+        """Платежи удаляемого пользователя удаляются каскадом без сигналов и пересчитывают свои дни."""
+        other = User.objects.create(email="other@test.com")
+        payment = Payments.objects.create(user=other, amount=70, method_payment="cash", lesson_paid=self.lesson)
+        Payments.objects.filter(pk=payment.pk).update(date_payment="2026-01-20T12:00:00Z")
+        refresh_payment_rollups()
+        self.assertTrue(Collector(using="default").can_fast_delete(other.payments_set.all()))
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        rollup = PaymentRollup.objects.get(day="2026-01-20", lesson=self.lesson)
+        self.assertEqual((rollup.amount_total, rollup.payments_count), (50, 1))
+
+    def test_rollup_bucket_is_unique(self):
+        """Вторая строка сводки для того же дня, курса, урока и способа оплаты не создается."""
+        PaymentRollup.objects.create(day="2026-01-01", lesson=self.lesson, method_payment="cash")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PaymentRollup.objects.create(day="2026-01-01", lesson=self.lesson, method_payment="cash")
+
+    def test_revenue_report(self):
+        """Отчет группирует выручку по месяцам и фильтрует по периоду и способу оплаты."""
+        refresh_payment_rollups()
+        url = reverse("users:revenue")
+        response = self.client.get(url, {"group_by": "month", "date_from": "2026-01-01"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = [(row["period"], row["course"], row["lesson"], row["amount"], row["count"]) for row in response.data]
+        self.assertEqual(rows, [
+            ("2026-01-01", self.course.pk, None, 300, 2),
+            ("2026-01-01", None, self.lesson.pk, 50, 1),
+            ("2026-02-01", self.course.pk, None, 300, 1),
+        ])
+
+        response = self.client.get(url, {"date_from": "2026-01-15", "method_payment": "cash"})
+        self.assertEqual([(row["period"], row["amount"]) for row in response.data], [("2026-01-20", 50)])
+
+        self.assertEqual(self.client.get(url, {"group_by": "week"}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(REVENUE_MAX_DAYS=31)
+    def test_revenue_period_limited(self):
+        """Без дат отчет строится за последние REVENUE_MAX_DAYS дней, более длинный период отклоняется."""
+        refresh_payment_rollups()
+        url = reverse("users:revenue")
+        with mock.patch("users.serializers.timezone.localdate", return_value=timezone.datetime(2026, 2, 10).date()):
+            response = self.client.get(url)
+        self.assertEqual([row["period"] for row in response.data], ["2026-01-20", "2026-02-01"])
+
+        response = self.client.get(url, {"date_to": "2026-01-31"})
+        self.assertEqual([row["period"] for row in response.data], ["2026-01-10", "2026-01-20"])
+
+        response = self.client.get(url, {"date_from": "2026-01-01", "date_to": "2026-02-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_revenue_requires_admin(self):
+        """Отчет о выручке недоступен обычному пользователю."""
+        self.client.force_authenticate(user=User.objects.create(email="user@test.com"))
+        self.assertEqual(self.client.get(reverse("users:revenue")).status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ImportUsersTestCase(APITestCase):
+    """Тесты команды массового импорта пользователей."""
+    def setUp(self):
+        """Создает пользователя, email которого встретится в файле импорта."""
+        User.objects.create(email="exists@test.com")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def _import(self, name, content, **options):
+        """Записывает файл импорта, запускает команду и возвращает ее вывод и отклоненные строки."""
+        path = os.path.join(self.directory.name, name)
+        rejects_path = os.path.join(self.directory.name, "rejects.csv")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        out = StringIO()
+        call_command("import_users", path, rejects=rejects_path, stdout=out, **options)
+        with open(rejects_path, encoding="utf-8") as file:
+            return out.getvalue(), file.read().splitlines()[1:]
+
+    def test_import_csv(self):
+        """CSV загружается пачками, занятые email пропускаются, ошибки попадают в отчет."""
+        content = (
+            "email,password,city\n"
+            "new1@test.com,secret1,Moscow\n"
+            "not-an-email,secret2,\n"
+            "exists@test.com,secret3,\n"
+            "new2@test.com,,Kazan\n"
+            "new1@test.com,secret4,\n"
+        )
+        out, rejects = self._import("users.csv", content, batch_size=2, workers=0)
+        self.assertIn("Прочитано: 5, импортировано: 2, пропущено (email занят): 2, отклонено: 1", out)
+        self.assertEqual(len(rejects), 1)
+        self.assertTrue(rejects[0].startswith("3,not-an-email,"))
+
+        new1 = User.objects.get(email="new1@test.com")
+        self.assertTrue(new1.check_password("secret1"))
+        self.assertEqual(new1.city, "Moscow")
+        self.assertFalse(User.objects.get(email="new2@test.com").has_usable_password())
+
+    def test_import_jsonl_with_process_pool(self):
+        """JSONL импортируется с хешированием паролей в пуле процессов."""
+        content = "\n".join([
+            json.dumps({"email": "pool1@test.com", "password": "secret1"}),
+            "{broken",
+            json.dumps({"email": "pool2@test.com", "password": "secret2", "phone": "1" * 40}),
+            json.dumps({"email": "pool3@test.com", "password": "secret3"}),
+        ])
+        out, rejects = self._import("users.jsonl", content, workers=2)
+        self.assertIn("импортировано: 2", out)
+        self.assertEqual([reject.split(",")[0] for reject in rejects], ["2", "3"])
+        self.assertTrue(User.objects.get(email="pool3@test.com").check_password("secret3"))
+
+    def _rows_without_names(self):
+        """Строки импорта с пустыми именем, фамилией, телефоном и городом."""
+        return [
+            {"email": f"blank{i}@test.com", "password": "!", "phone": "", "city": "", "first_name": "",
+             "last_name": ""}
+            for i in range(2)
+        ] + [{"email": "named@test.com", "password": "!", "phone": "1", "city": "Kazan", "first_name": "Ann",
+              "last_name": "Lee"}]
+
+    def _assert_blank_fields_stored_as_empty_strings(self):
+        values = User.objects.filter(email__startswith="blank").values_list("phone", "city", "first_name", "last_name")
+        self.assertEqual(list(values), [("", "", "", "")] * 2)
+        self.assertEqual(User.objects.get(email="named@test.com").first_name, "Ann")
+
+    def test_load_users_keeps_empty_fields(self):
+        """Пустые поля сохраняются пустыми строками при любой СУБД."""
+        self.assertEqual(load_users(self._rows_without_names()), 3)
+        self._assert_blank_fields_stored_as_empty_strings()
+
+    @skipUnless(connection.vendor == "postgresql", "загрузка через COPY есть только в PostgreSQL (TEST_DB_PROFILE)")
+    def test_copy_keeps_empty_names(self):
+        """COPY не превращает пустые имена в NULL: пачка загружается целиком."""
+        self.assertEqual(_copy_users(self._rows_without_names()), 3)
+        self._assert_blank_fields_stored_as_empty_strings()
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class RegistrationTestCase(APITestCase):
+    """Тесты регистрации и пересчета хеша пароля при входе."""
+    def test_registration_single_insert(self):
+        """Пользователь создается одним INSERT с уже захешированным паролем, пароль не возвращается."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse("users:register"), {"email": "new@test.com", "password": "Secret-123"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("password", response.data)
+        writes = [query["sql"] for query in context.captured_queries if query["sql"].startswith(("INSERT", "UPDATE"))]
+        self.assertEqual(len(writes), 1)
+        self.assertNotIn("Secret-123", writes[0])
+
+        user = User.objects.get(email="new@test.com")
+        self.assertTrue(user.is_active)
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$1000$"))
+        self.assertTrue(user.check_password("Secret-123"))
+
+    def test_login_rehashes_with_new_iterations(self):
+        """После изменения PASSWORD_HASH_ITERATIONS хеш пересчитывается при входе."""
+        self.client.post(reverse("users:register"), {"email": "new@test.com", "password": "Secret-123"})
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            response = self.client.post(reverse("users:login"), {"email": "new@test.com", "password": "Secret-123"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(User.objects.get(email="new@test.com").password.startswith("pbkdf2_sha256$2000$"))
+
+    def test_calibrate_command(self):
+        """Команда калибровки выводит рекомендуемое число итераций."""
+        out = StringIO()
+        call_command("calibrate_password_hasher", target_ms=5, rounds=1, stdout=out)
+        self.assertIn("PASSWORD_HASH_ITERATIONS=", out.getvalue())
@@ -4,7 +4,8 @@ from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from users.apps import UsersConfig
-from users.views import PaymentsCreateAPIView, PaymentViewSet, UserRegistration, UserViewSet
+from users.views import (PaymentsCreateAPIView, PaymentStatusAPIView, PaymentViewSet, RevenueAPIView,
+                         StripeWebhookAPIView, UserHistoryPaymentsViewSet, UserRegistration, UserViewSet)
 
 app_name = UsersConfig.name
 # Создание роутера
@@ -13,6 +14,9 @@ router = DefaultRouter()
 # Регистрация ViewSet для платежей
 router.register("payments", PaymentViewSet, basename="payments")
 
+# Регистрация ViewSet истории платежей (до пустого префикса пользователей)
+router.register("history", UserHistoryPaymentsViewSet, basename="history")
+
 # Регистрация ViewSet
 router.register("", UserViewSet, basename="users")
 
@@ -21,5 +25,8 @@ urlpatterns = [
     path('login/', TokenObtainPairView.as_view(permission_classes=(AllowAny,)), name='login'),
     path('token/refresh/', TokenRefreshView.as_view(permission_classes=(AllowAny,)), name='token_refresh'),
     path('payments/', PaymentsCreateAPIView.as_view(), name='payments'),
+    path('payments/<int:pk>/status/', PaymentStatusAPIView.as_view(), name='payments_status'),
+    path('revenue/', RevenueAPIView.as_view(), name='revenue'),
+    path('stripe/webhook/', StripeWebhookAPIView.as_view(), name='stripe_webhook'),
 
 ] + router.urls
\ No newline at end of file
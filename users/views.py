@@ -1,14 +1,38 @@
-from django.db.models import QuerySet
+import stripe
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Count, F, Max, Prefetch, QuerySet, Sum
+from django.db.models.functions import TruncMonth
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, serializers
-from rest_framework.generics import CreateAPIView
-from rest_framework.permissions import AllowAny
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException
+from rest_framework.generics import CreateAPIView, RetrieveAPIView
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
-from users.models import Payments, User
-from users.serializers import (PaymentsSerializer, UserHistoryPaymentsSerializer, UserRegistrationSerializer,
-                               UserSerializer)
-from users.services import create_stripe_price, create_stripe_product, create_stripe_sessions
+from users.filters import StableOrderingFilter
+from users.models import PaymentRollup, Payments, User
+from users.paginators import PaymentsCursorPagination, PaymentsOptionalCursorPagination, UserOptionalCursorPagination
+from users.roles import is_moderator
+from users.serializers import (PaymentsCreateSerializer, PaymentsSerializer, PaymentStatusSerializer,
+                               RevenueQuerySerializer, RevenueSerializer, UserHistoryPaymentsSerializer,
+                               UserRegistrationSerializer, UserSerializer)
+from users.services import create_payment_checkout
+from users.tasks import create_checkout_session
+from users.webhooks import construct_stripe_event, schedule_stripe_events_apply, store_stripe_event
+
+
+class PaymentProviderError(APIException):
+    """Ошибка Stripe при синхронном создании сессии оплаты."""
+    status_code = status.HTTP_502_BAD_GATEWAY
+    default_detail = "Платежный сервис недоступен, повторите попытку позже"
+    default_code = "payment_provider_error"
 
 
 class PaymentViewSet(ModelViewSet):
@@ -18,65 +42,183 @@ class PaymentViewSet(ModelViewSet):
     3. Фильтрация по способу оплаты"""
     queryset = Payments.objects.all()
     serializer_class = PaymentsSerializer
+    pagination_class = PaymentsOptionalCursorPagination
 
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, StableOrderingFilter]
     filterset_fields = ['course_paid', 'lesson_paid', 'method_payment']
     ordering_fields = ['date_payment']
-    # Сортировка по умолчанию (новые первыми)
-    ordering = ['-date_payment']
+    # Сортировка по умолчанию (новые первыми); id делает порядок уникальным для курсора
+    ordering = ['-date_payment', '-id']
 
 
 class PaymentsCreateAPIView(CreateAPIView):
 
     """ API View для создания платежей через Stripe.
 
-    Этот View обрабатывает создание платежей для курсов или уроков."""
-    serializer_class = PaymentsSerializer
+    Этот View обрабатывает создание платежей для курсов или уроков.
+    При STRIPE_ASYNC_CHECKOUT = True сессия оплаты создается фоновой задачей:
+    ответ 202 возвращается сразу, ссылка появляется в эндпоинте статуса платежа."""
+    serializer_class = PaymentsCreateSerializer
     queryset = Payments.objects.all()
 
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        if settings.STRIPE_ASYNC_CHECKOUT:
+            response.status_code = status.HTTP_202_ACCEPTED
+            response["Location"] = reverse("users:payments_status", args=(response.data["id"],))
+        return response
+
     def perform_create(self, serializer):
         """Создает платеж и сессию оплаты в Stripe.
 
         Логика работы:
-        1. Сохраняет платеж в базе данных с привязкой к текущему пользователю
-        2. Определяет оплачиваемый курс или урок
-        3. Создает продукт в Stripe на основе названия курса/урока
-        4. Создает цену в Stripe в рублях (конвертирует рубли в копейки)
-        5. Создает сессию оплаты в Stripe и получает ссылку для оплаты
-        6. Сохраняет ID сессии и ссылку в объекте платежа"""
-
-        # Создаем платеж в базе
-        payment = serializer.save(user=self.request.user)
-
-        # Получаем курс или урок для оплаты
-        course = payment.course_paid
-        lesson = payment.lesson_paid
-        # Определяем, что оплачивается: курс или урок
-        if course:
-            product_name = course.name
-        elif lesson:
-            product_name = lesson.name
-        else:
-            # Если ни курс, ни урок не указаны - выбрасываем ошибку
-            raise serializers.ValidationError(
-                "Необходимо указать курс или урок для оплаты"
+        1. Курс или урок уже проверены сериализатором до обращения к Stripe
+        2. В асинхронном режиме платеж сохраняется в статусе pending, а сессию оплаты
+           после фиксации транзакции создает задача create_checkout_session
+        3. В синхронном режиме создаются продукт, цена и сессия оплаты в Stripe,
+           после чего платеж сохраняется один раз вместе с id сессии и ссылкой.
+           При ошибке Stripe платеж сохраняется в статусе failed, ответ - 502"""
+        if settings.STRIPE_ASYNC_CHECKOUT:
+            payment = serializer.save(user=self.request.user, status=Payments.STATUS_PENDING)
+            transaction.on_commit(lambda: create_checkout_session.delay(payment.pk))
+            return
+
+        # Создаем продукт, цену и сессию оплаты в Stripe по данным еще не сохраненного платежа
+        try:
+            session_id, payment_link = create_payment_checkout(Payments(**serializer.validated_data))
+        except stripe.StripeError as error:
+            serializer.save(user=self.request.user, status=Payments.STATUS_FAILED)
+            raise PaymentProviderError() from error
+        serializer.save(
+            user=self.request.user,
+            session_id=session_id,
+            link=payment_link,
+            status=Payments.STATUS_OPEN,
+        )
+
+
+class PaymentStatusAPIView(RetrieveAPIView):
+    """API View для получения статуса платежа текущего пользователя.
+
+    Пока ссылка на оплату создается (статус pending), отвечает 202 с заголовком
+    Retry-After: клиент повторяет запрос сам, воркер не ждет внутри запроса."""
+    serializer_class = PaymentStatusSerializer
+
+    def get_queryset(self) -> QuerySet[Payments]:
+        if not self.request.user.is_authenticated:
+            # Анонимный запрос (например, при генерации схемы swagger)
+            return Payments.objects.none()
+        return Payments.objects.filter(user=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        if response.data["status"] == Payments.STATUS_PENDING:
+            response.status_code = status.HTTP_202_ACCEPTED
+            response["Retry-After"] = str(settings.PAYMENT_STATUS_RETRY_AFTER)
+        return response
+
+
+class RevenueAPIView(APIView):
+    """Отчет о выручке по курсам и урокам за день или месяц для администраторов.
+
+    Строится по сводной таблице PaymentRollup, а не по таблице платежей,
+    поэтому стоимость запроса зависит от числа дней в периоде, а не платежей.
+    Период ограничен REVENUE_MAX_DAYS днями, по умолчанию - последние дни до сегодня."""
+    permission_classes = (IsAdminUser,)
+
+    @swagger_auto_schema(
+        query_serializer=RevenueQuerySerializer,
+        responses={200: RevenueSerializer(many=True)},
+        tags=['Платежи'],
+    )
+    def get(self, request, *args, **kwargs):
+        params = RevenueQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+
+        rollups = PaymentRollup.objects.filter(day__range=(query["date_from"], query["date_to"]))
+        if "method_payment" in query:
+            rollups = rollups.filter(method_payment=query["method_payment"])
+        period = TruncMonth("day") if query["group_by"] == "month" else F("day")
+        rows = (
+            rollups.annotate(period=period)
+            .values("period", "course", "lesson")
+            .annotate(amount=Sum("amount_total"), count=Sum("payments_count"))
+            .order_by("period", F("course").asc(nulls_last=True), F("lesson").asc(nulls_last=True))
+        )
+        return Response(RevenueSerializer(rows, many=True).data)
+
+
+class StripeWebhookAPIView(APIView):
+    """Прием событий Stripe.
+
+    Проверяет подпись, сохраняет событие в журнал и сразу отвечает 200;
+    статусы платежей обновляет фоновая задача apply_stripe_events."""
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+    swagger_schema = None
+
+    def post(self, request, *args, **kwargs):
+        try:
+            event = construct_stripe_event(request.body, request.headers.get("Stripe-Signature", ""))
+        except ImproperlyConfigured:
+            return Response(
+                {"detail": "Прием событий Stripe не настроен"}, status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
-        # Создаем продукт в Stripe
-        product = create_stripe_product(product_name)
+        except (ValueError, stripe.SignatureVerificationError):
+            return Response({"detail": "Неверная подпись или тело события"}, status=status.HTTP_400_BAD_REQUEST)
+        store_stripe_event(event)
+        schedule_stripe_events_apply()
+        return Response({"received": True})
+
+
+def recent_payments_prefetch() -> Prefetch:
+    """Последние платежи пользователей выборки одним запросом, не больше USER_RECENT_PAYMENTS на пользователя."""
+    payments = Payments.objects.order_by("-date_payment", "-id")[:settings.USER_RECENT_PAYMENTS]
+    return Prefetch("payments_set", queryset=payments, to_attr="recent_payments")
 
-        # Создаем цену в Stripe
-        price = create_stripe_price(payment.amount, product.id)
-        # Создаем сессию оплаты
-        session_id, payment_link = create_stripe_sessions(price)
-        payment.session_id = session_id
-        payment.link = payment_link
-        payment.save()
+
+def attach_payment_totals(users) -> list[User]:
+    """Добавляет пользователям итоги по платежам: сумму, количество, дату последнего
+    платежа и разбивку по способу оплаты.
+
+    Итоги считаются одним запросом GROUP BY только для переданных пользователей,
+    а не для всей выборки до пагинации."""
+    users = list(users)
+    for user in users:
+        user.total_paid, user.payments_count, user.last_payment = 0, 0, None
+        for method, _ in Payments.METHOD_CHOICES:
+            setattr(user, f"total_{method}", 0)
+            setattr(user, f"count_{method}", 0)
+    by_pk = {user.pk: user for user in users}
+    groups = (
+        Payments.objects.filter(user__in=by_pk)
+        .values("user", "method_payment")
+        .annotate(total=Sum("amount"), count=Count("pk"), last=Max("date_payment"))
+        .order_by()
+    )
+    for group in groups:
+        user = by_pk[group["user"]]
+        setattr(user, f"total_{group['method_payment']}", group["total"])
+        setattr(user, f"count_{group['method_payment']}", group["count"])
+        user.total_paid += group["total"]
+        user.payments_count += group["count"]
+        if user.last_payment is None or group["last"] > user.last_payment:
+            user.last_payment = group["last"]
+    return users
 
 
 class UserViewSet(ModelViewSet):
-    """ViewSet для пользователя"""
-    queryset = User.objects.all()
+    """ViewSet для пользователя.
+
+    Список отдается целиком или курсорными страницами (?pagination=cursor).
+    В пользователя вложены только последние USER_RECENT_PAYMENTS платежей."""
     serializer_class = UserSerializer
+    pagination_class = UserOptionalCursorPagination
+
+    def get_queryset(self) -> QuerySet[User]:
+        # Последние платежи всех пользователей ответа загружаются одним запросом
+        return User.objects.prefetch_related(recent_payments_prefetch())
 
 
 class UserRegistration(CreateAPIView):
@@ -86,16 +228,53 @@ class UserRegistration(CreateAPIView):
     permission_classes = (AllowAny,)    # разрешает доступ всем пользователям, включая анонимных.
 
     def perform_create(self, serializer):
-        user = serializer.save(is_active=True)
-        user.set_password(user.password)
-        user.save()
+        serializer.save(is_active=True)
 
 
 class UserHistoryPaymentsViewSet(ModelViewSet):
-    """ViewSet для истории платежей пользователя"""
+    """ViewSet для истории платежей пользователя.
+
+    Кроме последних платежей отдает итоги (сумма, количество, последний платеж,
+    разбивка по способу оплаты), посчитанные в БД после пагинации - только для
+    пользователей ответа. Список отдается целиком или курсорными страницами
+    (?pagination=cursor), все платежи - постраничный ресурс payments. Пользователь
+    видит только свою историю, модератор - всех пользователей."""
 
     serializer_class = UserHistoryPaymentsSerializer
+    pagination_class = UserOptionalCursorPagination
 
     def get_queryset(self) -> QuerySet[User]:
-        # Предзагрузка платежей пользователя для оптимизации запросов
-        return User.objects.prefetch_related('payments_set')
+        queryset = User.objects.all()
+        if not self.request.user.is_authenticated:
+            # Анонимный запрос (например, при генерации схемы swagger)
+            return queryset.none()
+        if not is_moderator(self.request):
+            queryset = queryset.filter(pk=self.request.user.pk)
+        if self.action == "payments":
+            return queryset
+        return queryset.prefetch_related(recent_payments_prefetch())
+
+    def get_object(self) -> User:
+        user = super().get_object()
+        if self.action != "payments":
+            attach_payment_totals([user])
+        return user
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        users = attach_payment_totals(page if page is not None else queryset)
+        serializer = self.get_serializer(users, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    def perform_create(self, serializer):
+        attach_payment_totals([serializer.save()])
+
+    @action(detail=True, serializer_class=PaymentsSerializer, pagination_class=PaymentsCursorPagination)
+    def payments(self, request, *args, **kwargs):
+        """Платежи пользователя курсорными страницами, новые первыми."""
+        user = self.get_object()
+        page = self.paginate_queryset(Payments.objects.filter(user=user))
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
@@ -0,0 +1,55 @@
+import stripe
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from users.models import StripeEvent
+from users.tasks import apply_stripe_events, stripe_events_pending_key
+
+
+def construct_stripe_event(payload: bytes, signature: str) -> stripe.Event:
+    """Проверяет подпись webhook и возвращает событие Stripe.
+
+    При неверной подписи или некорректном теле выбрасывает ValueError
+    или stripe.SignatureVerificationError. Без STRIPE_WEBHOOK_SECRET выбрасывает
+    ImproperlyConfigured: подпись пустым ключом может сформировать кто угодно."""
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        raise ImproperlyConfigured("STRIPE_WEBHOOK_SECRET не задан")
+    return stripe.Webhook.construct_event(payload, signature, settings.STRIPE_WEBHOOK_SECRET)
+
+
+def store_stripe_event(event: stripe.Event) -> None:
+    """Сохраняет событие в журнал; повторная доставка того же события игнорируется
+    уникальным ограничением на event_id."""
+    data_object = event["data"]["object"]
+    is_session = data_object.get("object") == "checkout.session"
+    StripeEvent.objects.bulk_create(
+        [
+            StripeEvent(
+                event_id=event["id"],
+                type=event["type"],
+                session_id=data_object.get("id") if is_session else None,
+                payment_status=(data_object.get("payment_status") or "") if is_session else "",
+                payload=event.to_dict(),
+            )
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def schedule_stripe_events_apply() -> None:
+    """Планирует применение накопленных событий одной задачей.
+
+    Пока задача ожидает запуска (STRIPE_EVENTS_APPLY_DELAY), новые события к ней
+    присоединяются: всплеск webhook превращается в несколько пакетных UPDATE."""
+    delay = settings.STRIPE_EVENTS_APPLY_DELAY
+
+    def schedule() -> None:
+        if not delay:
+            apply_stripe_events.delay()
+            return
+        if cache.add(stripe_events_pending_key(), True, timeout=delay * 2):
+            apply_stripe_events.apply_async(countdown=delay)
+
+    transaction.on_commit(schedule)